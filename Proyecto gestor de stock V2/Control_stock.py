@@ -5,9 +5,27 @@ from google.oauth2.service_account import Credentials
 from datetime import datetime
 import json
 import os
+import sys
+import threading
 from typing import Dict, List, Optional
 
-class SistemaControlStock:
+# Los módulos compartidos (almacenamiento local, etc.) viven en la carpeta de la V1
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Proyecto gestor de stock'))
+from almacenamiento import crear_almacen
+from modelo import stock_minimo_de, nombre_de
+from hojas_google import actualizar_celdas, leer_columnas, IndiceHoja
+from sincronizador import SincronizadorFondo
+from bandeja_salida import BandejaSalida
+from limite_llamadas import LimitadorLlamadas, HojaLimitada
+from vista_tabla import VistaTabla, TablaVirtual
+from indice_busqueda import LIMITE_RESULTADOS
+from escaner import MotorEscaner, interpretar_escaneo
+from inventario import Inventario, ProductoModificado, StockInsuficiente
+from ventana_comun import VentanaServicioStock, VentanaLote, VentanaAlertas, VentanaConfirmacion
+from publicaciones import leer_publicaciones
+from recepcion import LoteMovimientos, MODO_NORMAL, MODO_RECEPCION, MODO_PREPARACION
+
+class SistemaControlStock(VentanaServicioStock, VentanaLote, VentanaAlertas, VentanaConfirmacion):
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("Sistema de Control de Stock")
@@ -18,6 +36,8 @@ class SistemaControlStock:
         self.sheet_name = "Control_Stock"
         self.gc = None
         self.worksheet = None
+        # Todas las llamadas a la hoja pasan por el límite de pedidos (reintenta los 429/5xx)
+        self.limitador = LimitadorLlamadas()
         
         # Variables para configuración de Google Sheets
         self.google_sheet_id = None  # ID de la hoja específica
@@ -31,22 +51,83 @@ class SistemaControlStock:
         self.sheet_cache_file = 'google_sheet_cache.json'
         self.cached_sheet_id = None
         
+        # Almacenamiento local: "journal" (diario de movimientos), "sqlite" (base indexada)
+        # o "json" (archivo completo)
+        self.modo_almacenamiento = "journal"
+        
+        # Tabla virtual: el Treeview muestra solo las filas visibles (para catálogos grandes);
+        # con False se cargan todas las filas en el Treeview
+        self.tabla_virtual = True
+        
+        self.codigos_filtrados = None  # Códigos que muestra la tabla filtrada (None: todos)
+        
+        # Servicio de stock compartido ("host:puerto", ver servicio_stock.py): con varias
+        # terminales, el servicio tiene el inventario y esta ventana solo lo maneja (sin
+        # Google Sheets). None: inventario propio
+        self.servidor_stock = None
+        
+        # Catálogo, movimientos y cambios pendientes (sin Tk); la interfaz solo lo maneja.
+        # Los movimientos van también a la bandeja de salida (persiste entre sesiones) si hay
+        # o hubo una hoja conectada, hasta que Google Sheets los confirma
+        if self.servidor_stock:
+            self.inventario = self.conectar_servicio_stock()
+        else:
+            self.inventario = Inventario(
+                crear_almacen(self.modo_almacenamiento),
+                bandeja_salida=BandejaSalida(),
+                usar_bandeja=lambda: bool(self.google_sheet_id or self.cached_sheet_id)
+            )
+        # Avisos de reposición: solo cuando un producto cruza su stock mínimo
+        self.inventario.alertas.al_cruzar = self.al_cruzar_minimo
+        
         # Variables
-        self.productos = {}
+        self.sincronizador = SincronizadorFondo(self.persistir_pendientes)
+        # Tomado mientras el hilo escribe stock en la hoja: una recarga desde la hoja espera a que
+        # se confirme lo escrito (si no, reaplicaría la bandeja sobre movimientos ya escritos)
+        self.lock_hoja = threading.Lock()
+        # Avisar con una ventana si falla el guardado completo pedido (importaciones)
+        self.avisar_error_guardado = False
+        # Sincronización pedida con el botón: se avisa el resultado y se vuelve a habilitar el botón
+        self.sincronizacion_manual = False
+        # Código -> fila de la hoja, armado una vez por sesión (se rehace si cambia la estructura)
+        self.indice_hoja = IndiceHoja()
+        self.ultimo_error_sincronizacion = None
+        self.resumen_sincronizacion = None
         self.codigo_actual = tk.StringVar()
+        
+        # Recepción/preparación rápida: los escaneos se cuentan en memoria y se confirman en lote
+        self.modo_escaneo = tk.StringVar(value=MODO_NORMAL)
+        self.lote = LoteMovimientos()
+        # Cantidad indicada antes del producto ('12*' o código de cantidad) para el próximo escaneo
+        self.cantidad_pendiente = None
         self.status_google_sheets = "⏳ Configurando..."
         
-        # Sistema de defensa - modo de edición
-        self.modo_edicion_activo = False
-        self.producto_en_edicion = None
-        self.stock_anterior = None
+        # Sistema de defensa - modo de edición por producto (código -> versión leída al abrir la
+        # confirmación): otros productos se pueden mover mientras tanto, y el cambio se rechaza
+        # solo si ese mismo producto cambió (sincronización, recarga u otra terminal)
+        self.productos_en_edicion = {}
         
-        self.cargar_credenciales_cache()
-        self.cargar_hoja_cache()
-        self.setup_google_sheets()
+        if self.servidor_stock:
+            self.status_google_sheets = f"🖧 Servicio de stock {self.servidor_stock}"
+        else:
+            self.cargar_credenciales_cache()
+            self.cargar_hoja_cache()
+            self.setup_google_sheets()
         self.crear_interfaz()
         self.cargar_datos()
         
+        # Guardado en segundo plano y revisión periódica de sus resultados
+        self.sincronizador.iniciar()
+        self.revisar_resultados_sincronizacion()
+        if self.servidor_stock:
+            self.root.report_callback_exception = self.reportar_error_interfaz
+            self.revisar_eventos_servicio()
+        
+    @property
+    def productos(self):
+        """Catálogo del motor de inventario"""
+        return self.inventario.productos
+    
     def setup_google_sheets(self):
         """Configura la conexión con Google Sheets"""
         try:
@@ -67,7 +148,7 @@ class SistemaControlStock:
                     if self.cached_sheet_id:
                         try:
                             self.google_sheet_id = self.cached_sheet_id
-                            self.worksheet = self.gc.open_by_key(self.google_sheet_id).sheet1
+                            self.worksheet = self.abrir_hoja(self.google_sheet_id)
                             self.status_google_sheets = "✅ Google Sheets conectado"
                             self.actualizar_estado_google_sheets()
                             return
@@ -96,7 +177,7 @@ class SistemaControlStock:
                 # Solo intentar abrir hojas existentes
                 if hasattr(self, 'google_sheet_id') and self.google_sheet_id:
                     try:
-                        self.worksheet = self.gc.open_by_key(self.google_sheet_id).sheet1
+                        self.worksheet = self.abrir_hoja(self.google_sheet_id)
                         self.status_google_sheets = "✅ Google Sheets conectado"
                     except Exception as e:
                         self.status_google_sheets = "⚠️ Configurado (conecta una hoja)"
@@ -115,6 +196,11 @@ class SistemaControlStock:
             self.status_google_sheets = f"❌ Error Google Sheets: {str(e)[:50]}..."
             self.gc = None
     
+    def abrir_hoja(self, sheet_id):
+        """Abre la primera hoja del documento; la hoja devuelta pasa por el límite de llamadas"""
+        hoja = self.limitador.llamar(lambda: self.gc.open_by_key(sheet_id).sheet1)
+        return HojaLimitada(hoja, self.limitador)
+    
     def intentar_solucion_alternativa(self):
         """Intenta una solución alternativa para problemas de límites"""
         try:
@@ -133,7 +219,7 @@ class SistemaControlStock:
             
             # Intentar solo leer (sin crear archivos)
             if hasattr(self, 'google_sheet_id') and self.google_sheet_id:
-                worksheet = gc_temp.open_by_key(self.google_sheet_id).sheet1
+                worksheet = self.limitador.llamar(lambda: gc_temp.open_by_key(self.google_sheet_id).sheet1)
                 return True, "Modo solo lectura funcionando"
             else:
                 return False, "Necesitas conectar una hoja específica primero"
@@ -157,7 +243,7 @@ class SistemaControlStock:
         if self.google_sheet_id and self.gc:
             try:
                 # SOLO abrir la hoja existente, NUNCA crear una nueva
-                self.worksheet = self.gc.open_by_key(self.google_sheet_id).sheet1
+                self.worksheet = self.abrir_hoja(self.google_sheet_id)
                 self.status_google_sheets = "✅ Hoja específica conectada"
                 
                 # Guardar hoja en caché
@@ -322,11 +408,24 @@ class SistemaControlStock:
             menu.add_separator()
             menu.add_command(label="📊 Ver hoja conectada", 
                            command=lambda: self.mostrar_info_hoja())
+            if not self.worksheet:
+                menu.add_command(label="🔄 Reconectar", 
+                               command=self.reconectar_google_sheets)
             menu.add_command(label="🗑️ Limpiar hoja", 
                            command=self.limpiar_hoja_cache)
         
         menu.tk_popup(event.x_root, event.y_root)
     
+    def reconectar_google_sheets(self):
+        """Vuelve a conectar con la hoja y envía los movimientos que quedaron en la bandeja de salida"""
+        self.setup_google_sheets()
+        if self.gc and self.worksheet:
+            # Recarga el stock de la hoja y le reaplica los movimientos pendientes
+            self.cargar_datos()
+        else:
+            messagebox.showwarning("Sin conexión", f"No se pudo conectar con Google Sheets.\n\n"
+                                   f"Movimientos guardados sin enviar: {len(self.inventario.bandeja_salida or ())}")
+    
     def mostrar_info_credenciales(self):
         """Muestra información de las credenciales configuradas"""
         if self.cached_credentials:
@@ -424,6 +523,8 @@ class SistemaControlStock:
                 # Reconfigurar Google Sheets con las nuevas credenciales
                 self.setup_google_sheets()
                 self.actualizar_estado_google_sheets()
+                if self.gc and self.worksheet:
+                    self.cargar_datos()
                 messagebox.showinfo("Éxito", "Google Sheets configurado correctamente")
             
         except Exception as e:
@@ -557,7 +658,7 @@ class SistemaControlStock:
                 # 3. Verificar API habilitada
                 try:
                     # Intentar listar hojas (esto verifica si la API está habilitada)
-                    gc_temp.list_spreadsheet_files()
+                    self.limitador.llamar(gc_temp.list_spreadsheet_files)
                     diagnostico['api_habilitada'] = True
                 except Exception as e:
                     error_msg = str(e)
@@ -577,7 +678,7 @@ class SistemaControlStock:
                 # 4. Verificar límites de Google Drive
                 try:
                     # Solo verificar que podemos listar hojas (sin crear nada)
-                    gc_temp.list_spreadsheet_files()
+                    self.limitador.llamar(gc_temp.list_spreadsheet_files)
                     diagnostico['limites_ok'] = True
                 except Exception as e:
                     error_msg = str(e)
@@ -592,7 +693,7 @@ class SistemaControlStock:
                             diagnostico['errores'].append("🔄 Intentando solución alternativa...")
                             # Intentar solo leer una hoja existente
                             if hasattr(self, 'google_sheet_id') and self.google_sheet_id:
-                                worksheet_temp = gc_temp.open_by_key(self.google_sheet_id).sheet1
+                                worksheet_temp = self.limitador.llamar(lambda: gc_temp.open_by_key(self.google_sheet_id).sheet1)
                                 diagnostico['solucion_alternativa'] = True
                                 diagnostico['errores'].append("✅ Solución alternativa: Modo solo lectura funcionando")
                             else:
@@ -605,7 +706,7 @@ class SistemaControlStock:
                 # 5. Verificar hoja compartida (si hay una configurada)
                 if hasattr(self, 'google_sheet_id') and self.google_sheet_id:
                     try:
-                        worksheet_temp = gc_temp.open_by_key(self.google_sheet_id).sheet1
+                        worksheet_temp = self.limitador.llamar(lambda: gc_temp.open_by_key(self.google_sheet_id).sheet1)
                         diagnostico['hoja_compartida'] = True
                     except Exception as e:
                         if "404" in str(e):
@@ -909,6 +1010,7 @@ La hoja debe tener:
             
             if self.configurar_hoja_especifica(sheet_url=url):
                 dialog.destroy()
+                self.cargar_datos()  # Recargar datos y enviar movimientos pendientes
                 messagebox.showinfo("✅ Conectado", "Hoja de Google Sheets conectada correctamente")
             else:
                 conectar_btn.config(text="🔗 Conectar", state='normal')
@@ -926,132 +1028,82 @@ La hoja debe tener:
         # Permitir Enter para conectar
         url_entry.bind('<Return>', lambda e: conectar())
     
-    def sincronizar_con_google_sheets(self):
-        """Sincroniza los cambios con Google Sheets"""
+    def sincronizar_con_google_sheets(self, codigos=None, mostrar_errores=True, stocks=None):
+        """Sincroniza con Google Sheets el stock de los productos indicados (todos si no se indican)
+        
+        stocks permite indicar el valor a escribir por código (por defecto, el stock actual).
+        """
         if self.gc and self.worksheet:
             try:
-                print(f"\n=== MÉTODO DIRECTO DE LECTURA ===")
-                
-                # Leer directamente todas las celdas
-                datos_raw = self.worksheet.get_all_values()
-                print(f"Filas totales en hoja: {len(datos_raw)}")
-                
-                if len(datos_raw) < 3:
-                    print("❌ La hoja tiene menos de 3 filas")
-                    return False
-                
-                # Mostrar todas las filas para debug
-                print(f"Fila 1: {datos_raw[0]}")
-                print(f"Fila 2: {datos_raw[1]}")
-                if len(datos_raw) > 2:
-                    print(f"Fila 3: {datos_raw[2]}")
-                
-                # Intentar con diferentes filas como encabezados
-                headers = None
-                fila_inicio_datos = None
-                
-                # Buscar la fila que tiene encabezados válidos
-                for i, fila in enumerate(datos_raw):
-                    if any('codigo' in str(celda).lower() or 'stock' in str(celda).lower() for celda in fila):
-                        headers = fila
-                        fila_inicio_datos = i + 1
-                        print(f"Encabezados encontrados en fila {i+1}: {headers}")
-                        break
-                
-                if headers is None:
-                    print("❌ No se encontraron encabezados válidos")
-                    return False
-                
-                # Buscar las columnas correctas
-                columna_codigo = None
-                columna_stock = None
-                
-                for i, header in enumerate(headers):
-                    header_clean = str(header).strip().lower()
-                    if 'codigo' in header_clean or 'código' in header_clean:
-                        columna_codigo = i
-                        print(f"Columna código encontrada en posición {i}: '{header}'")
-                    elif header_clean == 'stock' and 'min' not in header_clean:
-                        columna_stock = i
-                        print(f"Columna stock encontrada en posición {i}: '{header}'")
-                
-                if columna_codigo is None:
-                    print("❌ No se encontró columna de código")
-                    return False
-                
-                if columna_stock is None:
-                    print("❌ No se encontró columna de stock")
-                    return False
-                
-                # Crear diccionario de códigos -> fila para búsqueda rápida
-                codigos_por_fila = {}
-                for i, fila in enumerate(datos_raw[fila_inicio_datos:], start=fila_inicio_datos+1):
-                    if len(fila) > columna_codigo:
-                        codigo_hoja = str(fila[columna_codigo]).strip()
-                        if codigo_hoja:
-                            codigos_por_fila[codigo_hoja] = i
+                if codigos is None:
+                    productos_a_revisar = list(self.productos.items())
+                else:
+                    productos_a_revisar = [(c, self.productos[c]) for c in codigos if c in self.productos]
                 
-                print(f"Índice de códigos creado: {len(codigos_por_fila)} productos en hoja")
+                # La hoja completa se descarga solo para armar el índice (una vez por sesión);
+                # después se verifica únicamente la celda de código de las filas a escribir
+                if not self.indice_hoja.valido_para(self.worksheet):
+                    if not self.construir_indice_hoja():
+                        return False
+                elif not self.indice_hoja.verificar(self.worksheet, [c for c, _ in productos_a_revisar]):
+                    # La estructura de la hoja cambió: se vuelve a armar el índice de filas
+                    if not self.construir_indice_hoja():
+                        return False
                 
-                # Procesar solo productos que han cambiado
-                productos_actualizados = 0
+                # Juntar todas las celdas de stock que cambiaron para enviarlas juntas
+                celdas = []
+                codigo_por_celda = {}
                 productos_no_encontrados = 0
                 productos_sin_cambios = 0
                 
-                print(f"\n=== INICIO SINCRONIZACIÓN ===")
-                print(f"Productos en memoria: {len(self.productos)}")
-                
-                for codigo, producto in self.productos.items():
-                    # Buscar directamente en el índice
-                    if codigo in codigos_por_fila:
-                        fila_numero = codigos_por_fila[codigo]
-                        fila = datos_raw[fila_numero - 1]  # Ajustar índice
-                        
-                        if len(fila) > columna_stock:
-                            stock_hoja = str(fila[columna_stock]).strip()
-                            nuevo_stock = producto['stock']
-                            
-                            # Solo actualizar si el stock cambió
-                            if stock_hoja != str(nuevo_stock):
-                                print(f"Actualizando {codigo}: {stock_hoja} -> {nuevo_stock}")
-                                
-                                try:
-                                    # Actualizar stock en la columna correcta
-                                    columna_letra = chr(ord('A') + columna_stock)
-                                    celda = f'{columna_letra}{fila_numero}'
-                                    self.worksheet.update(celda, [[nuevo_stock]])
-                                    productos_actualizados += 1
-                                    print(f"  ✅ Stock actualizado: {codigo} -> {nuevo_stock}")
-                                except Exception as e:
-                                    print(f"  ❌ Error actualizando stock de {codigo}: {e}")
-                                    # Intentar método alternativo
-                                    try:
-                                        print(f"  🔄 Intentando método alternativo...")
-                                        self.worksheet.update_acell(celda, nuevo_stock)
-                                        productos_actualizados += 1
-                                        print(f"  ✅ Stock actualizado (método alternativo): {codigo} -> {nuevo_stock}")
-                                    except Exception as e2:
-                                        print(f"  ❌ Error método alternativo: {e2}")
-                            else:
-                                productos_sin_cambios += 1
-                    else:
+                for codigo, producto in productos_a_revisar:
+                    celda = self.indice_hoja.celda(codigo)
+                    if celda is None:
                         productos_no_encontrados += 1
-                        print(f"  ❌ Producto no encontrado en hoja: {codigo}")
+                        continue
+                    
+                    nuevo_stock = producto['stock'] if stocks is None else stocks.get(codigo, producto['stock'])
+                    # En la sincronización completa se omiten los que ya coinciden con la hoja;
+                    # los productos modificados se escriben siempre
+                    if codigos is None and self.indice_hoja.valores.get(codigo) == str(nuevo_stock):
+                        productos_sin_cambios += 1
+                        continue
+                    
+                    celdas.append((celda, nuevo_stock))
+                    codigo_por_celda[celda] = (codigo, nuevo_stock)
                 
-                print(f"\nResumen:")
-                print(f"  Productos actualizados: {productos_actualizados}")
-                print(f"  Productos sin cambios: {productos_sin_cambios}")
-                print(f"  Productos no encontrados: {productos_no_encontrados}")
+                # Una sola llamada por bloque de celdas en vez de una por producto
+                actualizadas, fallidas = actualizar_celdas(self.worksheet, celdas)
+                productos_actualizados = len(actualizadas)
+                for celda in actualizadas:
+                    codigo, nuevo_stock = codigo_por_celda[celda]
+                    self.indice_hoja.valores[codigo] = str(nuevo_stock)
+                if fallidas:
+                    celda, motivo = fallidas[0]
+                    self.ultimo_error_sincronizacion = (f"{len(fallidas)} productos sin actualizar "
+                                                        f"({codigo_por_celda[celda][0]}: {motivo})")
                 
-                print(f"\n=== FIN SINCRONIZACIÓN ===")
-                print(f"Sincronización completada: {productos_actualizados} stocks actualizados, {productos_no_encontrados} no encontrados")
-                return True
+                # Resumen para la barra de estado (lo arma el mensaje de persistir_pendientes)
+                self.resumen_sincronizacion = (f"{productos_actualizados} actualizados, {productos_sin_cambios} sin cambios, "
+                                               f"{productos_no_encontrados} no encontrados")
+                return not fallidas
             except Exception as e:
-                print(f"Error al sincronizar: {e}")
-                messagebox.showerror("Error de Sincronización", f"No se pudo sincronizar con Google Sheets:\n{str(e)}")
+                self.ultimo_error_sincronizacion = str(e)
+                if mostrar_errores:
+                    messagebox.showerror("Error de Sincronización", f"No se pudo sincronizar con Google Sheets:\n{str(e)}")
                 return False
         return False
     
+    def construir_indice_hoja(self, lectura=None):
+        """Arma el índice código -> fila de la hoja (lee las columnas de código y stock si no se pasa la lectura)"""
+        if lectura is None:
+            lectura = leer_columnas(self.worksheet, ('codigo', 'stock'))
+        
+        if lectura is None or not self.indice_hoja.construir(self.worksheet, *lectura):
+            self.ultimo_error_sincronizacion = "No se encontraron las columnas de código y stock en la hoja"
+            return False
+        return True
+    
     def limpiar_encabezados_duplicados(self):
         """Limpia encabezados duplicados en la hoja de Google Sheets"""
         if self.gc and self.worksheet:
@@ -1083,27 +1135,11 @@ La hoja debe tener:
     def sincronizar_manual(self):
         """Sincronización manual con Google Sheets"""
         if self.gc and self.worksheet:
-            try:
-                # Mostrar indicador de carga
-                self.btn_sincronizar.config(text="Sincronizando...", state='disabled')
-                self.root.update()
-                
-                # Debug: mostrar información
-                print(f"Productos en memoria: {len(self.productos)}")
-                for codigo, producto in self.productos.items():
-                    print(f"  {codigo}: stock {producto['stock']}")
-                
-                # Ejecutar sincronización
-                if self.sincronizar_con_google_sheets():
-                    messagebox.showinfo("✅ Sincronizado", "Datos sincronizados correctamente con Google Sheets")
-                else:
-                    messagebox.showerror("❌ Error", "No se pudo sincronizar con Google Sheets")
-                
-                # Restaurar botón
-                self.btn_sincronizar.config(text="🔄 Sync", state='normal')
-            except Exception as e:
-                self.btn_sincronizar.config(text="🔄 Sync", state='normal')
-                messagebox.showerror("Error", f"Error en sincronización manual: {str(e)}")
+            # La escribe el hilo de sincronización (con lock_hoja, como los demás guardados);
+            # revisar_resultados_sincronizacion avisa el resultado y restaura el botón
+            self.btn_sincronizar.config(text="Sincronizando...", state='disabled')
+            self.sincronizacion_manual = True
+            self.solicitar_guardado(completo=True)
         else:
             messagebox.showwarning("Advertencia", "No hay Google Sheets conectado")
     
@@ -1131,8 +1167,18 @@ La hoja debe tener:
         ttk.Label(input_frame, text="Código:").grid(row=0, column=0, sticky=tk.W)
         self.entry_codigo = ttk.Entry(input_frame, textvariable=self.codigo_actual, font=('Arial', 12))
         self.entry_codigo.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(10, 0))
+        
+        # El motor del lector separa los escaneos por el tiempo entre teclas (un solo temporizador)
+        self.motor_escaner = MotorEscaner(
+            leer_texto=self.codigo_actual.get,
+            limpiar_texto=lambda: self.codigo_actual.set(""),
+            procesar=self.procesar_escaneo,
+            programar=self.root.after,
+            cancelar=self.root.after_cancel
+        )
         self.entry_codigo.bind('<Return>', self.procesar_codigo)
-        self.entry_codigo.bind('<KeyRelease>', self.on_key_release)  # Restaurar detección automática
+        self.entry_codigo.bind('<KeyPress>', self.on_key_press)
+        self.entry_codigo.bind('<KeyRelease>', self.on_key_release)
         
         # Atajos de teclado globales
         self.root.bind('<Control-plus>', lambda e: self.sumar_una_unidad())
@@ -1188,6 +1234,24 @@ La hoja debe tener:
                                    style='BotonesPrincipales.TButton')
         btn_restar_uno.pack(side=tk.LEFT, padx=20, pady=10)
         
+        # Modo de escaneo: normal, recepción (+1 por escaneo) o preparación (-1 por escaneo)
+        lote_frame = ttk.Frame(btn_principales_frame)
+        lote_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        ttk.Radiobutton(lote_frame, text="Normal", variable=self.modo_escaneo, value=MODO_NORMAL,
+                        command=self.cambiar_modo_escaneo).pack(side=tk.LEFT, padx=5)
+        ttk.Radiobutton(lote_frame, text="📦 Recepción (+1)", variable=self.modo_escaneo, value=MODO_RECEPCION,
+                        command=self.cambiar_modo_escaneo).pack(side=tk.LEFT, padx=5)
+        ttk.Radiobutton(lote_frame, text="🚚 Preparación (-1)", variable=self.modo_escaneo, value=MODO_PREPARACION,
+                        command=self.cambiar_modo_escaneo).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Button(lote_frame, text="✅ Confirmar Lote", 
+                  command=self.confirmar_lote).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(lote_frame, text="↩️ Deshacer Último", 
+                  command=self.deshacer_escaneo).pack(side=tk.RIGHT, padx=5)
+        self.label_lote = ttk.Label(lote_frame, text="", font=('Arial', 10, 'bold'))
+        self.label_lote.pack(side=tk.RIGHT, padx=10)
+        
 
         
         # Botones secundarios (casos especiales)
@@ -1203,8 +1267,12 @@ La hoja debe tener:
                   command=self.dar_baja_stock).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_secundarios, text="🔄 Actualizar Registro de Productos", 
                   command=self.actualizar_registro_productos).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_secundarios, text="📥 Importar Archivo", 
+                  command=self.importar_archivo_publicaciones).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_secundarios, text="📊 Ver Reporte", 
                   command=self.mostrar_reporte).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_secundarios, text="🔔 Alertas", 
+                  command=self.mostrar_alertas).pack(side=tk.LEFT, padx=5)
         
         # Frame para información del producto
         info_frame = ttk.LabelFrame(main_frame, text="Información del Producto", padding="10")
@@ -1238,6 +1306,19 @@ La hoja debe tener:
         ttk.Label(titulo_frame, text="Inventario", font=('Arial', 12, 'bold')).grid(row=0, column=0, sticky=tk.W)
         self.label_ultima_actualizacion = ttk.Label(titulo_frame, text="", font=('Arial', 9))
         self.label_ultima_actualizacion.grid(row=0, column=1, sticky=tk.E)
+        self.label_indicadores = ttk.Label(titulo_frame, text="", font=('Arial', 9))
+        self.label_indicadores.grid(row=1, column=0, columnspan=3, sticky=tk.W, pady=(3, 0))
+        self.label_alerta = ttk.Label(titulo_frame, text="", font=('Arial', 9, 'bold'))
+        self.label_alerta.grid(row=1, column=3, columnspan=2, sticky=tk.E, pady=(3, 0))
+        
+        # Búsqueda por código o palabras del título (filtra la tabla mientras se escribe)
+        ttk.Label(titulo_frame, text="🔍 Buscar:").grid(row=0, column=2, sticky=tk.E, padx=(15, 5))
+        self.filtro_var = tk.StringVar()
+        ttk.Entry(titulo_frame, textvariable=self.filtro_var, width=30).grid(row=0, column=3, sticky=tk.E)
+        self.filtro_var.trace_add('write', lambda *args: self.filtrar_tabla())
+        self.busqueda_aproximada = tk.BooleanVar(value=False)
+        ttk.Checkbutton(titulo_frame, text="Aproximada", variable=self.busqueda_aproximada,
+                        command=self.filtrar_tabla).grid(row=0, column=4, sticky=tk.E, padx=(5, 0))
         
         # Crear Treeview
         columns = ('Título', 'Código', 'Producto', 'Stock', 'Stock Mín', 'Precio Costo')
@@ -1262,12 +1343,21 @@ La hoja debe tener:
         
         # Evento de selección
         self.tabla.bind('<<TreeviewSelect>>', self.seleccionar_producto)
+        # Filas de la tabla indexadas por código (actualizaciones fila por fila)
+        if self.tabla_virtual:
+            self.vista_tabla = TablaVirtual(self.tabla, scrollbar, self.valores_fila)
+        else:
+            self.vista_tabla = VistaTabla(self.tabla, self.valores_fila)
         
         # Status bar
         self.status_var = tk.StringVar()
         self.status_var.set(f"{self.status_google_sheets} | Listo para escanear")
         status_bar = ttk.Label(main_frame, textvariable=self.status_var, relief=tk.SUNKEN)
-        status_bar.grid(row=6, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(10, 0))
+        status_bar.grid(row=6, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(10, 0))
+        
+        # Movimientos guardados en la bandeja de salida que todavía no llegaron a la hoja
+        self.label_bandeja = ttk.Label(main_frame, text="📤 Al día", relief=tk.SUNKEN)
+        self.label_bandeja.grid(row=6, column=2, sticky=(tk.W, tk.E), pady=(10, 0), padx=(5, 0))
         
         # Establecer foco en el campo de código inmediatamente
         self.entry_codigo.focus()
@@ -1278,20 +1368,31 @@ La hoja debe tener:
         self.entry_codigo.select_range(0, tk.END)  # Seleccionar todo el texto si hay alguno
         self.status_var.set("Listo para escanear")
     
-
-    
     def procesar_codigo(self, event=None):
-        """Procesa el código escaneado automáticamente"""
-        codigo = self.codigo_actual.get().strip()
-        if codigo and len(codigo) > 0:
-            # Procesar inmediatamente
-            self.buscar_producto_por_codigo(codigo)
-            # Limpiar campo automáticamente
-            self.codigo_actual.set("")
-            # Volver el foco al campo para el siguiente escaneo
+        """Enter en el campo de código: el motor del lector cierra el código y lo encola"""
+        self.motor_escaner.enter()
+        return 'break'
+    
+    def procesar_escaneo(self, texto):
+        """Procesa un código completo de la cola del lector (una sola vez por escaneo)"""
+        cantidad, codigo = interpretar_escaneo(texto)
+        if codigo is None:
+            # Solo la cantidad ('12*' o código de cantidad): se aplica al próximo producto
+            self.cantidad_pendiente = cantidad
+            self.status_var.set(f"✖️ Cantidad {cantidad}: escanee el producto")
             self.entry_codigo.focus()
-            # Seleccionar todo el texto para facilitar el siguiente escaneo
-            self.entry_codigo.select_range(0, tk.END)
+            return
+        if cantidad is None:
+            cantidad, self.cantidad_pendiente = self.cantidad_pendiente, None
+        
+        if cantidad is not None:
+            self.aplicar_cantidad(codigo, cantidad)
+        elif self.modo_escaneo.get() != MODO_NORMAL:
+            self.contar_escaneo(codigo)
+        else:
+            self.buscar_producto_por_codigo(codigo)
+        # Volver el foco al campo para el siguiente escaneo
+        self.entry_codigo.focus()
     
     def buscar_producto_por_codigo(self, codigo):
         """Busca un producto por su código automáticamente"""
@@ -1335,52 +1436,74 @@ La hoja debe tener:
         for label in self.labels_info.values():
             label.config(text="", foreground='black')  # Resetear color
     
-
-    
-
-    
-    def activar_modo_edicion(self, codigo, stock_anterior):
-        """Activa el modo de edición para un producto específico"""
-        if self.modo_edicion_activo:
-            messagebox.showwarning("Modo de Edición Activo", 
-                                 f"Ya hay una edición en curso para el producto {self.producto_en_edicion}.\n"
-                                 "Complete la operación actual antes de hacer otro cambio.")
+    def activar_modo_edicion(self, codigo):
+        """Activa el modo de edición de un producto y guarda la versión leída"""
+        if not self.verificar_modo_edicion(codigo):
             return False
         
-        self.modo_edicion_activo = True
-        self.producto_en_edicion = codigo
-        self.stock_anterior = stock_anterior
+        self.productos_en_edicion[codigo] = self.inventario.version(codigo)
         
         # Cambiar color de fondo para indicar modo de edición
         self.root.configure(bg='#fff3cd')  # Amarillo claro
-        self.status_var.set(f"🛡️ MODO EDICIÓN: {codigo} (Stock anterior: {stock_anterior})")
+        self.status_var.set(f"🛡️ MODO EDICIÓN: {codigo} (Stock anterior: {self.productos[codigo]['stock']})")
         
         return True
     
-    def desactivar_modo_edicion(self):
-        """Desactiva el modo de edición"""
-        self.modo_edicion_activo = False
-        self.producto_en_edicion = None
-        self.stock_anterior = None
+    def desactivar_modo_edicion(self, codigo):
+        """Desactiva el modo de edición de un producto"""
+        self.productos_en_edicion.pop(codigo, None)
+        if self.productos_en_edicion:
+            return
         
         # Restaurar color de fondo
         self.root.configure(bg='#f0f0f0')
         self.status_var.set(f"{self.status_google_sheets} | Listo para escanear")
     
-    def verificar_modo_edicion(self, codigo=None):
-        """Verifica si se puede realizar una operación en modo de edición"""
-        if self.modo_edicion_activo:
-            if codigo and codigo != self.producto_en_edicion:
-                messagebox.showwarning("Modo de Edición Activo", 
-                                     f"No puede modificar el producto {codigo} mientras hay una edición en curso para {self.producto_en_edicion}.")
-                return False
-            elif not codigo:
-                messagebox.showwarning("Modo de Edición Activo", 
-                                     f"No puede realizar esta operación mientras hay una edición en curso para {self.producto_en_edicion}.")
-                return False
+    def verificar_modo_edicion(self, *codigos):
+        """Verifica que ninguno de los productos tenga una edición en curso"""
+        en_edicion = [codigo for codigo in codigos if codigo in self.productos_en_edicion]
+        if en_edicion:
+            messagebox.showwarning("Modo de Edición Activo", 
+                                 f"Hay una edición en curso para el producto {en_edicion[0]}.\n"
+                                 "Complete esa operación antes de volver a modificarlo.")
+            return False
         return True
     
-
+    def confirmar_movimiento(self, codigo, delta):
+        """Pide confirmación sin bloquear la ventana: mientras tanto se pueden escanear otros productos"""
+        if not self.activar_modo_edicion(codigo):
+            return
+        
+        stock_anterior = self.productos[codigo]['stock']
+        self.mostrar_confirmacion_stock(
+            codigo, stock_anterior, stock_anterior + delta, f"{delta:+d}",
+            al_responder=lambda confirmado: self.aplicar_movimiento_confirmado(codigo, delta, confirmado))
+    
+    def aplicar_movimiento_confirmado(self, codigo, delta, confirmado):
+        """Aplica el movimiento confirmado si el producto no cambió mientras se confirmaba"""
+        try:
+            if not confirmado:
+                return
+            self.inventario.mover(codigo, delta, version=self.productos_en_edicion[codigo])
+        except ProductoModificado:
+            messagebox.showwarning("Producto Modificado", 
+                                 f"El stock de {codigo} cambió mientras se confirmaba "
+                                 f"(stock actual: {self.productos[codigo]['stock']}).\n"
+                                 "No se aplicó el cambio; vuelva a intentarlo.")
+            self.actualizar_tabla(codigo)
+            return
+        except StockInsuficiente:
+            messagebox.showwarning("Advertencia", f"No hay stock disponible de {self.productos[codigo]['producto']}")
+            return
+        finally:
+            self.desactivar_modo_edicion(codigo)
+        
+        self.actualizar_tabla(codigo)
+        # Guardar en segundo plano (la interfaz no espera a Google Sheets)
+        self.solicitar_guardado()
+        # Si mientras tanto se escaneó otro producto, queda seleccionado
+        if self.labels_info['Código:'].cget("text") == codigo:
+            self.deseleccionar_producto()
     
     def actualizar_registro_productos(self):
         """Actualiza el registro de productos desde Google Sheets"""
@@ -1388,107 +1511,70 @@ La hoja debe tener:
             messagebox.showerror("Error", "No hay conexión con Google Sheets. Configure las credenciales primero.")
             return
         
+        # Sin escrituras en la hoja entre su lectura y la reaplicación de la bandeja
+        if not self.lock_hoja.acquire(blocking=False):
+            self.status_var.set(f"{self.status_google_sheets} | ⏳ Esperando el guardado en curso...")
+            self.root.after(200, self.actualizar_registro_productos)
+            return
         try:
             # Mostrar indicador de carga
             self.status_var.set("Actualizando registro de productos desde Google Sheets...")
             self.root.update()
             
-            # Leer datos de Google Sheets
-            datos_raw = self.worksheet.get_all_values()
+            # Leer solo las columnas que se usan (código, título, stock, stock min y precio costo)
+            lectura = leer_columnas(self.worksheet)
             
-            if len(datos_raw) < 2:
-                messagebox.showwarning("Hoja Vacía", "La hoja de Google Sheets no tiene datos de productos.")
-                return
-            
-            # Buscar encabezados válidos
-            headers = None
-            fila_inicio_datos = None
-            
-            for i, fila in enumerate(datos_raw):
-                if any('codigo' in str(celda).lower() or 'stock' in str(celda).lower() for celda in fila):
-                    headers = fila
-                    fila_inicio_datos = i + 1
-                    break
-            
-            if headers is None:
+            if lectura is None:
                 messagebox.showerror("Error", "No se encontraron encabezados válidos en la hoja.")
                 return
             
-            # Buscar columnas
-            columna_titulo = None
-            columna_codigo = None
-            columna_stock = None
-            columna_stock_min = None
-            columna_precio = None
-            
-            print(f"Buscando columnas en encabezados: {headers}")
+            columnas, filas = lectura
+            print(f"Columnas encontradas: {columnas}")
             
-            for i, header in enumerate(headers):
-                header_clean = str(header).strip().lower()
-                print(f"  Columna {i}: '{header}' -> '{header_clean}'")
-                
-                if 'título' in header_clean or 'titulo' in header_clean:
-                    columna_titulo = i
-                    print(f"    -> Columna título encontrada en posición {i}")
-                elif 'codigo' in header_clean or 'código' in header_clean:
-                    columna_codigo = i
-                    print(f"    -> Columna código encontrada en posición {i}")
-                elif header_clean == 'stock' and 'min' not in header_clean:
-                    columna_stock = i
-                    print(f"    -> Columna stock encontrada en posición {i}")
-                elif 'stock min' in header_clean or 'stockmin' in header_clean or header_clean == 'stock min':
-                    columna_stock_min = i
-                    print(f"    -> Columna stock min encontrada en posición {i}")
-                elif 'precio costo' in header_clean or 'preciocosto' in header_clean:
-                    columna_precio = i
-                    print(f"    -> Columna precio encontrada en posición {i}")
-            
-            print(f"Columnas encontradas:")
-            print(f"  Título: {columna_titulo}")
-            print(f"  Código: {columna_codigo}")
-            print(f"  Stock: {columna_stock}")
-            print(f"  Stock Min: {columna_stock_min}")
-            print(f"  Precio: {columna_precio}")
-            
-            if columna_codigo is None:
+            if 'codigo' not in columnas:
                 messagebox.showerror("Error", "No se encontró la columna de código en la hoja.")
                 return
             
-            # Limpiar productos existentes
-            self.productos.clear()
+            if not filas:
+                messagebox.showwarning("Hoja Vacía", "La hoja de Google Sheets no tiene datos de productos.")
+                return
+            
+            # Aprovechar la misma lectura para rehacer el índice de filas
+            self.construir_indice_hoja((columnas, filas))
+            
+            productos_nuevos = {}
             
             # Procesar cada fila de datos
             productos_agregados = 0
             
-            for fila in datos_raw[fila_inicio_datos:]:
-                if len(fila) > max(filter(None, [columna_titulo, columna_codigo, columna_stock, columna_stock_min, columna_precio])):
-                    codigo = str(fila[columna_codigo]).strip()
+            for _, fila in filas:
+                codigo = fila['codigo']
+                
+                if codigo:  # Solo procesar si hay código
+                    titulo = fila.get('titulo', '')
+                    stock = int(fila['stock']) if fila.get('stock', '').isdigit() else 0
+                    stock_min = int(fila['stock_min']) if fila.get('stock_min', '').isdigit() else 0
+                    precio = fila.get('precio_costo', '')
                     
-                    if codigo:  # Solo procesar si hay código
-                        titulo = str(fila[columna_titulo]).strip() if columna_titulo is not None and len(fila) > columna_titulo else ""
-                        stock = int(fila[columna_stock]) if columna_stock is not None and len(fila) > columna_stock and str(fila[columna_stock]).strip().isdigit() else 0
-                        stock_min = int(fila[columna_stock_min]) if columna_stock_min is not None and len(fila) > columna_stock_min and str(fila[columna_stock_min]).strip().isdigit() else 0
-                        precio = str(fila[columna_precio]).strip() if columna_precio is not None and len(fila) > columna_precio else ""
-                        
-                        print(f"Procesando producto {codigo}:")
-                        print(f"  Título: '{titulo}'")
-                        print(f"  Stock: {stock}")
-                        print(f"  Stock Min: {stock_min}")
-                        print(f"  Precio: '{precio}'")
-                        
-                        # Crear producto
-                        producto = {
-                            'codigo': codigo,
-                            'titulo': titulo,
-                            'producto': titulo,  # Usar título como nombre del producto
-                            'stock': stock,
-                            'stock_min': stock_min,
-                            'precio_costo': precio,
-                            'ultima_actualizacion': datetime.now().strftime("%Y-%m-%d %H:%M")
-                        }
-                        
-                        self.productos[codigo] = producto
-                        productos_agregados += 1
+                    # Crear producto
+                    producto = {
+                        'codigo': codigo,
+                        'titulo': titulo,
+                        'producto': titulo,  # Usar título como nombre del producto
+                        'stock': stock,
+                        'stock_min': stock_min,
+                        'precio_costo': precio,
+                        'ultima_actualizacion': datetime.now().strftime("%Y-%m-%d %H:%M")
+                    }
+                    
+                    productos_nuevos[codigo] = producto
+                    productos_agregados += 1
+            
+            # Reemplazar los productos existentes y volver a aplicar los movimientos sin enviar
+            self.inventario.cargar_productos(productos_nuevos, reemplazar=True)
+            # Un solo guardado en segundo plano: envía los movimientos reaplicados (al confirmarse
+            # se vacía la bandeja) y deja la copia local completa
+            self.solicitar_guardado(completo=True)
             
             # Actualizar tabla
             self.actualizar_tabla()
@@ -1496,17 +1582,49 @@ La hoja debe tener:
             # Actualizar última actualización
             self.label_ultima_actualizacion.config(text=f"Última actualización: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
             
-            # Guardar datos localmente
-            self.guardar_datos()
-            
             messagebox.showinfo("Éxito", f"Se actualizaron {productos_agregados} productos desde Google Sheets.")
             self.status_var.set(f"{self.status_google_sheets} | Registro actualizado: {productos_agregados} productos")
             
         except Exception as e:
             messagebox.showerror("Error", f"Error al actualizar registro de productos:\n{str(e)}")
             self.status_var.set(f"{self.status_google_sheets} | Error al actualizar registro")
+        finally:
+            self.lock_hoja.release()
     
-
+    def importar_archivo_publicaciones(self):
+        """Importa la exportación de publicaciones del marketplace desde un archivo CSV"""
+        from tkinter import filedialog
+        
+        filename = filedialog.askopenfilename(
+            title="Seleccionar exportación de publicaciones",
+            filetypes=[
+                ("Archivos CSV", "*.csv"),
+                ("Todos los archivos", "*.*")
+            ],
+            initialdir=os.getcwd()
+        )
+        if not filename:
+            return
+        
+        try:
+            self.status_var.set("Importando publicaciones desde el archivo...")
+            self.root.update()
+            
+            # El archivo se lee de a una fila, sin pasar por Google Sheets
+            productos_importados = self.inventario.importar_productos(
+                producto for _, producto in leer_publicaciones(filename))
+            # Un solo guardado completo en segundo plano (copia local y movimientos sin enviar
+            # reaplicados sobre el stock del archivo); si falla se avisa en pantalla
+            self.avisar_error_guardado = True
+            self.solicitar_guardado(completo=True)
+            
+            self.actualizar_tabla()
+            
+            messagebox.showinfo("Éxito", f"Se importaron {productos_importados} productos desde el archivo.")
+            self.status_var.set(f"Publicaciones importadas: {productos_importados} productos")
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al importar el archivo:\n{str(e)}")
+            self.status_var.set("Error al importar el archivo")
     
     def dar_alta_stock(self):
         """Da de alta stock a un producto"""
@@ -1516,13 +1634,10 @@ La hoja debe tener:
                                              f"Cantidad a agregar al stock de {self.productos[codigo]['producto']}:",
                                              minvalue=1)
             if cantidad:
-                self.productos[codigo]['stock'] += cantidad
-                self.productos[codigo]['ultima_actualizacion'] = datetime.now().strftime("%Y-%m-%d %H:%M")
-                self.actualizar_tabla()
-                self.guardar_datos()
-                
-                # Sincronizar con Google Sheets automáticamente
-                self.sincronizar_con_google_sheets()
+                self.inventario.mover(codigo, cantidad)
+                self.actualizar_tabla(codigo)
+                # Guardar en segundo plano (la interfaz no espera a Google Sheets)
+                self.solicitar_guardado()
                 
                 self.deseleccionar_producto()
                 self.status_var.set(f"Stock actualizado: +{cantidad} unidades")
@@ -1537,13 +1652,10 @@ La hoja debe tener:
                                              f"Cantidad a quitar del stock de {self.productos[codigo]['producto']}:",
                                              minvalue=1, maxvalue=self.productos[codigo]['stock'])
             if cantidad:
-                self.productos[codigo]['stock'] -= cantidad
-                self.productos[codigo]['ultima_actualizacion'] = datetime.now().strftime("%Y-%m-%d %H:%M")
-                self.actualizar_tabla()
-                self.guardar_datos()
-                
-                # Sincronizar con Google Sheets automáticamente
-                self.sincronizar_con_google_sheets()
+                self.inventario.mover(codigo, -cantidad)
+                self.actualizar_tabla(codigo)
+                # Guardar en segundo plano (la interfaz no espera a Google Sheets)
+                self.solicitar_guardado()
                 
                 self.deseleccionar_producto()
                 self.status_var.set(f"Stock actualizado: -{cantidad} unidades")
@@ -1554,40 +1666,7 @@ La hoja debe tener:
         """Suma una unidad al stock del producto seleccionado"""
         codigo = self.labels_info['Código:'].cget("text")
         if codigo and codigo in self.productos:
-            # Verificar modo de edición
-            if not self.verificar_modo_edicion(codigo):
-                return
-            
-            stock_anterior = self.productos[codigo]['stock']
-            stock_nuevo = stock_anterior + 1
-            
-            # Mostrar confirmación
-            if self.mostrar_confirmacion_stock(codigo, stock_anterior, stock_nuevo, "+1"):
-                # Activar modo de edición
-                if not self.activar_modo_edicion(codigo, stock_anterior):
-                    return
-                
-                try:
-                    # Aplicar cambio
-                    self.productos[codigo]['stock'] = stock_nuevo
-                    self.productos[codigo]['ultima_actualizacion'] = datetime.now().strftime("%Y-%m-%d %H:%M")
-                    self.actualizar_tabla()
-                    self.guardar_datos()
-                    
-                    # Sincronizar con Google Sheets automáticamente
-                    self.sincronizar_con_google_sheets()
-                    
-                    # Desactivar modo de edición
-                    self.desactivar_modo_edicion()
-                    self.deseleccionar_producto()
-                    
-                except Exception as e:
-                    # En caso de error, revertir cambios
-                    self.productos[codigo]['stock'] = stock_anterior
-                    self.actualizar_tabla()
-                    self.guardar_datos()
-                    self.desactivar_modo_edicion()
-                    messagebox.showerror("Error", f"Error al actualizar stock: {str(e)}\nCambios revertidos.")
+            self.confirmar_movimiento(codigo, +1)
         else:
             messagebox.showwarning("Advertencia", "Primero seleccione un producto")
     
@@ -1595,93 +1674,52 @@ La hoja debe tener:
         """Resta una unidad al stock del producto seleccionado"""
         codigo = self.labels_info['Código:'].cget("text")
         if codigo and codigo in self.productos:
-            # Verificar modo de edición
-            if not self.verificar_modo_edicion(codigo):
-                return
-            
             if self.productos[codigo]['stock'] > 0:
-                stock_anterior = self.productos[codigo]['stock']
-                stock_nuevo = stock_anterior - 1
-                
-                # Mostrar confirmación
-                if self.mostrar_confirmacion_stock(codigo, stock_anterior, stock_nuevo, "-1"):
-                    # Activar modo de edición
-                    if not self.activar_modo_edicion(codigo, stock_anterior):
-                        return
-                    
-                    try:
-                        # Aplicar cambio
-                        self.productos[codigo]['stock'] = stock_nuevo
-                        self.productos[codigo]['ultima_actualizacion'] = datetime.now().strftime("%Y-%m-%d %H:%M")
-                        self.actualizar_tabla()
-                        self.guardar_datos()
-                        
-                        # Sincronizar con Google Sheets automáticamente
-                        self.sincronizar_con_google_sheets()
-                        
-                        # Desactivar modo de edición
-                        self.desactivar_modo_edicion()
-                        self.deseleccionar_producto()
-                        
-                    except Exception as e:
-                        # En caso de error, revertir cambios
-                        self.productos[codigo]['stock'] = stock_anterior
-                        self.actualizar_tabla()
-                        self.guardar_datos()
-                        self.desactivar_modo_edicion()
-                        messagebox.showerror("Error", f"Error al actualizar stock: {str(e)}\nCambios revertidos.")
+                self.confirmar_movimiento(codigo, -1)
             else:
                 messagebox.showwarning("Advertencia", f"No hay stock disponible de {self.productos[codigo]['producto']}")
         else:
             messagebox.showwarning("Advertencia", "Primero seleccione un producto")
     
-    def mostrar_confirmacion_stock(self, codigo, stock_anterior, stock_nuevo, operacion):
-        """Muestra una ventana de confirmación para cambios de stock"""
-        producto = self.productos[codigo]['producto']
-        
-        # Crear ventana de confirmación
-        ventana_confirmacion = tk.Toplevel(self.root)
-        ventana_confirmacion.title("Confirmar Cambio de Stock")
-        ventana_confirmacion.geometry("400x250")
-        ventana_confirmacion.resizable(False, False)
-        
-        # Centrar la ventana
-        ventana_confirmacion.transient(self.root)
-        ventana_confirmacion.grab_set()
-        
-        # Contenido
-        ttk.Label(ventana_confirmacion, text="¿Deseas confirmar esta acción?", 
-                 font=('Arial', 12, 'bold')).pack(pady=(20, 10))
-        
-        ttk.Label(ventana_confirmacion, text=f"Producto: {producto}", 
-                 font=('Arial', 10, 'bold')).pack(pady=5)
-        
-        ttk.Label(ventana_confirmacion, text=f"Operación: {operacion}", 
-                 font=('Arial', 10)).pack(pady=5)
-        
-        ttk.Label(ventana_confirmacion, text=f"Stock anterior: {stock_anterior}", 
-                 font=('Arial', 10)).pack(pady=5)
-        
-        ttk.Label(ventana_confirmacion, text=f"Stock actualizado: {stock_nuevo}", 
-                 font=('Arial', 10, 'bold'), foreground='green').pack(pady=5)
-        
-        # Variable para el resultado
-        resultado = tk.BooleanVar()
-        
-        # Botones
-        btn_frame = ttk.Frame(ventana_confirmacion)
-        btn_frame.pack(pady=20)
-        
-        ttk.Button(btn_frame, text="✅ Confirmar", 
-                  command=lambda: [resultado.set(True), ventana_confirmacion.destroy()]).pack(side=tk.LEFT, padx=10)
-        ttk.Button(btn_frame, text="❌ Cancelar", 
-                  command=lambda: [resultado.set(False), ventana_confirmacion.destroy()]).pack(side=tk.LEFT, padx=10)
+    def aplicar_cantidad(self, codigo, cantidad):
+        """Aplica '12*código' como un solo movimiento (o una sola línea del lote)"""
+        if codigo not in self.productos:
+            self.root.bell()
+            self.status_var.set(f"❌ Producto no encontrado: {codigo} (cantidad {cantidad} descartada)")
+            return
         
-        # Esperar a que se cierre la ventana
-        ventana_confirmacion.wait_window()
+        if self.modo_escaneo.get() != MODO_NORMAL:
+            # Recepción/preparación: la cantidad entra al lote como un solo escaneo
+            self.contar_escaneo(codigo, cantidad)
+            return
         
-        return resultado.get()
-    
+        # Modo normal: '12*' suma 12 y '-3*' resta 3, sin diálogos
+        if not self.verificar_modo_edicion(codigo):
+            return
+        producto = self.productos[codigo]
+        delta = cantidad
+        try:
+            self.inventario.mover(codigo, delta)
+        except StockInsuficiente:
+            messagebox.showwarning("Advertencia", f"No hay stock suficiente de {nombre_de(producto)} "
+                                                  f"(stock: {producto['stock']}, movimiento: {delta:+d})")
+            return
+        self.actualizar_tabla(codigo)
+        # Guardar en segundo plano (la interfaz no espera a Google Sheets)
+        self.solicitar_guardado()
+        self.mostrar_producto(producto)
+        self.resaltar_producto_en_tabla(codigo)
+        self.status_var.set(f"Stock actualizado: {delta:+d} unidades de {nombre_de(producto)}")
+
+    def aplicar_lote(self):
+        """Aplica el lote solo si ningún producto del lote se está editando"""
+        if self.verificar_modo_edicion(*(codigo for codigo, _ in self.lote.movimientos())):
+            super().aplicar_lote()
+
+    def guardar_lote(self):
+        """Un solo guardado (y una sincronización por bloques) para todo el lote"""
+        self.solicitar_guardado()
+
     def deseleccionar_producto(self):
         """Deselecciona el producto actual y limpia la información"""
         # Limpiar información del producto
@@ -1701,81 +1739,86 @@ La hoja debe tener:
     
     def resaltar_producto_en_tabla(self, codigo):
         """Resalta el producto en la tabla"""
-        # Limpiar selección previa
-        self.tabla.selection_remove(self.tabla.selection())
-        
-        # Buscar y seleccionar el producto
-        for item in self.tabla.get_children():
-            if self.tabla.item(item)['values'][1] == codigo:  # Ahora el código está en la posición 1
-                self.tabla.selection_add(item)
-                self.tabla.see(item)  # Hacer visible el item
-                break
+        # Seleccionar por el índice por código (sin recorrer la tabla) y hacerlo visible
+        self.vista_tabla.seleccionar(codigo)
     
-
+    def on_key_press(self, event):
+        """Pasa cada tecla del campo de código al motor del lector"""
+        if event.char and event.char.isprintable():
+            self.motor_escaner.tecla(event.char)
+        elif event.char or event.keysym in ('BackSpace', 'Delete'):
+            # Borrar, pegar (Ctrl+V) u otra edición: el contenido es manual
+            self.motor_escaner.edicion()
     
     def on_key_release(self, event):
-        """Maneja la liberación de teclas para detectar escaneos automáticos"""
-        codigo = self.codigo_actual.get().strip()
-        
-        # Si se presiona Enter, no hacer nada (ya se maneja en procesar_codigo)
+        """Actualiza la barra de estado mientras se escribe un código"""
         if event.keysym == 'Return':
             return
-        
-        # Si hay un código y tiene una longitud típica de código de barras (8-13 dígitos)
-        if codigo and len(codigo) >= 8 and len(codigo) <= 13:
-            # Verificar si es un código de barras válido (solo números)
-            if codigo.isdigit():
-                # Pequeño delay para asegurar que el escaneo esté completo
-                self.root.after(200, self.verificar_y_procesar_codigo)
-            else:
-                # Código con letras, probablemente escritura manual
-                self.status_var.set(f"{self.status_google_sheets} | Escribiendo código...")
+        if self.codigo_actual.get().strip():
+            self.status_var.set(f"{self.status_google_sheets} | Escribiendo código...")
         else:
-            # Actualizar estado para escritura manual
-            if codigo:
-                self.status_var.set(f"{self.status_google_sheets} | Escribiendo código...")
-            else:
-                self.status_var.set(f"{self.status_google_sheets} | Listo para escanear")
-    
-    def verificar_y_procesar_codigo(self):
-        """Verifica si el código actual es válido y lo procesa automáticamente"""
-        codigo = self.codigo_actual.get().strip()
-        
-        # Solo procesar si el código sigue siendo válido
-        if codigo and len(codigo) >= 8 and len(codigo) <= 13 and codigo.isdigit():
-            # Verificar si el código existe en la base de datos
-            if codigo in self.productos:
-                # Procesar automáticamente
-                self.procesar_codigo()
-            else:
-                # Código no encontrado, pero mantenerlo para que el usuario pueda presionar Enter
-                self.status_var.set(f"{self.status_google_sheets} | ❌ Código no encontrado: {codigo}")
+            self.status_var.set(f"{self.status_google_sheets} | Listo para escanear")
     
     def seleccionar_producto(self, event):
         """Maneja la selección de un producto en la tabla"""
         selection = self.tabla.selection()
         if selection:
-            item = self.tabla.item(selection[0])
-            codigo = item['values'][1]  # Ahora el código está en la posición 1 (segunda columna)
+            # El Treeview devuelve los códigos numéricos como int: se usa el índice por item
+            codigo = self.vista_tabla.codigo(selection[0])
             if codigo in self.productos:
                 self.mostrar_producto(self.productos[codigo])
     
-    def actualizar_tabla(self):
-        """Actualiza la tabla de productos"""
-        # Limpiar tabla
-        for item in self.tabla.get_children():
-            self.tabla.delete(item)
-        
-        # Agregar productos
-        for producto in self.productos.values():
-            self.tabla.insert('', 'end', values=(
-                producto.get('titulo', producto.get('producto', '')),
-                producto['codigo'],
-                producto['producto'],
-                producto['stock'],
-                producto.get('stock_min', producto.get('stock_minimo', 0)),
-                producto.get('precio_costo', producto.get('precio', '$0.00'))
-            ))
+    def actualizar_tabla(self, codigo=None):
+        """Actualiza la fila del producto indicado (o toda la tabla si no se indica)"""
+        # Índices, totales y alertas ya los actualizó el motor de inventario
+        self.actualizar_indicadores()
+        if codigo is None:
+            self.filtrar_tabla()
+            return
+        
+        # Con un filtro activo solo se tocan las filas que están en el resultado
+        if self.codigos_filtrados is not None and codigo not in self.codigos_filtrados:
+            return
+        if codigo in self.productos:
+            self.vista_tabla.actualizar(codigo, self.productos[codigo])
+        else:
+            self.vista_tabla.quitar(codigo)
+    
+    def actualizar_indicadores(self):
+        """Muestra en el encabezado de la tabla los totales del inventario (sin recorrer el catálogo)"""
+        agregados = self.inventario.agregados
+        self.label_indicadores.config(
+            text=f"📦 {agregados.total_productos} productos | "
+                 f"⚠️ {len(agregados.stock_bajo)} con stock bajo | "
+                 f"💰 ${agregados.valor_total:,.2f}")
+    
+    def filtrar_tabla(self):
+        """Muestra en la tabla solo los productos que coinciden con el texto de búsqueda"""
+        texto = self.filtro_var.get().strip()
+        if not texto:
+            self.codigos_filtrados = None
+            self.vista_tabla.reconstruir(self.productos)
+            return
+        
+        # La búsqueda aproximada devuelve los códigos del más parecido al menos parecido
+        codigos = self.inventario.buscar(texto, aproximada=self.busqueda_aproximada.get())
+        self.codigos_filtrados = set(codigos)
+        self.vista_tabla.reconstruir({codigo: self.productos[codigo] for codigo in codigos})
+        if len(codigos) >= LIMITE_RESULTADOS:
+            self.status_var.set(f"🔍 Se muestran los primeros {len(codigos)} resultados")
+        else:
+            self.status_var.set(f"🔍 {len(codigos)} productos encontrados")
+    
+    def valores_fila(self, producto):
+        """Valores de las columnas de la tabla para un producto"""
+        return (
+            producto.get('titulo', producto.get('producto', '')),
+            producto['codigo'],
+            producto['producto'],
+            producto['stock'],
+            producto.get('stock_min', producto.get('stock_minimo', 0)),
+            producto.get('precio_costo', producto.get('precio', '$0.00'))
+        )
     
     def mostrar_reporte(self):
         """Muestra un reporte del inventario"""
@@ -1783,26 +1826,12 @@ La hoja debe tener:
             messagebox.showinfo("Reporte", "No hay productos en el inventario")
             return
         
-        # Calcular estadísticas
-        total_productos = len(self.productos)
-        stock_bajo = sum(1 for p in self.productos.values() 
-                        if p['stock'] <= p.get('stock_min', p.get('stock_minimo', 0)))
-        
-        # Calcular valor total (usar precio_costo o precio)
-        valor_total = 0
-        for p in self.productos.values():
-            precio = p.get('precio_costo', p.get('precio', 0))
-            if isinstance(precio, str) and precio.startswith('$'):
-                try:
-                    precio = float(precio.replace('$', '').replace(',', ''))
-                except:
-                    precio = 0
-            elif isinstance(precio, str):
-                try:
-                    precio = float(precio)
-                except:
-                    precio = 0
-            valor_total += p['stock'] * precio
+        # Estadísticas mantenidas al día en cada movimiento (no se recorre el catálogo)
+        resumen = self.inventario.resumen()
+        total_productos = resumen['total_productos']
+        stock_bajo = resumen['stock_bajo']
+        valor_total = resumen['valor_total']
+        productos_bajos = resumen['productos_stock_bajo']
         
         reporte = f"""REPORTE DE INVENTARIO
         ========================
@@ -1814,10 +1843,11 @@ La hoja debe tener:
         Productos con stock bajo:
         """
         
-        for producto in self.productos.values():
-            stock_min = producto.get('stock_min', producto.get('stock_minimo', 0))
-            if producto['stock'] <= stock_min:
-                reporte += f"\n• {producto.get('titulo', producto['producto'])} (Stock: {producto['stock']}, Mínimo: {stock_min})"
+        for producto in productos_bajos:
+            reporte += f"\n• {producto.get('titulo', producto['producto'])} (Stock: {producto['stock']}, Mínimo: {stock_minimo_de(producto)})"
+        
+        if self.gc and self.worksheet:
+            reporte += f"\n\nGoogle Sheets: {self.limitador.resumen()}"
         
         # Crear ventana de reporte
         ventana_reporte = tk.Toplevel(self.root)
@@ -1832,40 +1862,33 @@ La hoja debe tener:
     def cargar_datos(self):
         """Carga los datos desde Google Sheets o archivo local"""
         if self.gc and self.worksheet:
+            # Sin escrituras en la hoja entre su lectura y la reaplicación de la bandeja; si el hilo
+            # de sincronización está escribiendo se reintenta enseguida (la interfaz no lo espera)
+            if not self.lock_hoja.acquire(blocking=False):
+                self.root.after(200, self.cargar_datos)
+                return
             try:
-                # Cargar desde Google Sheets con formato específico
-                try:
-                    datos = self.worksheet.get_all_records()
-                except Exception as e:
-                    if "duplicates" in str(e).lower():
-                        # Si hay encabezados duplicados, usar método alternativo
-                        datos_raw = self.worksheet.get_all_values()
-                        if datos_raw:
-                            # Usar la primera fila como headers y el resto como datos
-                            headers = datos_raw[0]
-                            datos = []
-                            for fila in datos_raw[1:]:
-                                if len(fila) >= len(headers):
-                                    fila_dict = {}
-                                    for i, header in enumerate(headers):
-                                        if header:  # Solo usar headers no vacíos
-                                            fila_dict[header] = fila[i] if i < len(fila) else ''
-                                    datos.append(fila_dict)
-                    else:
-                        raise e
+                # Leer solo las columnas de código, título y stock (no la hoja completa)
+                lectura = leer_columnas(self.worksheet, ('codigo', 'titulo', 'stock'))
+                if lectura is None or 'codigo' not in lectura[0]:
+                    raise ValueError("No se encontró la columna de código en la hoja")
+                columnas, filas = lectura
+                
+                # La misma lectura sirve para armar el índice de filas
+                self.construir_indice_hoja(lectura)
                 
                 productos_cargados = 0
+                productos_hoja = {}
                 
-                for fila in datos:
-                    # Buscar en columna E (Código de producto)
-                    codigo_producto = fila.get('Codigo de producto (seller custom field)', '')
-                    stock = fila.get('Stock', '')
-                    titulo = fila.get('TÍTULO', '')
+                for _, fila in filas:
+                    codigo_producto = fila['codigo']
+                    stock = fila.get('stock', '')
+                    titulo = fila.get('titulo', '')
                     
                     if codigo_producto and codigo_producto.strip():  # Ignorar filas vacías
                         try:
                             stock_int = int(stock) if stock else 0
-                            self.productos[codigo_producto.strip()] = {
+                            productos_hoja[codigo_producto.strip()] = {
                                 'codigo': codigo_producto.strip(),
                                 'producto': titulo if titulo else f"Producto {codigo_producto}",
                                 'stock': stock_int,
@@ -1876,7 +1899,7 @@ La hoja debe tener:
                             productos_cargados += 1
                         except ValueError:
                             # Si el stock no es un número válido, usar 0
-                            self.productos[codigo_producto.strip()] = {
+                            productos_hoja[codigo_producto.strip()] = {
                                 'codigo': codigo_producto.strip(),
                                 'producto': titulo if titulo else f"Producto {codigo_producto}",
                                 'stock': 0,
@@ -1886,74 +1909,116 @@ La hoja debe tener:
                             }
                             productos_cargados += 1
                 
+                if self.inventario.cargar_productos(productos_hoja):
+                    # Se envían en un solo guardado por bloques; al confirmarse se vacía la bandeja
+                    self.solicitar_guardado()
                 self.status_var.set(f"Datos cargados desde Google Sheets: {productos_cargados} productos")
             except Exception as e:
                 messagebox.showerror("Error", f"Error al cargar datos: {str(e)}")
+            finally:
+                self.lock_hoja.release()
         else:
             # Cargar desde archivo local
             try:
-                if os.path.exists('stock_local.json'):
-                    with open('stock_local.json', 'r', encoding='utf-8') as f:
-                        self.productos = json.load(f)
+                if self.inventario.cargar_local():
                     self.status_var.set(f"Datos cargados localmente: {len(self.productos)} productos")
             except Exception as e:
                 self.status_var.set("No se encontraron datos previos")
         
         self.actualizar_tabla()
     
-    def guardar_datos(self):
-        """Guarda los datos en Google Sheets o archivo local"""
-        if self.gc and self.worksheet:
+    def persistir_pendientes(self, completo=False):
+        """Guarda los productos modificados (o todos) y devuelve (exito, mensaje)
+        
+        Se ejecuta en el hilo de sincronización: no usa widgets de Tk.
+        """
+        if not (self.gc and self.worksheet):
+            if not completo and not self.inventario.codigos_modificados:
+                return True, None
             try:
-                # Obtener todos los datos actuales con manejo de encabezados duplicados
-                try:
-                    datos_actuales = self.worksheet.get_all_records()
-                except Exception as e:
-                    if "duplicates" in str(e).lower():
-                        # Si hay encabezados duplicados, usar método alternativo
-                        datos_actuales = self.worksheet.get_all_values()
-                        if datos_actuales:
-                            # Usar la primera fila como headers y el resto como datos
-                            headers = datos_actuales[0]
-                            datos_actuales = []
-                            for fila in datos_actuales[1:]:
-                                if len(fila) >= len(headers):
-                                    fila_dict = {}
-                                    for i, header in enumerate(headers):
-                                        if header:  # Solo usar headers no vacíos
-                                            fila_dict[header] = fila[i] if i < len(fila) else ''
-                                    datos_actuales.append(fila_dict)
-                    else:
-                        raise e
-                
-                # Actualizar solo la columna E (Stock) para productos que existen
-                productos_actualizados = 0
-                for i, fila in enumerate(datos_actuales, start=2):  # Empezar desde fila 2 (después de headers)
-                    codigo_producto = fila.get('Codigo de producto (seller custom field)', '').strip()
-                    
-                    if codigo_producto and codigo_producto in self.productos:
-                        # Actualizar stock en columna E (Stock)
-                        nuevo_stock = self.productos[codigo_producto]['stock']
-                        self.worksheet.update(f'E{i}', nuevo_stock)
-                        productos_actualizados += 1
-                
-                print(f"Stock actualizado en Google Sheets: {productos_actualizados} productos")
-                
-                self.status_var.set("Stock actualizado en Google Sheets")
+                self.inventario.guardar_local(completo)
             except Exception as e:
-                messagebox.showerror("Error", f"Error al guardar en Google Sheets: {str(e)}")
+                return False, f"Error al guardar datos: {str(e)}"
+            return True, "Datos guardados localmente"
+        
+        # La escritura en la hoja se hace sin lock_datos (la interfaz no espera a la red);
+        # lock_hoja deja las recargas desde la hoja para después de confirmar lo escrito
+        with self.lock_hoja:
+            with self.inventario.lock_datos:
+                # Stock y último movimiento de la bandeja tomados juntos: lo que se escribe en la
+                # hoja incluye exactamente los movimientos hasta esa secuencia
+                pendientes, secuencia, stocks = self.inventario.tomar_pendientes()
+            if not pendientes and not completo:
+                return True, None
+            
+            # Escribir en la hoja solo el stock de los productos modificados
+            if not self.sincronizar_con_google_sheets(None if completo else list(pendientes), mostrar_errores=False, stocks=stocks):
+                return False, f"No se pudo sincronizar con Google Sheets: {self.ultimo_error_sincronizacion or 'celdas sin actualizar'}"
+            with self.inventario.lock_datos:
+                # La hoja ya tiene esos movimientos: se quitan de la bandeja de salida
+                self.inventario.confirmar_pendientes(pendientes, secuencia)
+                if completo:
+                    # Copia local completa (recargas e importaciones)
+                    try:
+                        self.inventario.almacen.guardar(self.productos)
+                    except Exception as e:
+                        return False, f"Stock actualizado en Google Sheets, pero no se guardó la copia local: {str(e)}"
+        return True, f"Stock actualizado en Google Sheets ({self.resumen_sincronizacion})"
+    
+    def solicitar_guardado(self, completo=False):
+        """Pide al hilo de sincronización que guarde los cambios pendientes (o todo el catálogo)"""
+        self.sincronizador.solicitar(completo)
+        self.status_var.set(f"{self.status_google_sheets} | ⏳ Guardando cambios...")
+    
+    def revisar_resultados_sincronizacion(self):
+        """Muestra los resultados del hilo de sincronización y los reintentos (se repite con root.after)"""
+        aviso = self.limitador.tomar_aviso()
+        if aviso:
+            self.status_var.set(f"{self.status_google_sheets} | ⏳ {aviso}")
+        for exito, mensaje in self.sincronizador.resultados_pendientes():
+            if mensaje:
+                icono = "✅" if exito else "❌"
+                self.status_var.set(f"{self.status_google_sheets} | {icono} {mensaje}")
+            if self.avisar_error_guardado and not exito:
+                self.avisar_error_guardado = False
+                messagebox.showerror("Error", f"No se pudo guardar lo importado (se reintenta solo):\n{mensaje}")
+            elif not self.sincronizador.completo_pendiente():
+                self.avisar_error_guardado = False
+            if self.sincronizacion_manual and (not exito or not self.sincronizador.completo_pendiente()):
+                self.sincronizacion_manual = False
+                self.btn_sincronizar.config(text="🔄 Sync", state='normal')
+                if exito:
+                    messagebox.showinfo("✅ Sincronizado", "Datos sincronizados correctamente con Google Sheets")
+                else:
+                    messagebox.showerror("❌ Error", f"No se pudo sincronizar con Google Sheets:\n{mensaje}")
+        
+        pendientes = len(self.inventario.bandeja_salida or ())
+        self.label_bandeja.config(text=f"📤 {pendientes} sin enviar" if pendientes else "📤 Al día")
+        self.root.after(200, self.revisar_resultados_sincronizacion)
+    
+    def guardar_datos(self, completo=False):
+        """Guarda en Google Sheets o archivo local los productos modificados (o todos si completo=True)"""
+        exito, mensaje = self.persistir_pendientes(completo)
+        if exito:
+            if mensaje:
+                self.status_var.set(mensaje)
         else:
-            # Guardar en archivo local
-            try:
-                with open('stock_local.json', 'w', encoding='utf-8') as f:
-                    json.dump(self.productos, f, ensure_ascii=False, indent=2)
-                self.status_var.set("Datos guardados localmente")
-            except Exception as e:
-                messagebox.showerror("Error", f"Error al guardar datos: {str(e)}")
+            messagebox.showerror("Error", mensaje)
+        return exito
     
     def ejecutar(self):
         """Ejecuta la aplicación"""
         self.root.mainloop()
+        
+        # Terminar el hilo de sincronización y guardar lo que haya quedado pendiente
+        self.sincronizador.detener()
+        exito, mensaje = self.persistir_pendientes()
+        if not exito:
+            print(f"Cambios sin guardar al cerrar: {mensaje}")
+        
+        # Compactar el diario local al cerrar
+        if not (self.gc and self.worksheet):
+            self.inventario.cerrar()
 
 if __name__ == "__main__":
     app = SistemaControlStock()
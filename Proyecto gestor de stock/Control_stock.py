@@ -6,8 +6,19 @@ from datetime import datetime
 import json
 import os
 from typing import Dict, List, Optional
+from almacenamiento import crear_almacen
+from hojas_google import escribir_tabla, actualizar_rangos
+from limite_llamadas import LimitadorLlamadas, HojaLimitada
+from sincronizador import SincronizadorFondo
+from vista_tabla import VistaTabla, TablaVirtual
+from indice_busqueda import LIMITE_RESULTADOS
+from escaner import MotorEscaner, interpretar_escaneo
+from inventario import Inventario, StockInsuficiente
+from ventana_comun import VentanaServicioStock, VentanaLote, VentanaAlertas, VentanaConfirmacion
+from modelo import nombre_de
+from recepcion import LoteMovimientos, MODO_NORMAL, MODO_RECEPCION, MODO_PREPARACION
 
-class SistemaControlStock:
+class SistemaControlStock(VentanaServicioStock, VentanaLote, VentanaAlertas, VentanaConfirmacion):
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("Sistema de Control de Stock")
@@ -18,16 +29,65 @@ class SistemaControlStock:
         self.sheet_name = "Control_Stock"
         self.gc = None
         self.worksheet = None
+        self.filas_en_hoja = None  # Filas escritas en la hoja (para limpiar solo las sobrantes)
+        self.fila_por_codigo = {}  # Código -> número de fila en la hoja
+        # Todas las llamadas a la hoja pasan por el límite de pedidos (reintenta los 429/5xx)
+        self.limitador = LimitadorLlamadas()
+        # Las escrituras en la hoja (con sus esperas y reintentos) van en un hilo aparte
+        self.sincronizador = SincronizadorFondo(self.persistir_pendientes)
+        
+        # Almacenamiento local: "journal" (diario de movimientos), "sqlite" (base indexada)
+        # o "json" (archivo completo)
+        self.modo_almacenamiento = "journal"
+        
+        # Servicio de stock compartido ("host:puerto", ver servicio_stock.py): con varias
+        # terminales, el servicio tiene el inventario y esta ventana solo lo maneja.
+        # None: inventario propio (Google Sheets o almacenamiento local)
+        self.servidor_stock = None
+        
+        # Catálogo, movimientos y cambios pendientes (sin Tk); la interfaz solo lo maneja
+        if self.servidor_stock:
+            self.inventario = self.conectar_servicio_stock()
+        else:
+            self.inventario = Inventario(crear_almacen(self.modo_almacenamiento))
+        # Avisos de reposición: solo cuando un producto cruza su stock mínimo
+        self.inventario.alertas.al_cruzar = self.al_cruzar_minimo
+        
+        # Tabla virtual: el Treeview muestra solo las filas visibles (para catálogos grandes);
+        # con False se cargan todas las filas en el Treeview
+        self.tabla_virtual = True
+        
+        self.codigos_filtrados = None  # Códigos que muestra la tabla filtrada (None: todos)
         
         # Variables
-        self.productos = {}
         self.codigo_actual = tk.StringVar()
+        
+        # Recepción/preparación rápida: los escaneos se cuentan en memoria y se confirman en lote
+        self.modo_escaneo = tk.StringVar(value=MODO_NORMAL)
+        self.lote = LoteMovimientos()
+        # Cantidad indicada antes del producto ('12*' o código de cantidad) para el próximo escaneo
+        self.cantidad_pendiente = None
         self.status_google_sheets = "⏳ Configurando..."
         
-        self.setup_google_sheets()
+        if self.servidor_stock:
+            self.status_google_sheets = f"🖧 Servicio de stock {self.servidor_stock}"
+        else:
+            self.setup_google_sheets()
         self.crear_interfaz()
         self.cargar_datos()
         
+        if self.servidor_stock:
+            self.root.report_callback_exception = self.reportar_error_interfaz
+            self.revisar_eventos_servicio()
+        elif self.gc and self.worksheet:
+            self.sincronizador.iniciar()
+            self.revisar_resultados_sincronizacion()
+        
+    @property
+    def productos(self):
+        """Catálogo del motor de inventario"""
+        return self.inventario.productos
+    
     def setup_google_sheets(self):
         """Configura la conexión con Google Sheets"""
         try:
@@ -44,11 +104,12 @@ class SistemaControlStock:
                 
                 # Intentar abrir la hoja existente o crear una nueva
                 try:
-                    self.worksheet = self.gc.open(self.sheet_name).sheet1
+                    hoja = self.limitador.llamar(lambda: self.gc.open(self.sheet_name).sheet1)
+                    self.worksheet = HojaLimitada(hoja, self.limitador)
                 except gspread.SpreadsheetNotFound:
                     # Crear nueva hoja
-                    spreadsheet = self.gc.create(self.sheet_name)
-                    self.worksheet = spreadsheet.sheet1
+                    spreadsheet = self.limitador.llamar(self.gc.create, self.sheet_name)
+                    self.worksheet = HojaLimitada(spreadsheet.sheet1, self.limitador)
                     # Configurar encabezados
                     headers = ['Código', 'Producto', 'Stock Actual', 'Stock Mínimo', 'Última Actualización', 'Precio']
                     self.worksheet.append_row(headers)
@@ -89,8 +150,18 @@ class SistemaControlStock:
         ttk.Label(input_frame, text="Código:").grid(row=0, column=0, sticky=tk.W)
         self.entry_codigo = ttk.Entry(input_frame, textvariable=self.codigo_actual, font=('Arial', 12))
         self.entry_codigo.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(10, 0))
+        
+        # El motor del lector separa los escaneos por el tiempo entre teclas (un solo temporizador)
+        self.motor_escaner = MotorEscaner(
+            leer_texto=self.codigo_actual.get,
+            limpiar_texto=lambda: self.codigo_actual.set(""),
+            procesar=self.procesar_escaneo,
+            programar=self.root.after,
+            cancelar=self.root.after_cancel
+        )
         self.entry_codigo.bind('<Return>', self.procesar_codigo)
-        self.entry_codigo.bind('<KeyRelease>', self.on_key_release)  # Restaurar detección automática
+        self.entry_codigo.bind('<KeyPress>', self.on_key_press)
+        self.entry_codigo.bind('<KeyRelease>', self.on_key_release)
         
         # Atajos de teclado globales
         self.root.bind('<Control-plus>', lambda e: self.sumar_una_unidad())
@@ -122,6 +193,24 @@ class SistemaControlStock:
                                    style='BotonesPrincipales.TButton')
         btn_restar_uno.pack(side=tk.LEFT, padx=20, pady=10)
         
+        # Modo de escaneo: normal, recepción (+1 por escaneo) o preparación (-1 por escaneo)
+        lote_frame = ttk.Frame(btn_principales_frame)
+        lote_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        ttk.Radiobutton(lote_frame, text="Normal", variable=self.modo_escaneo, value=MODO_NORMAL,
+                        command=self.cambiar_modo_escaneo).pack(side=tk.LEFT, padx=5)
+        ttk.Radiobutton(lote_frame, text="📦 Recepción (+1)", variable=self.modo_escaneo, value=MODO_RECEPCION,
+                        command=self.cambiar_modo_escaneo).pack(side=tk.LEFT, padx=5)
+        ttk.Radiobutton(lote_frame, text="🚚 Preparación (-1)", variable=self.modo_escaneo, value=MODO_PREPARACION,
+                        command=self.cambiar_modo_escaneo).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Button(lote_frame, text="✅ Confirmar Lote", 
+                  command=self.confirmar_lote).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(lote_frame, text="↩️ Deshacer Último", 
+                  command=self.deshacer_escaneo).pack(side=tk.RIGHT, padx=5)
+        self.label_lote = ttk.Label(lote_frame, text="", font=('Arial', 10, 'bold'))
+        self.label_lote.pack(side=tk.RIGHT, padx=10)
+        
         # Botones secundarios (casos especiales)
         btn_secundarios_frame = ttk.LabelFrame(main_frame, text="Acciones Secundarias", padding="10")
         btn_secundarios_frame.grid(row=3, column=0, columnspan=3, pady=(0, 10), sticky=(tk.W, tk.E))
@@ -137,6 +226,8 @@ class SistemaControlStock:
                   command=self.agregar_producto).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_secundarios, text="📊 Ver Reporte", 
                   command=self.mostrar_reporte).pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_secundarios, text="🔔 Alertas", 
+                  command=self.mostrar_alertas).pack(side=tk.LEFT, padx=5)
         
         # Frame para información del producto
         info_frame = ttk.LabelFrame(main_frame, text="Información del Producto", padding="10")
@@ -159,9 +250,26 @@ class SistemaControlStock:
         tabla_frame = ttk.LabelFrame(main_frame, text="Inventario", padding="10")
         tabla_frame.grid(row=5, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
         tabla_frame.columnconfigure(0, weight=1)
-        tabla_frame.rowconfigure(0, weight=1)
+        tabla_frame.rowconfigure(1, weight=1)
         main_frame.rowconfigure(5, weight=1)
         
+        # Búsqueda por código o nombre (filtra la tabla mientras se escribe)
+        busqueda_frame = ttk.Frame(tabla_frame)
+        busqueda_frame.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 5))
+        busqueda_frame.columnconfigure(1, weight=1)
+        
+        ttk.Label(busqueda_frame, text="🔍 Buscar:").grid(row=0, column=0, sticky=tk.W, padx=(0, 5))
+        self.filtro_var = tk.StringVar()
+        ttk.Entry(busqueda_frame, textvariable=self.filtro_var).grid(row=0, column=1, sticky=(tk.W, tk.E))
+        self.filtro_var.trace_add('write', lambda *args: self.filtrar_tabla())
+        self.busqueda_aproximada = tk.BooleanVar(value=False)
+        ttk.Checkbutton(busqueda_frame, text="Aproximada (tolera errores)", variable=self.busqueda_aproximada,
+                        command=self.filtrar_tabla).grid(row=0, column=2, sticky=tk.W, padx=(5, 0))
+        self.label_indicadores = ttk.Label(busqueda_frame, text="", font=('Arial', 9))
+        self.label_indicadores.grid(row=0, column=3, sticky=tk.E, padx=(15, 0))
+        self.label_alerta = ttk.Label(busqueda_frame, text="", font=('Arial', 9, 'bold'))
+        self.label_alerta.grid(row=1, column=0, columnspan=4, sticky=tk.W, pady=(3, 0))
+        
         # Crear Treeview
         columns = ('Código', 'Producto', 'Stock', 'Stock Mín', 'Precio Costo', 'Última Actualización')
         self.tabla = ttk.Treeview(tabla_frame, columns=columns, show='headings', height=8)
@@ -178,11 +286,16 @@ class SistemaControlStock:
         scrollbar = ttk.Scrollbar(tabla_frame, orient=tk.VERTICAL, command=self.tabla.yview)
         self.tabla.configure(yscrollcommand=scrollbar.set)
         
-        self.tabla.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.tabla.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
         
         # Evento de selección
         self.tabla.bind('<<TreeviewSelect>>', self.seleccionar_producto)
+        # Filas de la tabla indexadas por código (actualizaciones fila por fila)
+        if self.tabla_virtual:
+            self.vista_tabla = TablaVirtual(self.tabla, scrollbar, self.valores_fila)
+        else:
+            self.vista_tabla = VistaTabla(self.tabla, self.valores_fila)
         
         # Status bar
         self.status_var = tk.StringVar()
@@ -202,17 +315,30 @@ class SistemaControlStock:
 
     
     def procesar_codigo(self, event=None):
-        """Procesa el código escaneado automáticamente"""
-        codigo = self.codigo_actual.get().strip()
-        if codigo and len(codigo) > 0:
-            # Procesar inmediatamente
-            self.buscar_producto_por_codigo(codigo)
-            # Limpiar campo automáticamente
-            self.codigo_actual.set("")
-            # Volver el foco al campo para el siguiente escaneo
+        """Enter en el campo de código: el motor del lector cierra el código y lo encola"""
+        self.motor_escaner.enter()
+        return 'break'
+    
+    def procesar_escaneo(self, texto):
+        """Procesa un código completo de la cola del lector (una sola vez por escaneo)"""
+        cantidad, codigo = interpretar_escaneo(texto)
+        if codigo is None:
+            # Solo la cantidad ('12*' o código de cantidad): se aplica al próximo producto
+            self.cantidad_pendiente = cantidad
+            self.status_var.set(f"✖️ Cantidad {cantidad}: escanee el producto")
             self.entry_codigo.focus()
-            # Seleccionar todo el texto para facilitar el siguiente escaneo
-            self.entry_codigo.select_range(0, tk.END)
+            return
+        if cantidad is None:
+            cantidad, self.cantidad_pendiente = self.cantidad_pendiente, None
+        
+        if cantidad is not None:
+            self.aplicar_cantidad(codigo, cantidad)
+        elif self.modo_escaneo.get() != MODO_NORMAL:
+            self.contar_escaneo(codigo)
+        else:
+            self.buscar_producto_por_codigo(codigo)
+        # Volver el foco al campo para el siguiente escaneo
+        self.entry_codigo.focus()
     
     def buscar_producto_por_codigo(self, codigo):
         """Busca un producto por su código automáticamente"""
@@ -274,8 +400,8 @@ class SistemaControlStock:
                     'ultima_actualizacion': datetime.now().strftime("%Y-%m-%d %H:%M")
                 }
                 
-                self.productos[codigo] = nuevo_producto
-                self.actualizar_tabla()
+                self.inventario.agregar_producto(nuevo_producto)
+                self.actualizar_tabla(codigo)
                 self.guardar_datos()
                 self.mostrar_producto(nuevo_producto)
                 self.status_var.set(f"Producto agregado: {producto}")
@@ -296,9 +422,8 @@ class SistemaControlStock:
                                              f"Cantidad a agregar al stock de {self.productos[codigo]['producto']}:",
                                              minvalue=1)
             if cantidad:
-                self.productos[codigo]['stock'] += cantidad
-                self.productos[codigo]['ultima_actualizacion'] = datetime.now().strftime("%Y-%m-%d %H:%M")
-                self.actualizar_tabla()
+                self.inventario.mover(codigo, cantidad)
+                self.actualizar_tabla(codigo)
                 self.guardar_datos()
                 self.deseleccionar_producto()
                 self.status_var.set(f"Stock actualizado: +{cantidad} unidades")
@@ -313,9 +438,8 @@ class SistemaControlStock:
                                              f"Cantidad a quitar del stock de {self.productos[codigo]['producto']}:",
                                              minvalue=1, maxvalue=self.productos[codigo]['stock'])
             if cantidad:
-                self.productos[codigo]['stock'] -= cantidad
-                self.productos[codigo]['ultima_actualizacion'] = datetime.now().strftime("%Y-%m-%d %H:%M")
-                self.actualizar_tabla()
+                self.inventario.mover(codigo, -cantidad)
+                self.actualizar_tabla(codigo)
                 self.guardar_datos()
                 self.deseleccionar_producto()
                 self.status_var.set(f"Stock actualizado: -{cantidad} unidades")
@@ -326,17 +450,7 @@ class SistemaControlStock:
         """Suma una unidad al stock del producto seleccionado"""
         codigo = self.labels_info['Código:'].cget("text")
         if codigo and codigo in self.productos:
-            stock_anterior = self.productos[codigo]['stock']
-            stock_nuevo = stock_anterior + 1
-            
-            # Mostrar confirmación
-            if self.mostrar_confirmacion_stock(codigo, stock_anterior, stock_nuevo, "+1"):
-                # Aplicar cambio
-                self.productos[codigo]['stock'] = stock_nuevo
-                self.productos[codigo]['ultima_actualizacion'] = datetime.now().strftime("%Y-%m-%d %H:%M")
-                self.actualizar_tabla()
-                self.guardar_datos()
-                self.deseleccionar_producto()
+            self.confirmar_movimiento(codigo, +1)
         else:
             messagebox.showwarning("Advertencia", "Primero seleccione un producto")
     
@@ -345,68 +459,60 @@ class SistemaControlStock:
         codigo = self.labels_info['Código:'].cget("text")
         if codigo and codigo in self.productos:
             if self.productos[codigo]['stock'] > 0:
-                stock_anterior = self.productos[codigo]['stock']
-                stock_nuevo = stock_anterior - 1
-                
-                # Mostrar confirmación
-                if self.mostrar_confirmacion_stock(codigo, stock_anterior, stock_nuevo, "-1"):
-                    # Aplicar cambio
-                    self.productos[codigo]['stock'] = stock_nuevo
-                    self.productos[codigo]['ultima_actualizacion'] = datetime.now().strftime("%Y-%m-%d %H:%M")
-                    self.actualizar_tabla()
-                    self.guardar_datos()
-                    self.deseleccionar_producto()
+                self.confirmar_movimiento(codigo, -1)
             else:
                 messagebox.showwarning("Advertencia", f"No hay stock disponible de {self.productos[codigo]['producto']}")
         else:
             messagebox.showwarning("Advertencia", "Primero seleccione un producto")
     
-    def mostrar_confirmacion_stock(self, codigo, stock_anterior, stock_nuevo, operacion):
-        """Muestra una ventana de confirmación para cambios de stock"""
-        producto = self.productos[codigo]['producto']
-        
-        # Crear ventana de confirmación
-        ventana_confirmacion = tk.Toplevel(self.root)
-        ventana_confirmacion.title("Confirmar Cambio de Stock")
-        ventana_confirmacion.geometry("400x250")
-        ventana_confirmacion.resizable(False, False)
-        
-        # Centrar la ventana
-        ventana_confirmacion.transient(self.root)
-        ventana_confirmacion.grab_set()
-        
-        # Contenido
-        ttk.Label(ventana_confirmacion, text="¿Deseas confirmar esta acción?", 
-                 font=('Arial', 12, 'bold')).pack(pady=(20, 10))
-        
-        ttk.Label(ventana_confirmacion, text=f"Producto: {producto}", 
-                 font=('Arial', 10, 'bold')).pack(pady=5)
-        
-        ttk.Label(ventana_confirmacion, text=f"Operación: {operacion}", 
-                 font=('Arial', 10)).pack(pady=5)
-        
-        ttk.Label(ventana_confirmacion, text=f"Stock anterior: {stock_anterior}", 
-                 font=('Arial', 10)).pack(pady=5)
-        
-        ttk.Label(ventana_confirmacion, text=f"Stock actualizado: {stock_nuevo}", 
-                 font=('Arial', 10, 'bold'), foreground='green').pack(pady=5)
-        
-        # Variable para el resultado
-        resultado = tk.BooleanVar()
-        
-        # Botones
-        btn_frame = ttk.Frame(ventana_confirmacion)
-        btn_frame.pack(pady=20)
-        
-        ttk.Button(btn_frame, text="✅ Confirmar", 
-                  command=lambda: [resultado.set(True), ventana_confirmacion.destroy()]).pack(side=tk.LEFT, padx=10)
-        ttk.Button(btn_frame, text="❌ Cancelar", 
-                  command=lambda: [resultado.set(False), ventana_confirmacion.destroy()]).pack(side=tk.LEFT, padx=10)
+    def confirmar_movimiento(self, codigo, delta):
+        """Pide confirmación sin bloquear la ventana: mientras tanto se pueden escanear otros productos"""
+        stock_anterior = self.productos[codigo]['stock']
+        self.mostrar_confirmacion_stock(
+            codigo, stock_anterior, stock_anterior + delta, f"{delta:+d}",
+            al_responder=lambda confirmado: self.aplicar_movimiento_confirmado(codigo, delta, confirmado))
+    
+    def aplicar_movimiento_confirmado(self, codigo, delta, confirmado):
+        """Aplica el movimiento confirmado sobre el stock actual (pudo cambiar mientras se confirmaba)"""
+        if not confirmado:
+            return
+        try:
+            self.inventario.mover(codigo, delta)
+        except StockInsuficiente:
+            messagebox.showwarning("Advertencia", f"No hay stock disponible de {self.productos[codigo]['producto']}")
+            return
+        self.actualizar_tabla(codigo)
+        self.guardar_datos()
+        # Si mientras tanto se escaneó otro producto, queda seleccionado
+        if self.labels_info['Código:'].cget("text") == codigo:
+            self.deseleccionar_producto()
+    
+    def aplicar_cantidad(self, codigo, cantidad):
+        """Aplica '12*código' como un solo movimiento (o una sola línea del lote)"""
+        if codigo not in self.productos:
+            self.root.bell()
+            self.status_var.set(f"❌ Producto no encontrado: {codigo} (cantidad {cantidad} descartada)")
+            return
         
-        # Esperar a que se cierre la ventana
-        ventana_confirmacion.wait_window()
+        if self.modo_escaneo.get() != MODO_NORMAL:
+            # Recepción/preparación: la cantidad entra al lote como un solo escaneo
+            self.contar_escaneo(codigo, cantidad)
+            return
         
-        return resultado.get()
+        # Modo normal: '12*' suma 12 y '-3*' resta 3, sin diálogos
+        producto = self.productos[codigo]
+        delta = cantidad
+        try:
+            self.inventario.mover(codigo, delta)
+        except StockInsuficiente:
+            messagebox.showwarning("Advertencia", f"No hay stock suficiente de {nombre_de(producto)} "
+                                                  f"(stock: {producto['stock']}, movimiento: {delta:+d})")
+            return
+        self.actualizar_tabla(codigo)
+        self.guardar_datos()
+        self.mostrar_producto(producto)
+        self.resaltar_producto_en_tabla(codigo)
+        self.status_var.set(f"Stock actualizado: {delta:+d} unidades de {nombre_de(producto)}")
     
     def deseleccionar_producto(self):
         """Deselecciona el producto actual y limpia la información"""
@@ -427,15 +533,8 @@ class SistemaControlStock:
     
     def resaltar_producto_en_tabla(self, codigo):
         """Resalta el producto en la tabla"""
-        # Limpiar selección previa
-        self.tabla.selection_remove(self.tabla.selection())
-        
-        # Buscar y seleccionar el producto
-        for item in self.tabla.get_children():
-            if self.tabla.item(item)['values'][0] == codigo:
-                self.tabla.selection_add(item)
-                self.tabla.see(item)  # Hacer visible el item
-                break
+        # Seleccionar por el índice por código (sin recorrer la tabla) y hacerlo visible
+        self.vista_tabla.seleccionar(codigo)
     
     def preguntar_agregar_producto(self, codigo):
         """Pregunta si agregar un producto nuevo de forma menos intrusiva"""
@@ -466,69 +565,83 @@ class SistemaControlStock:
                     # Auto-cerrar después de 10 segundos
         ventana_agregar.after(10000, ventana_agregar.destroy)
     
+    def on_key_press(self, event):
+        """Pasa cada tecla del campo de código al motor del lector"""
+        if event.char and event.char.isprintable():
+            self.motor_escaner.tecla(event.char)
+        elif event.char or event.keysym in ('BackSpace', 'Delete'):
+            # Borrar, pegar (Ctrl+V) u otra edición: el contenido es manual
+            self.motor_escaner.edicion()
+    
     def on_key_release(self, event):
-        """Maneja la liberación de teclas para detectar escaneos automáticos"""
-        codigo = self.codigo_actual.get().strip()
-        
-        # Si se presiona Enter, no hacer nada (ya se maneja en procesar_codigo)
+        """Actualiza la barra de estado mientras se escribe un código"""
         if event.keysym == 'Return':
             return
-        
-        # Si hay un código y tiene una longitud típica de código de barras (8-13 dígitos)
-        if codigo and len(codigo) >= 8 and len(codigo) <= 13:
-            # Verificar si es un código de barras válido (solo números)
-            if codigo.isdigit():
-                # Pequeño delay para asegurar que el escaneo esté completo
-                self.root.after(200, self.verificar_y_procesar_codigo)
-            else:
-                # Código con letras, probablemente escritura manual
-                self.status_var.set(f"{self.status_google_sheets} | Escribiendo código...")
+        if self.codigo_actual.get().strip():
+            self.status_var.set(f"{self.status_google_sheets} | Escribiendo código...")
         else:
-            # Actualizar estado para escritura manual
-            if codigo:
-                self.status_var.set(f"{self.status_google_sheets} | Escribiendo código...")
-            else:
-                self.status_var.set(f"{self.status_google_sheets} | Listo para escanear")
-    
-    def verificar_y_procesar_codigo(self):
-        """Verifica si el código actual es válido y lo procesa automáticamente"""
-        codigo = self.codigo_actual.get().strip()
-        
-        # Solo procesar si el código sigue siendo válido
-        if codigo and len(codigo) >= 8 and len(codigo) <= 13 and codigo.isdigit():
-            # Verificar si el código existe en la base de datos
-            if codigo in self.productos:
-                # Procesar automáticamente
-                self.procesar_codigo()
-            else:
-                # Código no encontrado, pero mantenerlo para que el usuario pueda presionar Enter
-                self.status_var.set(f"{self.status_google_sheets} | ❌ Código no encontrado: {codigo}")
+            self.status_var.set(f"{self.status_google_sheets} | Listo para escanear")
     
     def seleccionar_producto(self, event):
         """Maneja la selección de un producto en la tabla"""
         selection = self.tabla.selection()
         if selection:
-            item = self.tabla.item(selection[0])
-            codigo = item['values'][0]
+            # El Treeview devuelve los códigos numéricos como int: se usa el índice por item
+            codigo = self.vista_tabla.codigo(selection[0])
             if codigo in self.productos:
                 self.mostrar_producto(self.productos[codigo])
     
-    def actualizar_tabla(self):
-        """Actualiza la tabla de productos"""
-        # Limpiar tabla
-        for item in self.tabla.get_children():
-            self.tabla.delete(item)
-        
-        # Agregar productos
-        for producto in self.productos.values():
-            self.tabla.insert('', 'end', values=(
-                producto['codigo'],
-                producto['producto'],
-                producto['stock'],
-                producto['stock_minimo'],
-                f"${producto['precio']:.2f}",
-                producto['ultima_actualizacion']
-            ))
+    def actualizar_tabla(self, codigo=None):
+        """Actualiza la fila del producto indicado (o toda la tabla si no se indica)"""
+        # Índices, totales y alertas ya los actualizó el motor de inventario
+        self.actualizar_indicadores()
+        if codigo is None:
+            self.filtrar_tabla()
+            return
+        
+        # Con un filtro activo solo se tocan las filas que están en el resultado
+        if self.codigos_filtrados is not None and codigo not in self.codigos_filtrados:
+            return
+        if codigo in self.productos:
+            self.vista_tabla.actualizar(codigo, self.productos[codigo])
+        else:
+            self.vista_tabla.quitar(codigo)
+    
+    def actualizar_indicadores(self):
+        """Muestra en el encabezado de la tabla los totales del inventario (sin recorrer el catálogo)"""
+        agregados = self.inventario.agregados
+        self.label_indicadores.config(
+            text=f"📦 {agregados.total_productos} productos | "
+                 f"⚠️ {len(agregados.stock_bajo)} con stock bajo | "
+                 f"💰 ${agregados.valor_total:,.2f}")
+    
+    def filtrar_tabla(self):
+        """Muestra en la tabla solo los productos que coinciden con el texto de búsqueda"""
+        texto = self.filtro_var.get().strip()
+        if not texto:
+            self.codigos_filtrados = None
+            self.vista_tabla.reconstruir(self.productos)
+            return
+        
+        # La búsqueda aproximada devuelve los códigos del más parecido al menos parecido
+        codigos = self.inventario.buscar(texto, aproximada=self.busqueda_aproximada.get())
+        self.codigos_filtrados = set(codigos)
+        self.vista_tabla.reconstruir({codigo: self.productos[codigo] for codigo in codigos})
+        if len(codigos) >= LIMITE_RESULTADOS:
+            self.status_var.set(f"🔍 Se muestran los primeros {len(codigos)} resultados")
+        else:
+            self.status_var.set(f"🔍 {len(codigos)} productos encontrados")
+    
+    def valores_fila(self, producto):
+        """Valores de las columnas de la tabla para un producto"""
+        return (
+            producto['codigo'],
+            producto['producto'],
+            producto['stock'],
+            producto['stock_minimo'],
+            f"${producto['precio']:.2f}",
+            producto['ultima_actualizacion']
+        )
     
     def mostrar_reporte(self):
         """Muestra un reporte del inventario"""
@@ -536,10 +649,12 @@ class SistemaControlStock:
             messagebox.showinfo("Reporte", "No hay productos en el inventario")
             return
         
-        # Calcular estadísticas
-        total_productos = len(self.productos)
-        stock_bajo = sum(1 for p in self.productos.values() if p['stock'] <= p['stock_minimo'])
-        valor_total = sum(p['stock'] * p['precio'] for p in self.productos.values())
+        # Estadísticas mantenidas al día en cada movimiento (no se recorre el catálogo)
+        resumen = self.inventario.resumen()
+        total_productos = resumen['total_productos']
+        stock_bajo = resumen['stock_bajo']
+        valor_total = resumen['valor_total']
+        productos_bajos = resumen['productos_stock_bajo']
         
         reporte = f"""REPORTE DE INVENTARIO
         ========================
@@ -551,9 +666,11 @@ class SistemaControlStock:
         Productos con stock bajo:
         """
         
-        for producto in self.productos.values():
-            if producto['stock'] <= producto['stock_minimo']:
-                reporte += f"\n• {producto['producto']} (Stock: {producto['stock']}, Mínimo: {producto['stock_minimo']})"
+        for producto in productos_bajos:
+            reporte += f"\n• {producto['producto']} (Stock: {producto['stock']}, Mínimo: {producto['stock_minimo']})"
+        
+        if self.gc and self.worksheet:
+            reporte += f"\n\nGoogle Sheets: {self.limitador.resumen()}"
         
         # Crear ventana de reporte
         ventana_reporte = tk.Toplevel(self.root)
@@ -571,9 +688,12 @@ class SistemaControlStock:
             try:
                 # Cargar desde Google Sheets
                 datos = self.worksheet.get_all_records()
-                for fila in datos:
+                self.fila_por_codigo = {}
+                productos_hoja = {}
+                for numero_fila, fila in enumerate(datos, start=2):  # La fila 1 son los encabezados
                     if fila['Código']:  # Ignorar filas vacías
-                        self.productos[fila['Código']] = {
+                        self.fila_por_codigo[fila['Código']] = numero_fila
+                        productos_hoja[fila['Código']] = {
                             'codigo': fila['Código'],
                             'producto': fila['Producto'],
                             'stock': int(fila['Stock Actual']),
@@ -581,58 +701,129 @@ class SistemaControlStock:
                             'precio': float(fila['Precio']),
                             'ultima_actualizacion': fila['Última Actualización']
                         }
+                self.inventario.cargar_productos(productos_hoja)
+                self.filas_en_hoja = len(datos) + 1
                 self.status_var.set(f"Datos cargados desde Google Sheets: {len(self.productos)} productos")
             except Exception as e:
                 messagebox.showerror("Error", f"Error al cargar datos: {str(e)}")
         else:
             # Cargar desde archivo local
             try:
-                if os.path.exists('stock_local.json'):
-                    with open('stock_local.json', 'r', encoding='utf-8') as f:
-                        self.productos = json.load(f)
+                if self.inventario.cargar_local():
                     self.status_var.set(f"Datos cargados localmente: {len(self.productos)} productos")
             except Exception as e:
                 self.status_var.set("No se encontraron datos previos")
         
         self.actualizar_tabla()
     
-    def guardar_datos(self):
-        """Guarda los datos en Google Sheets o archivo local"""
-        if self.gc and self.worksheet:
-            try:
-                # Limpiar hoja
-                self.worksheet.clear()
-                
-                # Agregar encabezados
-                headers = ['Código', 'Producto', 'Stock Actual', 'Stock Mínimo', 'Última Actualización', 'Precio']
-                self.worksheet.append_row(headers)
-                
-                # Agregar datos
-                for producto in self.productos.values():
-                    self.worksheet.append_row([
-                        producto['codigo'],
-                        producto['producto'],
-                        producto['stock'],
-                        producto['stock_minimo'],
-                        producto['ultima_actualizacion'],
-                        producto['precio']
-                    ])
-                
-                self.status_var.set("Datos guardados en Google Sheets")
-            except Exception as e:
-                messagebox.showerror("Error", f"Error al guardar en Google Sheets: {str(e)}")
-        else:
-            # Guardar en archivo local
+    def fila_hoja(self, producto):
+        """Devuelve la fila de la hoja correspondiente a un producto"""
+        return [
+            producto['codigo'],
+            producto['producto'],
+            producto['stock'],
+            producto['stock_minimo'],
+            producto['ultima_actualizacion'],
+            producto['precio']
+        ]
+    
+    def guardar_hoja_completa(self):
+        """Reescribe toda la tabla de Google Sheets en bloques (sin borrar la hoja antes)"""
+        headers = ['Código', 'Producto', 'Stock Actual', 'Stock Mínimo', 'Última Actualización', 'Precio']
+        filas = [headers]
+        self.fila_por_codigo = {}
+        # Se arma en el hilo de sincronización: la interfaz no cambia productos mientras tanto
+        with self.inventario.lock_modificados:
+            for producto in self.productos.values():
+                filas.append(self.fila_hoja(producto))
+                self.fila_por_codigo[producto['codigo']] = len(filas)
+        
+        escribir_tabla(self.worksheet, filas, self.filas_en_hoja or self.worksheet.row_count)
+        self.filas_en_hoja = len(filas)
+    
+    def guardar_filas_modificadas(self, codigos):
+        """Escribe en Google Sheets solo las filas de los productos indicados"""
+        rangos = []
+        with self.inventario.lock_modificados:
+            for codigo in codigos:
+                producto = self.productos.get(codigo)
+                if producto is None:
+                    continue
+                if codigo not in self.fila_por_codigo:
+                    # Producto nuevo: va en la primera fila libre
+                    self.filas_en_hoja += 1
+                    self.fila_por_codigo[codigo] = self.filas_en_hoja
+                fila = self.fila_por_codigo[codigo]
+                rangos.append((f'A{fila}:F{fila}', [self.fila_hoja(producto)]))
+        
+        if self.worksheet.row_count < self.filas_en_hoja:
+            self.worksheet.add_rows(self.filas_en_hoja - self.worksheet.row_count)
+        
+        actualizados, fallidos = actualizar_rangos(self.worksheet, rangos)
+        if fallidos:
+            raise Exception(f"No se pudieron guardar {len(fallidos)} filas: {fallidos[0][1]}")
+    
+    def guardar_datos(self, completo=False):
+        """Guarda en Google Sheets o archivo local los productos modificados (o todos si completo=True)"""
+        if not (self.gc and self.worksheet):
+            # Guardar en archivo local (el inventario confirma solo lo que se guardó)
+            if not completo and not self.inventario.codigos_modificados:
+                return
             try:
-                with open('stock_local.json', 'w', encoding='utf-8') as f:
-                    json.dump(self.productos, f, ensure_ascii=False, indent=2)
+                self.inventario.guardar_local(completo)
                 self.status_var.set("Datos guardados localmente")
             except Exception as e:
                 messagebox.showerror("Error", f"Error al guardar datos: {str(e)}")
+            return
+        
+        # La hoja la escribe el hilo de sincronización (varios pedidos seguidos van juntos)
+        self.sincronizador.solicitar(completo)
+        self.status_var.set(f"{self.status_google_sheets} | ⏳ Guardando cambios...")
+    
+    def persistir_pendientes(self, completo=False):
+        """Escribe en Google Sheets los productos modificados (o todos) y devuelve (exito, mensaje)
+        
+        Se ejecuta en el hilo de sincronización: no usa widgets de Tk.
+        """
+        pendientes, _, _ = self.inventario.tomar_pendientes()
+        if not pendientes and not completo:
+            return True, None
+        try:
+            if completo or self.filas_en_hoja is None:
+                self.guardar_hoja_completa()
+            else:
+                self.guardar_filas_modificadas(pendientes)
+        except Exception as e:
+            return False, f"Error al guardar en Google Sheets: {str(e)}"
+        
+        # Quitar solo lo que se guardó: los cambios hechos mientras tanto siguen pendientes
+        self.inventario.confirmar_pendientes(pendientes)
+        return True, "Datos guardados en Google Sheets"
+    
+    def revisar_resultados_sincronizacion(self):
+        """Muestra los resultados del hilo de sincronización y los reintentos (se repite con root.after)"""
+        aviso = self.limitador.tomar_aviso()
+        if aviso:
+            self.status_var.set(f"{self.status_google_sheets} | ⏳ {aviso}")
+        for exito, mensaje in self.sincronizador.resultados_pendientes():
+            if mensaje:
+                icono = "✅" if exito else "❌"
+                self.status_var.set(f"{self.status_google_sheets} | {icono} {mensaje}")
+        self.root.after(200, self.revisar_resultados_sincronizacion)
     
     def ejecutar(self):
         """Ejecuta la aplicación"""
         self.root.mainloop()
+        
+        # Terminar el hilo de sincronización y guardar lo que haya quedado pendiente
+        if self.gc and self.worksheet:
+            self.sincronizador.detener()
+            exito, mensaje = self.persistir_pendientes()
+            if not exito:
+                print(f"Cambios sin guardar al cerrar: {mensaje}")
+        # Compactar el diario local al cerrar
+        if not (self.gc and self.worksheet):
+            self.inventario.cerrar()
 
 if __name__ == "__main__":
     app = SistemaControlStock()
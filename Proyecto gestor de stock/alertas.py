@@ -0,0 +1,94 @@
+"""
+Alertas de reposición
+
+MotorAlertas mantiene los productos ordenados por su margen sobre el stock
+mínimo (stock - mínimo) en una lista ordenada con bisect: los primeros son
+los más urgentes y no hace falta recorrer el catálogo para listarlos.
+
+Las alertas son por flanco: se avisa solo cuando un producto cruza el
+mínimo (baja a stock <= mínimo o vuelve a quedar por encima), no en cada
+movimiento de un producto que ya estaba bajo.
+"""
+
+from bisect import bisect_left, insort
+from collections import deque
+
+from modelo import stock_minimo_de
+
+# Cantidad de avisos que se guardan para mostrar en la ventana de alertas
+HISTORIAL_ALERTAS = 50
+
+
+def margen_de(producto):
+    """Unidades por encima del stock mínimo (0 o menos: hay que reponer)"""
+    return producto['stock'] - stock_minimo_de(producto)
+
+
+class MotorAlertas:
+    """Índice ordenado por margen sobre el mínimo que avisa cuando un producto cruza el umbral"""
+
+    def __init__(self, al_cruzar=None):
+        self.al_cruzar = al_cruzar  # (codigo, bajo) -> se llama en cada cruce del mínimo
+        self.historial = deque(maxlen=HISTORIAL_ALERTAS)  # (codigo, bajo) de los últimos cruces
+        self._entradas = []  # (margen, código) ordenadas: los más urgentes primero
+        self._margen_por_codigo = {}
+        self.cantidad_bajo = 0  # Productos con stock <= mínimo
+
+    def construir(self, productos):
+        """Ordena todo el catálogo; en una recarga avisa los cruces respecto de la carga anterior"""
+        anteriores = self._margen_por_codigo
+        margenes = getattr(productos, 'margenes', None)
+        if margenes is None:
+            self._margen_por_codigo = {codigo: margen_de(producto) for codigo, producto in productos.items()}
+        else:
+            # Tabla de SQLite: márgenes de las columnas (sin leer cada producto), corregidos
+            # con los productos de la sesión que pueden tener cambios sin guardar
+            self._margen_por_codigo = dict(margenes())
+            for producto in productos.productos_en_memoria():
+                self._margen_por_codigo[producto['codigo']] = margen_de(producto)
+        self._entradas = sorted((margen, codigo) for codigo, margen in self._margen_por_codigo.items())
+        self.cantidad_bajo = sum(1 for margen in self._margen_por_codigo.values() if margen <= 0)
+
+        # Cambios que llegaron con la recarga (por ejemplo, movimientos hechos en la hoja)
+        for codigo, margen in self._margen_por_codigo.items():
+            anterior = anteriores.get(codigo)
+            if anterior is not None and (anterior <= 0) != (margen <= 0):
+                self._avisar(codigo, margen <= 0)
+
+    def actualizar(self, codigo, producto):
+        """Reubica el producto según su nuevo margen y avisa si cruzó el mínimo"""
+        margen = margen_de(producto)
+        anterior = self._margen_por_codigo.get(codigo)
+        if anterior == margen:
+            return
+        if anterior is not None:
+            self._quitar_entrada(anterior, codigo)
+        insort(self._entradas, (margen, codigo))
+        self._margen_por_codigo[codigo] = margen
+
+        estaba_bajo = anterior is not None and anterior <= 0
+        if estaba_bajo != (margen <= 0):
+            self.cantidad_bajo += 1 if margen <= 0 else -1
+            self._avisar(codigo, margen <= 0)
+
+    def quitar(self, codigo):
+        """Quita un producto del índice (sin avisar)"""
+        anterior = self._margen_por_codigo.pop(codigo, None)
+        if anterior is not None:
+            self._quitar_entrada(anterior, codigo)
+            if anterior <= 0:
+                self.cantidad_bajo -= 1
+
+    def mas_urgentes(self, limite=20):
+        """Códigos bajo el mínimo, del más urgente al menos urgente"""
+        return [codigo for _, codigo in self._entradas[:min(limite, self.cantidad_bajo)]]
+
+    def _quitar_entrada(self, margen, codigo):
+        posicion = bisect_left(self._entradas, (margen, codigo))
+        if posicion < len(self._entradas) and self._entradas[posicion] == (margen, codigo):
+            del self._entradas[posicion]
+
+    def _avisar(self, codigo, bajo):
+        self.historial.append((codigo, bajo))
+        if self.al_cruzar is not None:
+            self.al_cruzar(codigo, bajo)
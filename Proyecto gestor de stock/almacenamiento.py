@@ -0,0 +1,429 @@
+"""
+Almacenamiento local del inventario (modo sin Google Sheets)
+
+Modos disponibles:
+- "json": reescribe stock_local.json completo en cada guardado
+- "journal": agrega cada movimiento de stock como una línea al diario
+  (stock_local.journal), o el producto completo si cambiaron otros datos,
+  y cada cierta cantidad de registros escribe una instantánea compacta en
+  stock_local.json
+- "sqlite": guarda los productos en una tabla indexada por código
+  (stock_local.db); cada guardado actualiza solo las filas tocadas. La
+  conexión se comparte entre hilos (la interfaz lee y el hilo de guardado
+  escribe) y cada uso pasa por AlmacenSQLite.lock
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+
+from modelo import stock_minimo_de, precio_de, nombre_de
+
+
+def _datos_sin_stock(producto):
+    """Campos del producto que no cambian con un movimiento de stock"""
+    return {campo: valor for campo, valor in producto.items() if campo not in ('stock', 'ultima_actualizacion')}
+
+
+class AlmacenJSON:
+    """Guarda el inventario completo en un único archivo JSON"""
+
+    def __init__(self, ruta='stock_local.json'):
+        self.ruta = ruta
+
+    def cargar(self):
+        """Devuelve el diccionario de productos guardado (vacío si no existe)"""
+        if not os.path.exists(self.ruta):
+            return {}
+        with open(self.ruta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def guardar(self, productos, codigos=None):
+        """Guarda los productos (en este modo siempre se reescribe el archivo)"""
+        with open(self.ruta, 'w', encoding='utf-8') as f:
+            json.dump(productos, f, ensure_ascii=False, indent=2)
+
+    def reescribe_todo(self, cantidad):
+        """Indica si guardar esa cantidad de productos escribe el catálogo entero"""
+        return True
+
+    def cerrar(self, productos=None):
+        """No hay recursos abiertos en el modo JSON"""
+        pass
+
+
+class AlmacenJournal(AlmacenJSON):
+    """Diario de movimientos de solo agregado + instantánea periódica"""
+
+    def __init__(self, ruta='stock_local.json', ruta_journal=None, registros_por_instantanea=500):
+        super().__init__(ruta)
+        self.ruta_journal = ruta_journal or os.path.splitext(ruta)[0] + '.journal'
+        self.registros_por_instantanea = registros_por_instantanea
+        self._registros = 0  # Registros escritos desde la última instantánea
+        self._stock = {}  # codigo -> último stock registrado (para calcular el delta)
+        self._datos = {}  # codigo -> últimos datos registrados sin el stock (para detectar otros cambios)
+        self._archivo = None
+
+    def cargar(self):
+        """Carga la última instantánea y reaplica los registros pendientes del diario"""
+        productos = super().cargar()
+        self._registros = 0
+
+        if os.path.exists(self.ruta_journal):
+            with open(self.ruta_journal, 'r', encoding='utf-8') as f:
+                for linea in f:
+                    try:
+                        registro = json.loads(linea)
+                    except json.JSONDecodeError:
+                        # Última línea incompleta (corte de luz, cierre forzado): se ignora
+                        continue
+                    self._aplicar_registro(productos, registro)
+                    self._registros += 1
+
+        self._recordar(productos)
+        return productos
+
+    def _recordar(self, productos):
+        """Toma el estado de los productos como el último registrado"""
+        self._stock = {codigo: p.get('stock', 0) for codigo, p in productos.items()}
+        self._datos = {codigo: _datos_sin_stock(p) for codigo, p in productos.items()}
+
+    def _aplicar_registro(self, productos, registro):
+        """Aplica un registro del diario sobre el diccionario de productos"""
+        operacion = registro.get('op')
+        codigo = registro.get('codigo')
+
+        if operacion == 'mov' and codigo in productos:
+            productos[codigo]['stock'] = registro['stock']
+            if 'ultima_actualizacion' in registro:
+                productos[codigo]['ultima_actualizacion'] = registro['ultima_actualizacion']
+        elif operacion == 'producto':
+            productos[codigo] = registro['producto']
+        elif operacion == 'baja':
+            productos.pop(codigo, None)
+
+    def guardar(self, productos, codigos=None):
+        """Registra en el diario solo los productos indicados (o instantánea completa si no se indican)"""
+        if codigos is None:
+            self.escribir_instantanea(productos)
+            return
+
+        lineas = []
+        for codigo in codigos:
+            producto = productos.get(codigo)
+            if producto is None:
+                registro = {'op': 'baja', 'codigo': codigo}
+                self._stock.pop(codigo, None)
+                self._datos.pop(codigo, None)
+            elif codigo in self._stock and self._datos.get(codigo) == _datos_sin_stock(producto):
+                # Producto conocido con los mismos datos: solo se registra el movimiento de stock
+                registro = {
+                    'op': 'mov',
+                    'codigo': codigo,
+                    'stock': producto['stock'],
+                    'delta': producto['stock'] - self._stock[codigo],
+                    'ultima_actualizacion': producto.get('ultima_actualizacion', '')
+                }
+                self._stock[codigo] = producto['stock']
+            else:
+                # Producto nuevo, reemplazado o con otros datos (nombre, precio...): se registra completo
+                registro = {'op': 'producto', 'codigo': codigo, 'producto': producto}
+                self._stock[codigo] = producto.get('stock', 0)
+                self._datos[codigo] = _datos_sin_stock(producto)
+            lineas.append(json.dumps(registro, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+        if not lineas:
+            return
+
+        if self._archivo is None:
+            self._archivo = open(self.ruta_journal, 'a', encoding='utf-8')
+        self._archivo.write(''.join(lineas))
+        self._archivo.flush()
+        os.fsync(self._archivo.fileno())
+        self._registros += len(lineas)
+
+        if self._registros >= self.registros_por_instantanea:
+            self.escribir_instantanea(productos)
+
+    def reescribe_todo(self, cantidad):
+        """Indica si guardar esa cantidad de productos llega a la instantánea (catálogo entero)"""
+        return self._registros + cantidad >= self.registros_por_instantanea
+
+    def escribir_instantanea(self, productos):
+        """Escribe una instantánea compacta y vacía el diario"""
+        temporal = self.ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(productos, f, ensure_ascii=False, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        # El reemplazo es atómico: si se corta antes de vaciar el diario, reaplicarlo
+        # sobre la nueva instantánea da el mismo resultado (los registros guardan el stock final)
+        os.replace(temporal, self.ruta)
+
+        if self._archivo is not None:
+            self._archivo.close()
+        self._archivo = open(self.ruta_journal, 'w', encoding='utf-8')
+        self._registros = 0
+        self._recordar(productos)
+
+    def cerrar(self, productos=None):
+        """Compacta el diario al salir y cierra el archivo"""
+        if productos is not None and self._registros:
+            self.escribir_instantanea(productos)
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+
+
+class TablaProductos(MutableMapping):
+    """Vista tipo diccionario de la tabla de productos de SQLite
+
+    Los productos se leen bajo demanda y se conservan en memoria solo los
+    que se consultaron, así que el catálogo completo nunca se carga entero.
+    """
+
+    def __init__(self, almacen):
+        self._almacen = almacen
+        self._cache = {}
+
+    def __getitem__(self, codigo):
+        if codigo in self._cache:
+            return self._cache[codigo]
+        fila = self._almacen.consultar_uno("SELECT datos, stock FROM productos WHERE codigo = ?", (codigo,))
+        if fila is None:
+            raise KeyError(codigo)
+        producto = self._almacen.fila_a_producto(fila)
+        self._cache[codigo] = producto
+        return producto
+
+    def __contains__(self, codigo):
+        if codigo in self._cache:
+            return True
+        return self._almacen.consultar_uno("SELECT 1 FROM productos WHERE codigo = ?", (codigo,)) is not None
+
+    def __setitem__(self, codigo, producto):
+        self._cache[codigo] = producto
+        self._almacen.escribir_filas([producto])
+
+    def __delitem__(self, codigo):
+        if codigo not in self:
+            raise KeyError(codigo)
+        self._cache.pop(codigo, None)
+        self._almacen.borrar_filas([codigo])
+
+    def __iter__(self):
+        for (codigo,) in self._almacen.recorrer("SELECT codigo FROM productos ORDER BY rowid"):
+            yield codigo
+
+    def __len__(self):
+        return self._almacen.consultar_uno("SELECT COUNT(*) FROM productos")[0]
+
+    def values(self):
+        """Recorre los productos leyendo la tabla por bloques (sin cargarla entera)"""
+        for codigo, datos, stock in self._almacen.recorrer("SELECT codigo, datos, stock FROM productos ORDER BY rowid"):
+            if codigo in self._cache:
+                yield self._cache[codigo]
+            else:
+                yield self._almacen.fila_a_producto((datos, stock))
+
+    def items(self):
+        for producto in self.values():
+            yield producto['codigo'], producto
+
+    def clear(self):
+        self._cache.clear()
+        self._almacen.borrar_todo()
+
+    def productos_en_memoria(self):
+        """Productos leídos (y posiblemente modificados) en esta sesión"""
+        return list(self._cache.values())
+
+    def resumen(self):
+        """Estadísticas del inventario calculadas con agregados SQL"""
+        return self._almacen.resumen()
+
+    def aporte_guardado(self, codigo):
+        """(stock, stock mínimo, precio) guardados en la base para el código (None si no está)"""
+        return self._almacen.consultar_uno(
+            "SELECT stock, stock_minimo, precio FROM productos WHERE codigo = ?", (codigo,))
+
+    def margenes(self):
+        """(código, stock - stock mínimo) de cada fila, leídos de las columnas"""
+        return self._almacen.recorrer("SELECT codigo, stock - stock_minimo FROM productos")
+
+
+class AlmacenSQLite:
+    """Inventario en una base SQLite con la tabla de productos indexada por código"""
+
+    def __init__(self, ruta='stock_local.db', ruta_json='stock_local.json'):
+        self.ruta = ruta
+        self.ruta_json = ruta_json
+        self.conexion = None
+        self._tabla = None
+        # La conexión se usa desde varios hilos (interfaz y guardado en segundo plano): una
+        # consulta o escritura a la vez
+        self.lock = threading.RLock()
+
+    def abrir(self):
+        """Abre la base (tiempo constante, sin leer el catálogo)"""
+        with self.lock:
+            if self.conexion is not None:
+                return
+            nueva = not os.path.exists(self.ruta)
+            self.conexion = sqlite3.connect(self.ruta, check_same_thread=False)
+            self.conexion.execute("PRAGMA journal_mode=WAL")
+            self.conexion.execute("PRAGMA synchronous=NORMAL")
+            self.conexion.execute("""
+                CREATE TABLE IF NOT EXISTS productos (
+                    codigo TEXT PRIMARY KEY,
+                    producto TEXT NOT NULL DEFAULT '',
+                    stock INTEGER NOT NULL DEFAULT 0,
+                    stock_minimo INTEGER NOT NULL DEFAULT 0,
+                    precio REAL NOT NULL DEFAULT 0,
+                    datos TEXT NOT NULL
+                )
+            """)
+            # Índice para listar el stock bajo sin recorrer toda la tabla
+            self.conexion.execute(
+                "CREATE INDEX IF NOT EXISTS idx_productos_margen ON productos (stock - stock_minimo)")
+            self.conexion.commit()
+
+            # Primera vez: migrar los datos del archivo JSON si existen
+            if nueva and self.ruta_json and os.path.exists(self.ruta_json):
+                with open(self.ruta_json, 'r', encoding='utf-8') as f:
+                    self.escribir_filas(json.load(f).values())
+
+    def cargar(self):
+        """Devuelve la tabla de productos como un diccionario de lectura bajo demanda"""
+        self.abrir()
+        if self._tabla is None:
+            self._tabla = TablaProductos(self)
+        return self._tabla
+
+    def fila_a_producto(self, fila):
+        """Convierte una fila (datos, stock) en el diccionario de producto"""
+        datos, stock = fila
+        producto = json.loads(datos)
+        producto['stock'] = stock
+        return producto
+
+    def consultar_uno(self, sql, parametros=()):
+        """Primera fila de una consulta (None si no hay)"""
+        with self.lock:
+            return self.conexion.execute(sql, parametros).fetchone()
+
+    def recorrer(self, sql, parametros=(), filas_por_bloque=1000):
+        """Recorre las filas de una consulta leyendo por bloques (sin tomar el lock entre bloques)"""
+        with self.lock:
+            cursor = self.conexion.execute(sql, parametros)
+            filas = cursor.fetchmany(filas_por_bloque)
+        while filas:
+            yield from filas
+            with self.lock:
+                filas = cursor.fetchmany(filas_por_bloque)
+
+    def escribir_filas(self, productos):
+        """Inserta o actualiza las filas de los productos indicados"""
+        filas = [(
+            p['codigo'],
+            nombre_de(p),
+            p.get('stock', 0),
+            stock_minimo_de(p),
+            precio_de(p),
+            json.dumps(p, ensure_ascii=False)
+        ) for p in productos]
+        with self.lock:
+            self.conexion.executemany("""
+                INSERT INTO productos (codigo, producto, stock, stock_minimo, precio, datos)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(codigo) DO UPDATE SET
+                    producto = excluded.producto,
+                    stock = excluded.stock,
+                    stock_minimo = excluded.stock_minimo,
+                    precio = excluded.precio,
+                    datos = excluded.datos
+            """, filas)
+            self.conexion.commit()
+
+    def borrar_filas(self, codigos):
+        """Elimina las filas de los códigos indicados"""
+        with self.lock:
+            self.conexion.executemany("DELETE FROM productos WHERE codigo = ?", [(c,) for c in codigos])
+            self.conexion.commit()
+
+    def borrar_todo(self):
+        """Vacía la tabla de productos"""
+        with self.lock:
+            self.conexion.execute("DELETE FROM productos")
+            self.conexion.commit()
+
+    def guardar(self, productos, codigos=None):
+        """Actualiza solo las filas de los códigos indicados (o todo si no se indican)"""
+        self.abrir()
+        if codigos is None:
+            if productos is self._tabla:
+                self.escribir_filas(self._tabla.productos_en_memoria())
+            else:
+                with self.lock:
+                    self.conexion.execute("DELETE FROM productos")
+                    self.escribir_filas(productos.values())
+            return
+
+        modificados = []
+        borrados = []
+        for codigo in codigos:
+            producto = productos.get(codigo)
+            if producto is None:
+                borrados.append(codigo)
+            else:
+                modificados.append(producto)
+        if modificados:
+            self.escribir_filas(modificados)
+        if borrados:
+            self.borrar_filas(borrados)
+
+    def reescribe_todo(self, cantidad):
+        """En SQLite solo se escriben las filas de los productos indicados"""
+        return False
+
+    def resumen(self):
+        """Total de productos, stock bajo y valor del inventario con agregados SQL"""
+        total, stock_bajo, valor_total = self.consultar_uno("""
+            SELECT COUNT(*),
+                   COALESCE(SUM(stock <= stock_minimo), 0),
+                   COALESCE(SUM(stock * precio), 0)
+            FROM productos
+        """)
+        productos_bajos = [
+            self.fila_a_producto(fila) for fila in self.recorrer(
+                "SELECT datos, stock FROM productos "
+                "WHERE stock - stock_minimo <= 0 ORDER BY stock - stock_minimo")
+        ]
+        return {
+            'total_productos': total,
+            'stock_bajo': stock_bajo,
+            'valor_total': valor_total,
+            'productos_stock_bajo': productos_bajos
+        }
+
+    def cerrar(self, productos=None):
+        """Cierra la conexión con la base"""
+        with self.lock:
+            if self.conexion is not None:
+                self.conexion.commit()
+                self.conexion.close()
+                self.conexion = None
+                self._tabla = None
+
+
+def crear_almacen(modo='journal', ruta='stock_local.json'):
+    """Crea el almacenamiento local según el modo configurado"""
+    if modo == 'json':
+        return AlmacenJSON(ruta)
+    if modo == 'journal':
+        return AlmacenJournal(ruta)
+    if modo == 'sqlite':
+        return AlmacenSQLite(os.path.splitext(ruta)[0] + '.db', ruta_json=ruta)
+    raise ValueError(f"Modo de almacenamiento desconocido: {modo}")
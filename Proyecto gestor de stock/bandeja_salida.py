@@ -0,0 +1,91 @@
+"""
+Bandeja de salida persistente de movimientos de stock
+
+Cada movimiento (código, delta, fecha) se agrega como una línea JSON a
+bandeja_salida.jsonl antes de intentar enviarlo a Google Sheets. Si la hoja no
+responde, los movimientos quedan en el archivo (sobreviven a un cierre del
+programa) y se vuelven a aplicar sobre el stock de la hoja cuando hay conexión.
+Al confirmar que la hoja recibió los cambios, se quitan de la bandeja.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+
+
+class BandejaSalida:
+    """Cola en disco de movimientos de stock pendientes de enviar a la hoja"""
+
+    def __init__(self, ruta='bandeja_salida.jsonl'):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._pendientes = []  # Movimientos sin confirmar, en orden de llegada
+        self._ultima_secuencia = 0
+        self._cargar()
+
+    def _cargar(self):
+        """Lee los movimientos que quedaron pendientes de la sesión anterior"""
+        if not os.path.exists(self.ruta):
+            return
+        with open(self.ruta, 'r', encoding='utf-8') as f:
+            for linea in f:
+                try:
+                    movimiento = json.loads(linea)
+                except json.JSONDecodeError:
+                    # Última línea incompleta (corte de luz, cierre forzado): se ignora
+                    continue
+                self._pendientes.append(movimiento)
+                self._ultima_secuencia = max(self._ultima_secuencia, movimiento['seq'])
+
+    def agregar(self, codigo, delta):
+        """Agrega un movimiento a la bandeja y lo escribe en disco; devuelve su número de secuencia"""
+        with self._lock:
+            self._ultima_secuencia += 1
+            movimiento = {
+                'seq': self._ultima_secuencia,
+                'codigo': codigo,
+                'delta': delta,
+                'fecha': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }
+            with open(self.ruta, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(movimiento, ensure_ascii=False, separators=(',', ':')) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._pendientes.append(movimiento)
+            return self._ultima_secuencia
+
+    def ultima_secuencia(self):
+        """Número de secuencia del último movimiento agregado"""
+        with self._lock:
+            return self._ultima_secuencia
+
+    def deltas_por_codigo(self, hasta_secuencia=None):
+        """Suma los deltas pendientes de cada código (hasta la secuencia indicada)"""
+        deltas = {}
+        with self._lock:
+            for movimiento in self._pendientes:
+                if hasta_secuencia is None or movimiento['seq'] <= hasta_secuencia:
+                    deltas[movimiento['codigo']] = deltas.get(movimiento['codigo'], 0) + movimiento['delta']
+        return deltas
+
+    def confirmar(self, hasta_secuencia):
+        """Quita de la bandeja los movimientos ya enviados (secuencia <= hasta_secuencia)"""
+        with self._lock:
+            restantes = [m for m in self._pendientes if m['seq'] > hasta_secuencia]
+            if len(restantes) == len(self._pendientes):
+                return
+
+            # Reescribir el archivo solo con lo que falta enviar (reemplazo atómico)
+            temporal = self.ruta + '.tmp'
+            with open(temporal, 'w', encoding='utf-8') as f:
+                for movimiento in restantes:
+                    f.write(json.dumps(movimiento, ensure_ascii=False, separators=(',', ':')) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporal, self.ruta)
+            self._pendientes = restantes
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pendientes)
@@ -0,0 +1,233 @@
+"""
+Terminal del servicio de stock compartido
+
+ClienteStock habla el protocolo de servicio_stock.py: los pedidos se envían
+desde el hilo que los hace y esperan su respuesta; un hilo lector recibe las
+respuestas y deja en una cola los avisos de cambios hechos por otras
+terminales (la interfaz los aplica con root.after, Tk no es seguro entre
+hilos). Las respuestas que llegan después de SEGUNDOS_ESPERA no se pierden:
+pasan a la cola como avisos, así la copia se corrige igual.
+
+InventarioRemoto tiene la misma forma que Inventario, así que las ventanas
+lo usan sin cambios: guarda una copia del catálogo para la tabla, las
+búsquedas y las alertas, pero cada movimiento lo aplica el servicio y la
+copia se corrige con la respuesta. El guardado lo hace el servicio.
+"""
+
+import itertools
+import json
+import queue
+import socket
+import threading
+
+from inventario import Inventario, ProductoModificado, StockInsuficiente
+from servicio_stock import PUERTO
+
+# Segundos máximos de espera de una respuesta del servicio
+SEGUNDOS_ESPERA = 10
+
+class EnvioFallido(ConnectionError):
+    """El pedido no llegó a enviarse: el servicio no lo aplicó"""
+
+
+class SinRespuesta(ConnectionError):
+    """El pedido se envió pero no llegó la respuesta: el servicio puede haberlo aplicado"""
+
+
+# Error del servicio -> excepción que se lanza en la terminal
+ERRORES = {
+    'stock_insuficiente': StockInsuficiente,
+    'producto_modificado': ProductoModificado,
+    'codigo_desconocido': KeyError,
+}
+
+
+def separar_direccion(direccion, puerto_por_defecto=PUERTO):
+    """'host:puerto' -> (host, puerto)"""
+    host, _, puerto = direccion.rpartition(':')
+    if not host:
+        return puerto, puerto_por_defecto
+    return host, int(puerto)
+
+
+class ClienteStock:
+    """Conexión con el servicio de stock: pedidos con respuesta y cola de avisos"""
+
+    def __init__(self, host, puerto, segundos_espera=SEGUNDOS_ESPERA):
+        self.segundos_espera = segundos_espera
+        self._socket = socket.create_connection((host, puerto), timeout=segundos_espera)
+        self._socket.settimeout(None)
+        # Pedidos chicos y seguidos (un escaneo por pedido): sin esperar a juntar paquetes
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._lock_envio = threading.Lock()
+        self._ids = itertools.count(1)
+        self._esperando = {}  # id -> [threading.Event, respuesta]
+        self._lock_esperando = threading.Lock()
+        self.eventos = queue.Queue()  # Avisos de cambios de otras terminales
+        self.conectado = True
+        self._hilo = threading.Thread(target=self._leer, name="ClienteStock", daemon=True)
+        self._hilo.start()
+
+    def pedir(self, operacion, **datos):
+        """Envía un pedido y espera la respuesta
+
+        Lanza EnvioFallido si el pedido no se pudo enviar, SinRespuesta si se envió pero no
+        llegó la respuesta a tiempo, y la excepción de ERRORES (o ValueError) si el servicio
+        rechazó el pedido.
+        """
+        if not self.conectado:
+            raise EnvioFallido("Sin conexión con el servicio de stock")
+        identificador = next(self._ids)
+        espera = [threading.Event(), None]
+        self._esperando[identificador] = espera
+        datos.update(id=identificador, op=operacion)
+        try:
+            with self._lock_envio:
+                self._socket.sendall(json.dumps(datos, ensure_ascii=False).encode('utf-8') + b'\n')
+        except OSError as e:
+            self._esperando.pop(identificador, None)
+            raise EnvioFallido(f"Sin conexión con el servicio de stock: {e}") from e
+
+        espera[0].wait(self.segundos_espera)
+        with self._lock_esperando:
+            # Desde acá una respuesta que llegue tarde va a la cola de avisos
+            self._esperando.pop(identificador, None)
+            respuesta = espera[1]
+        if respuesta is None:
+            if not self.conectado:
+                raise SinRespuesta("Se cortó la conexión con el servicio de stock antes de su respuesta")
+            raise SinRespuesta("El servicio de stock no respondió a tiempo")
+        if not respuesta.get('ok'):
+            raise ERRORES.get(respuesta.get('error'), ValueError)(respuesta.get('mensaje', ''))
+        return respuesta
+
+    def cerrar(self):
+        """Cierra la conexión"""
+        self.conectado = False
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._socket.close()
+
+    def _leer(self):
+        """Hilo lector: entrega cada respuesta a quien la espera y encola los avisos"""
+        try:
+            with self._socket.makefile('rb') as archivo:
+                for linea in archivo:
+                    mensaje = json.loads(linea)
+                    if 'evento' in mensaje:
+                        self.eventos.put(mensaje)
+                        continue
+                    with self._lock_esperando:
+                        espera = self._esperando.pop(mensaje.get('id'), None)
+                        if espera is not None:
+                            espera[1] = mensaje
+                            espera[0].set()
+                            continue
+                    self._respuesta_tardia(mensaje)
+        except (OSError, ValueError):
+            pass
+        finally:
+            self.conectado = False
+            # Despertar a los que esperaban: su respuesta ya no va a llegar
+            with self._lock_esperando:
+                for espera in self._esperando.values():
+                    espera[0].set()
+
+    def _respuesta_tardia(self, mensaje):
+        """Respuesta de un pedido que ya no se espera: sus cambios se encolan como un aviso"""
+        if not mensaje.get('ok'):
+            return
+        if 'cambios' in mensaje:
+            self.eventos.put({'evento': 'productos', 'cambios': mensaje['cambios']})
+        elif 'producto' in mensaje and 'version' in mensaje:
+            self.eventos.put({'evento': 'productos', 'cambios': [[mensaje['producto'], mensaje['version']]]})
+
+
+class AlmacenRemoto:
+    """Almacenamiento de una terminal: el servicio guarda, acá no hay nada que escribir"""
+
+    def __init__(self, cliente):
+        self.cliente = cliente
+
+    def cargar(self):
+        return self.cliente.pedir('catalogo')['productos']
+
+    def guardar(self, productos, codigos=None):
+        pass
+
+    def cerrar(self, productos=None):
+        self.cliente.cerrar()
+
+
+class InventarioRemoto(Inventario):
+    """Inventario de una terminal: copia local del catálogo y movimientos aplicados por el servicio"""
+
+    def __init__(self, direccion, segundos_espera=SEGUNDOS_ESPERA):
+        self.cliente = ClienteStock(*separar_direccion(direccion), segundos_espera=segundos_espera)
+        super().__init__(AlmacenRemoto(self.cliente))
+        # Acá las versiones son las del servicio: _versiones tiene la del último cambio
+        # aplicado a la copia y _version_carga la del catálogo traído
+
+    def cargar_local(self):
+        """Trae el catálogo completo del servicio; devuelve la cantidad de productos"""
+        respuesta = self.cliente.pedir('catalogo')
+        with self.lock_datos:
+            self.productos = respuesta['productos']
+            self.recalcular()
+            self._reloj = self._version_carga = respuesta['version']
+        return len(self.productos)
+
+    def mover(self, codigo, delta, version=None):
+        """Pide el movimiento al servicio y actualiza la copia; devuelve el stock nuevo"""
+        datos = {} if version is None else {'version': version}
+        respuesta = self.cliente.pedir('mover', codigo=codigo, delta=delta, **datos)
+        self._aplicar(respuesta['producto'], respuesta['version'])
+        return self.productos[codigo]['stock']
+
+    def aplicar_lote(self, movimientos):
+        """El servicio aplica el lote entero o nada (si algún stock quedaría negativo)"""
+        respuesta = self.cliente.pedir('lote', movimientos=[list(m) for m in movimientos])
+        for producto, version in respuesta['cambios']:
+            self._aplicar(producto, version)
+        return len(respuesta['cambios'])
+
+    def agregar_producto(self, producto):
+        respuesta = self.cliente.pedir('agregar', producto=producto)
+        self._aplicar(respuesta['producto'], respuesta['version'])
+
+    def cargar_productos(self, productos, reemplazar=False):
+        raise ValueError("Con el servicio de stock, el catálogo se carga en el equipo del servicio")
+
+    def importar_productos(self, productos):
+        raise ValueError("Con el servicio de stock, los archivos se importan en el equipo del servicio")
+
+    def procesar_eventos(self):
+        """Aplica los cambios avisados por el servicio; devuelve los códigos que cambiaron"""
+        cambiados = []
+        while True:
+            try:
+                mensaje = self.cliente.eventos.get_nowait()
+            except queue.Empty:
+                return cambiados
+            for producto, version in mensaje.get('cambios', []):
+                if self._aplicar(producto, version):
+                    cambiados.append(producto['codigo'])
+
+    def _aplicar(self, producto, version):
+        """Pasa a la copia un producto del servicio si es más nuevo que el que hay"""
+        codigo = producto['codigo']
+        if version <= self.version(codigo):
+            return False
+        self._versiones[codigo] = version
+        self._reloj = max(self._reloj, version)
+        existente = self.productos.get(codigo)
+        if existente is None:
+            self.productos[codigo] = producto
+        else:
+            # Mismo diccionario: la ventana puede tener una referencia al producto mostrado
+            existente.clear()
+            existente.update(producto)
+        self.producto_cambiado(codigo)
+        return True
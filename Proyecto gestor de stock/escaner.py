@@ -0,0 +1,156 @@
+"""
+Entrada del lector de códigos de barras
+
+El lector escribe el código en el campo como si fuera un teclado, pero mucho
+más rápido que una persona (unos pocos milisegundos entre teclas) y casi
+siempre termina con Enter. MotorEscaner mira el tiempo entre teclas para
+distinguir una ráfaga del lector de la escritura manual:
+- Enter cierra el código en el momento
+- una ráfaga del lector sin Enter se cierra con un único temporizador que se
+  reprograma en cada tecla (no se acumulan callbacks)
+- si empieza otra ráfaga antes de que venza el temporizador, la anterior se
+  cierra primero, así dos escaneos seguidos no se mezclan
+Los códigos cerrados van a una cola que se procesa fuera del manejo de la
+tecla; cada código se procesa una sola vez.
+
+Cantidades: '12*' antes del código (escrito a mano o seguido de un escaneo)
+o un código de cantidad ('CANT12') escaneado antes del producto indican que
+el producto se cuenta 12 veces en un solo movimiento.
+"""
+
+import re
+import time
+from collections import deque
+
+# Silencio (ms) que cierra una ráfaga del lector que no terminó con Enter
+ESPERA_FIN_MS = 80
+
+# Tiempo máximo entre teclas (segundos) para considerar que escribe el lector
+INTERVALO_ESCANER = 0.035
+
+# Largo de los códigos de barras que se cierran sin Enter (EAN-8 a EAN-13)
+LARGO_MINIMO = 8
+LARGO_MAXIMO = 13
+
+# Código de barras de cantidad: 'CANT' seguido del número ('CANT12')
+PREFIJO_CANTIDAD = 'CANT'
+CANTIDAD_MAXIMA = 9999
+
+_CANTIDAD_ESCRITA = re.compile(r'^([+-]?\d+)\s*\*\s*(.*)$')
+
+
+def es_codigo_de_barras(texto):
+    """Indica si el texto tiene forma de código de barras (8 a 13 dígitos)"""
+    return texto.isdigit() and LARGO_MINIMO <= len(texto) <= LARGO_MAXIMO
+
+
+def interpretar_escaneo(texto):
+    """Separa cantidad y código: '12*779..' -> (12, '779..'), '12*' o 'CANT12' -> (12, None), '779..' -> (None, '779..')
+
+    Las cantidades fuera de rango (0 o más de CANTIDAD_MAXIMA) se toman como parte del código.
+    """
+    texto = texto.strip()
+    cantidad = codigo = None
+    coincidencia = _CANTIDAD_ESCRITA.match(texto)
+    if coincidencia:
+        cantidad, codigo = int(coincidencia.group(1)), coincidencia.group(2).strip() or None
+    elif texto.upper().startswith(PREFIJO_CANTIDAD) and texto[len(PREFIJO_CANTIDAD):].isdigit():
+        cantidad = int(texto[len(PREFIJO_CANTIDAD):])
+
+    if cantidad is None or not 0 < abs(cantidad) <= CANTIDAD_MAXIMA:
+        return None, texto
+    return cantidad, codigo
+
+
+class MotorEscaner:
+    """Arma los códigos a partir de las teclas y los entrega de a uno a procesar"""
+
+    def __init__(self, leer_texto, limpiar_texto, procesar, programar, cancelar,
+                 reloj=time.monotonic, espera_fin_ms=ESPERA_FIN_MS, intervalo_escaner=INTERVALO_ESCANER):
+        self.leer_texto = leer_texto        # () -> texto actual del campo
+        self.limpiar_texto = limpiar_texto  # () -> vacía el campo
+        self.procesar = procesar            # codigo -> procesa un código completo
+        self.programar = programar          # (ms, funcion) -> id (root.after)
+        self.cancelar = cancelar            # id -> cancela lo programado (root.after_cancel)
+        self.reloj = reloj
+        self.espera_fin_ms = espera_fin_ms
+        self.intervalo_escaner = intervalo_escaner
+        self.cola = deque()  # Códigos completos pendientes de procesar
+        self.procesados = 0
+        self._temporizador = None
+        self._vaciado = None
+        self._reiniciar_rafaga()
+
+    def _reiniciar_rafaga(self):
+        self._ultima_tecla = None
+        self._teclas = 0
+        self._manual = False  # Hubo una pausa larga o una tecla de edición: escribe una persona
+
+    def tecla(self, caracter):
+        """Registra un carácter escrito en el campo (llamar antes de que el campo lo agregue)"""
+        ahora = self.reloj()
+        if self._ultima_tecla is not None and ahora - self._ultima_tecla > self.intervalo_escaner:
+            cantidad, codigo = interpretar_escaneo(self.leer_texto())
+            if self.es_rafaga_del_lector():
+                # Empieza otro escaneo antes de que venciera el temporizador del anterior
+                self._cerrar(self.leer_texto().strip())
+            elif cantidad is not None and codigo is None:
+                # Cantidad escrita ('12*'): el escaneo que sigue es una ráfaga nueva
+                self._reiniciar_rafaga()
+            else:
+                self._manual = True
+        self._ultima_tecla = ahora
+        self._teclas += 1
+        self._reprogramar()
+
+    def edicion(self):
+        """Registra una tecla de edición (borrar, flechas): lo que hay en el campo es manual"""
+        self._manual = True
+        self._cancelar_temporizador()
+
+    def enter(self):
+        """Enter: cierra el código del campo en el momento"""
+        self._cancelar_temporizador()
+        texto = self.leer_texto().strip()
+        if texto:
+            self._cerrar(texto)
+        else:
+            self._reiniciar_rafaga()
+
+    def es_rafaga_del_lector(self):
+        """Indica si lo escrito desde el último código llegó a ritmo de lector y es un código completo"""
+        _, codigo = interpretar_escaneo(self.leer_texto())
+        return (not self._manual and self._teclas >= LARGO_MINIMO
+                and codigo is not None and es_codigo_de_barras(codigo))
+
+    def _reprogramar(self):
+        """Un solo temporizador: cada tecla cancela el anterior y lo vuelve a programar"""
+        self._cancelar_temporizador()
+        self._temporizador = self.programar(self.espera_fin_ms, self._fin_silencio)
+
+    def _cancelar_temporizador(self):
+        if self._temporizador is not None:
+            self.cancelar(self._temporizador)
+            self._temporizador = None
+
+    def _fin_silencio(self):
+        """Venció el temporizador: si era el lector, el código está completo"""
+        self._temporizador = None
+        if self.es_rafaga_del_lector():
+            self._cerrar(self.leer_texto().strip())
+
+    def _cerrar(self, codigo):
+        """Saca el código del campo y lo agrega a la cola"""
+        self.limpiar_texto()
+        self._reiniciar_rafaga()
+        self.cola.append(codigo)
+        if self._vaciado is None:
+            self._vaciado = self.programar(0, self._vaciar_cola)
+
+    def _vaciar_cola(self):
+        """Procesa en orden los códigos de la cola"""
+        self._vaciado = None
+        while self.cola:
+            codigo = self.cola.popleft()
+            self.procesados += 1
+            self.procesar(codigo)
@@ -0,0 +1,225 @@
+"""
+Funciones auxiliares para leer y escribir en Google Sheets con pocas llamadas
+
+Cada llamada a la API de Google Sheets es un viaje por la red y cuenta para la
+cuota de escritura, así que las escrituras se agrupan en bloques de rangos que
+se envían juntos con batch_update.
+"""
+
+# Máximo de filas por rango y de filas o celdas sueltas por llamada a la API
+FILAS_POR_BLOQUE = 1000
+FILAS_POR_LLAMADA = 10000
+CELDAS_POR_LLAMADA = 500
+
+# Filas iniciales donde se buscan los encabezados y columnas que usa el sistema
+FILAS_ENCABEZADO = 10
+COLUMNAS_PRODUCTO = ('codigo', 'titulo', 'stock', 'stock_min', 'precio_costo')
+
+
+def letra_columna(indice):
+    """Convierte un índice de columna (0 = A) en su letra ('A', 'B', ..., 'AA')"""
+    letras = ''
+    indice += 1
+    while indice > 0:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(ord('A') + resto) + letras
+    return letras
+
+
+def escribir_tabla(worksheet, filas, filas_anteriores=None, limpiar_sobrantes=True,
+                   filas_por_bloque=FILAS_POR_BLOQUE, filas_por_llamada=FILAS_POR_LLAMADA):
+    """Escribe la tabla completa desde A1 con escrituras por bloques en vez de fila por fila
+
+    No borra la hoja antes de escribir: se sobrescriben los valores y, si antes
+    había más filas (filas_anteriores), solo se limpian las que sobran.
+    Devuelve la cantidad de llamadas de escritura realizadas.
+    """
+    if not filas:
+        return 0
+
+    ancho = max(len(fila) for fila in filas)
+    ultima_columna = letra_columna(ancho - 1)
+
+    # La hoja tiene que tener filas suficientes para escribir por rango
+    if worksheet.row_count < len(filas):
+        worksheet.add_rows(len(filas) - worksheet.row_count)
+
+    bloques = []
+    for inicio in range(0, len(filas), filas_por_bloque):
+        bloque = filas[inicio:inicio + filas_por_bloque]
+        fila_inicial = inicio + 1
+        bloques.append({
+            'range': f'A{fila_inicial}:{ultima_columna}{fila_inicial + len(bloque) - 1}',
+            'values': [list(fila) + [''] * (ancho - len(fila)) for fila in bloque]
+        })
+
+    llamadas = 0
+    bloques_por_llamada = max(1, filas_por_llamada // filas_por_bloque)
+    for inicio in range(0, len(bloques), bloques_por_llamada):
+        worksheet.batch_update(bloques[inicio:inicio + bloques_por_llamada])
+        llamadas += 1
+
+    if limpiar_sobrantes and filas_anteriores and filas_anteriores > len(filas):
+        worksheet.batch_clear([f'A{len(filas) + 1}:{ultima_columna}{filas_anteriores}'])
+        llamadas += 1
+
+    return llamadas
+
+
+def actualizar_rangos(worksheet, rangos, rangos_por_llamada=CELDAS_POR_LLAMADA):
+    """Actualiza varios rangos sueltos con batch_update en vez de una llamada por rango
+
+    rangos es una lista de (rango_a1, valores) con valores como lista de filas.
+    Devuelve (actualizados, fallidos): la lista de rangos confirmados por la
+    respuesta y una lista de (rango, motivo).
+    """
+    actualizados = []
+    fallidos = []
+
+    for inicio in range(0, len(rangos), rangos_por_llamada):
+        bloque = rangos[inicio:inicio + rangos_por_llamada]
+        try:
+            respuesta = worksheet.batch_update([
+                {'range': rango, 'values': valores} for rango, valores in bloque
+            ])
+        except Exception as e:
+            fallidos.extend((rango, str(e)) for rango, _ in bloque)
+            continue
+
+        # La API devuelve una respuesta por rango, en el mismo orden del pedido
+        respuestas = (respuesta or {}).get('responses', [])
+        for i, (rango, _) in enumerate(bloque):
+            if i < len(respuestas) and respuestas[i].get('updatedRange'):
+                actualizados.append(rango)
+            else:
+                fallidos.append((rango, "La respuesta no confirmó la actualización"))
+
+    return actualizados, fallidos
+
+
+def actualizar_celdas(worksheet, celdas, celdas_por_llamada=CELDAS_POR_LLAMADA):
+    """Actualiza varias celdas sueltas; celdas es una lista de (rango_a1, valor)"""
+    return actualizar_rangos(worksheet, [(rango, [[valor]]) for rango, valor in celdas], celdas_por_llamada)
+
+
+def detectar_columnas(encabezados):
+    """Devuelve {'titulo', 'codigo', 'stock', 'stock_min', 'precio_costo'} -> índice de columna
+
+    Solo incluye las columnas encontradas en la fila de encabezados.
+    """
+    columnas = {}
+    for i, encabezado in enumerate(encabezados):
+        nombre = str(encabezado).strip().lower()
+        if 'título' in nombre or 'titulo' in nombre:
+            columnas['titulo'] = i
+        elif 'codigo' in nombre or 'código' in nombre:
+            columnas['codigo'] = i
+        elif nombre == 'stock':
+            columnas['stock'] = i
+        elif 'stock min' in nombre or 'stockmin' in nombre:
+            columnas['stock_min'] = i
+        elif 'precio costo' in nombre or 'preciocosto' in nombre:
+            columnas['precio_costo'] = i
+    return columnas
+
+
+def buscar_fila_encabezados(filas):
+    """Devuelve el índice (desde 0) de la primera fila que parece de encabezados, o None"""
+    for i, fila in enumerate(filas):
+        if any('codigo' in str(celda).lower() or 'stock' in str(celda).lower() for celda in fila):
+            return i
+    return None
+
+
+def leer_columnas(worksheet, nombres=COLUMNAS_PRODUCTO, filas_encabezado=FILAS_ENCABEZADO):
+    """Lee de la hoja solo las columnas indicadas en vez de la hoja completa
+
+    Primero lee las primeras filas para ubicar los encabezados y después pide
+    los rangos de esas columnas en una sola llamada (las columnas largas de
+    títulos o descripciones que no se usan no se descargan).
+    Devuelve (columnas, filas): columnas es {nombre: índice} y filas una lista
+    de (número de fila, {nombre: valor}). Devuelve None si no hay encabezados.
+    """
+    primeras = worksheet.get(f'1:{filas_encabezado}')
+    fila_encabezados = buscar_fila_encabezados(primeras)
+    if fila_encabezados is None:
+        return None
+
+    columnas = {nombre: indice for nombre, indice in detectar_columnas(primeras[fila_encabezados]).items()
+                if nombre in nombres}
+    if not columnas:
+        return columnas, []
+
+    # Los datos empiezan en la fila siguiente a los encabezados (numeración de la hoja desde 1)
+    primera_fila = fila_encabezados + 2
+    nombres_pedidos = list(columnas)
+    rangos = [f'{letra_columna(columnas[nombre])}{primera_fila}:{letra_columna(columnas[nombre])}'
+              for nombre in nombres_pedidos]
+    respuesta = worksheet.batch_get(rangos, major_dimension='COLUMNS')
+
+    # Cada rango llega como una sola columna; las celdas vacías del final se omiten
+    valores = {nombre: (list(rango[0]) if rango else []) for nombre, rango in zip(nombres_pedidos, respuesta)}
+    largo = max((len(columna) for columna in valores.values()), default=0)
+    filas = []
+    for i in range(largo):
+        fila = {nombre: (str(columna[i]).strip() if i < len(columna) else '') for nombre, columna in valores.items()}
+        filas.append((primera_fila + i, fila))
+    return columnas, filas
+
+
+class IndiceHoja:
+    """Índice código -> fila de la hoja y posición de las columnas, armado una vez por sesión
+
+    Permite escribir el stock de un producto directo en su celda sin volver a
+    descargar la hoja. Se invalida si cambia la hoja conectada o si la columna
+    de código ya no coincide en las filas a escribir (filas insertadas,
+    ordenadas o columnas movidas).
+    """
+
+    def __init__(self):
+        self.invalidar()
+
+    def invalidar(self):
+        """Descarta el índice; se vuelve a armar en la próxima escritura"""
+        self.hoja_id = None
+        self.columnas = {}
+        self.fila_por_codigo = {}
+        self.valores = {}  # codigo -> stock en la hoja (último leído o escrito)
+
+    def valido_para(self, worksheet):
+        """Indica si el índice corresponde a esta hoja"""
+        return self.hoja_id is not None and self.hoja_id == getattr(worksheet, 'id', None)
+
+    def construir(self, worksheet, columnas, filas):
+        """Arma el índice con el resultado de leer_columnas; devuelve True si encontró código y stock"""
+        self.invalidar()
+        if 'codigo' not in columnas or 'stock' not in columnas:
+            return False
+
+        for numero, fila in filas:
+            if fila['codigo']:
+                self.fila_por_codigo[fila['codigo']] = numero
+                self.valores[fila['codigo']] = fila['stock']
+
+        self.columnas = dict(columnas)
+        self.hoja_id = getattr(worksheet, 'id', None)
+        return True
+
+    def celda(self, codigo, columna='stock'):
+        """Devuelve la celda A1 del código en la columna indicada (None si no está en la hoja)"""
+        fila = self.fila_por_codigo.get(codigo)
+        if fila is None or columna not in self.columnas:
+            return None
+        return f'{letra_columna(self.columnas[columna])}{fila}'
+
+    def verificar(self, worksheet, codigos, celdas_por_llamada=CELDAS_POR_LLAMADA):
+        """Lee solo la celda de código de cada fila a escribir y confirma que no se movió"""
+        celdas = [(codigo, self.celda(codigo, 'codigo')) for codigo in codigos if codigo in self.fila_por_codigo]
+        for inicio in range(0, len(celdas), celdas_por_llamada):
+            bloque = celdas[inicio:inicio + celdas_por_llamada]
+            respuesta = worksheet.batch_get([celda for _, celda in bloque])
+            for (codigo, _), valores in zip(bloque, respuesta):
+                leido = str(valores[0][0]).strip() if valores and valores[0] else ''
+                if leido != codigo:
+                    return False
+        return True
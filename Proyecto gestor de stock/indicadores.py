@@ -0,0 +1,105 @@
+"""
+Indicadores del inventario mantenidos al día
+
+AgregadosInventario guarda la cantidad de productos, el valor total del
+inventario y el conjunto de productos con stock bajo. Se arma una vez al
+cargar el catálogo y después cada movimiento de stock lo corrige en O(1)
+(se resta el aporte anterior del producto y se suma el nuevo), así el
+reporte y el encabezado de la tabla no recorren todo el catálogo.
+
+Con la tabla de SQLite ni siquiera la carga recorre el catálogo: los totales
+salen de los agregados SQL de la base y el aporte anterior de un producto se
+lee de sus columnas recién la primera vez que cambia.
+"""
+
+from modelo import stock_minimo_de, precio_de
+
+
+class AgregadosInventario:
+    """Totales del inventario actualizados producto por producto"""
+
+    def __init__(self):
+        self.vaciar()
+
+    def vaciar(self):
+        """Deja los totales en cero"""
+        self.valor_total = 0.0
+        self.total_productos = 0
+        self.stock_bajo = set()  # Códigos con stock <= stock mínimo
+        # Código -> (stock, stock mínimo, precio original, precio como número); None si se quitó
+        self._aporte_por_codigo = {}
+        # Tabla de SQLite: código -> (stock, stock mínimo, precio) guardados en la base
+        self._aporte_guardado = None
+
+    def construir(self, productos):
+        """Recalcula todo a partir del catálogo (en cargas y recargas completas)"""
+        self.vaciar()
+        aporte_guardado = getattr(productos, 'aporte_guardado', None)
+        if aporte_guardado is None:
+            for codigo, producto in productos.items():
+                self.actualizar(codigo, producto)
+            return
+
+        resumen = productos.resumen()
+        self.total_productos = resumen['total_productos']
+        self.valor_total = resumen['valor_total']
+        self.stock_bajo = {producto['codigo'] for producto in resumen['productos_stock_bajo']}
+        self._aporte_guardado = aporte_guardado
+        # Productos leídos en esta sesión: pueden tener cambios que todavía no están en la base
+        for producto in productos.productos_en_memoria():
+            self.actualizar(producto['codigo'], producto)
+
+    def _aporte(self, codigo):
+        if codigo in self._aporte_por_codigo:
+            return self._aporte_por_codigo[codigo]
+        if self._aporte_guardado is not None:
+            fila = self._aporte_guardado(codigo)
+            if fila is not None:
+                stock, minimo, precio = fila
+                return stock, minimo, None, precio
+        return None
+
+    def actualizar(self, codigo, producto):
+        """Corrige los totales con el estado actual de un producto (nuevo o modificado)"""
+        anterior = self._aporte(codigo)
+        precio_original = producto.get('precio_costo', producto.get('precio', 0))
+        if anterior is not None:
+            self.valor_total -= anterior[0] * anterior[3]
+            # El precio de la V2 es texto ('$1,234.50'): solo se vuelve a convertir si cambió
+            precio = anterior[3] if anterior[2] == precio_original else precio_de(producto)
+        else:
+            self.total_productos += 1
+            precio = precio_de(producto)
+
+        stock = producto['stock']
+        minimo = stock_minimo_de(producto)
+        self._aporte_por_codigo[codigo] = (stock, minimo, precio_original, precio)
+        self.valor_total += stock * precio
+        if stock <= minimo:
+            self.stock_bajo.add(codigo)
+        else:
+            self.stock_bajo.discard(codigo)
+
+    def quitar(self, codigo):
+        """Quita un producto de los totales"""
+        anterior = self._aporte(codigo)
+        if self._aporte_guardado is None:
+            self._aporte_por_codigo.pop(codigo, None)
+        else:
+            # Que no se vuelva a leer de la base el aporte que ya se descontó
+            self._aporte_por_codigo[codigo] = None
+        if anterior is not None:
+            self.valor_total -= anterior[0] * anterior[3]
+            self.total_productos -= 1
+            self.stock_bajo.discard(codigo)
+
+    def resumen(self, productos):
+        """Mismos datos que el resumen de TablaProductos (stock bajo: los más urgentes primero)"""
+        productos_bajos = sorted((productos[codigo] for codigo in self.stock_bajo if codigo in productos),
+                                 key=lambda p: p['stock'] - stock_minimo_de(p))
+        return {
+            'total_productos': self.total_productos,
+            'stock_bajo': len(self.stock_bajo),
+            'valor_total': self.valor_total,
+            'productos_stock_bajo': productos_bajos
+        }
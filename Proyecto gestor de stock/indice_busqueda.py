@@ -0,0 +1,235 @@
+"""
+Índices de búsqueda de productos
+
+IndicePrefijos guarda ordenadas las palabras normalizadas de cada producto
+(código y palabras del nombre), así la búsqueda por el comienzo de una
+palabra se resuelve con bisect en tiempo logarítmico en vez de recorrer
+todo el catálogo.
+
+IndiceTrigramas es la búsqueda aproximada: cada nombre se parte en grupos
+de 3 letras (trigramas) y el índice guarda qué productos tienen cada uno.
+Una palabra mal escrita o incompleta comparte la mayoría de sus trigramas
+con la correcta, así que se encuentra igual y los resultados se ordenan
+por la proporción de trigramas en común.
+"""
+
+import heapq
+import math
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+
+from modelo import nombre_de
+
+# Cantidad máxima de resultados que se muestran al filtrar
+LIMITE_RESULTADOS = 500
+
+# Proporción mínima de trigramas de la búsqueda que debe tener un producto
+SIMILITUD_MINIMA = 0.5
+
+
+def normalizar(texto):
+    """Pasa a minúsculas y quita tildes ('Pantalón' -> 'pantalon')"""
+    texto = str(texto).lower()
+    if texto.isascii():
+        return texto
+    descompuesto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def palabras_de(codigo, producto):
+    """Claves de búsqueda de un producto: el código y cada palabra del nombre"""
+    claves = {normalizar(codigo).strip()}
+    claves.update(normalizar(nombre_de(producto)).split())
+    claves.discard('')
+    return claves
+
+
+class IndicePrefijos:
+    """Lista ordenada de (palabra, código) para buscar por prefijo con bisect"""
+
+    def __init__(self):
+        self.invalidar()
+
+    def invalidar(self):
+        """Descarta el índice; se vuelve a armar en la próxima búsqueda"""
+        self._entradas = []  # (palabra, código) ordenadas
+        self._palabras_por_codigo = {}
+        self._productos = None
+        self.valido = False
+
+    def construir(self, productos):
+        """Arma el índice completo (una sola ordenación para todo el catálogo)"""
+        self._palabras_por_codigo = {codigo: palabras_de(codigo, producto) for codigo, producto in productos.items()}
+        self._entradas = sorted((palabra, codigo) for codigo, palabras in self._palabras_por_codigo.items()
+                                for palabra in palabras)
+        self._productos = productos
+        self.valido = True
+
+    def construir_despues(self, productos):
+        """Deja anotado el catálogo para armar el índice recién en la primera búsqueda"""
+        self.invalidar()
+        self._productos = productos
+
+    def actualizar(self, codigo, producto):
+        """Agrega o actualiza un producto (no hace nada si sus palabras no cambiaron)"""
+        if not self.valido:
+            return
+        palabras = palabras_de(codigo, producto)
+        anteriores = self._palabras_por_codigo.get(codigo, set())
+        if palabras == anteriores:
+            return
+        for palabra in anteriores - palabras:
+            self._quitar_entrada(palabra, codigo)
+        for palabra in palabras - anteriores:
+            insort(self._entradas, (palabra, codigo))
+        self._palabras_por_codigo[codigo] = palabras
+
+    def quitar(self, codigo):
+        """Quita un producto del índice"""
+        if not self.valido:
+            return
+        for palabra in self._palabras_por_codigo.pop(codigo, set()):
+            self._quitar_entrada(palabra, codigo)
+
+    def _quitar_entrada(self, palabra, codigo):
+        posicion = bisect_left(self._entradas, (palabra, codigo))
+        if posicion < len(self._entradas) and self._entradas[posicion] == (palabra, codigo):
+            del self._entradas[posicion]
+
+    def _rango(self, prefijo):
+        """Posiciones [inicio, fin) de las entradas cuya palabra empieza con el prefijo"""
+        inicio = bisect_left(self._entradas, (prefijo,))
+        # '\uffff' es mayor que los caracteres de las palabras: cierra el rango del prefijo
+        fin = bisect_left(self._entradas, (prefijo + '\uffff',), inicio)
+        return inicio, fin
+
+    def buscar(self, texto, limite=LIMITE_RESULTADOS):
+        """Códigos cuyos productos tienen una palabra que empieza con cada término del texto"""
+        if not self.valido:
+            if self._productos is None:
+                return []
+            self.construir(self._productos)
+
+        terminos = normalizar(texto).split()
+        if not terminos:
+            return []
+
+        # Se recorre el rango del término más específico y se filtra por los demás
+        rangos = [(self._rango(termino), termino) for termino in terminos]
+        (inicio, fin), termino_base = min(rangos, key=lambda r: r[0][1] - r[0][0])
+        otros = [termino for _, termino in rangos if termino != termino_base]
+
+        resultados = []
+        vistos = set()
+        for posicion in range(inicio, fin):
+            codigo = self._entradas[posicion][1]
+            if codigo in vistos:
+                continue
+            vistos.add(codigo)
+            palabras = self._palabras_por_codigo[codigo]
+            if all(any(palabra.startswith(termino) for palabra in palabras) for termino in otros):
+                resultados.append(codigo)
+                if len(resultados) >= limite:
+                    break
+        return resultados
+
+
+def trigramas(texto):
+    """Trigramas de las palabras del texto normalizado ('gorra' -> '  g', ' go', 'gor', 'orr', 'rra', 'ra ')"""
+    resultado = set()
+    for palabra in normalizar(texto).split():
+        rellena = f'  {palabra} '
+        resultado.update(rellena[i:i + 3] for i in range(len(palabra) + 1))
+    return resultado
+
+
+class IndiceTrigramas:
+    """Índice invertido trigrama -> códigos para buscar nombres con errores de escritura"""
+
+    def __init__(self):
+        self._productos = None
+        self._pendiente = False
+        self.valido = False
+        self._codigos_por_trigrama = {}
+        self._trigramas_por_codigo = {}
+        self._nombre_por_codigo = {}
+
+    def construir(self, productos):
+        """Arma el índice completo"""
+        self._codigos_por_trigrama = {}
+        self._trigramas_por_codigo = {}
+        self._nombre_por_codigo = {}
+        for codigo, producto in productos.items():
+            self._agregar(codigo, nombre_de(producto))
+        self._productos = productos
+        self._pendiente = False
+        self.valido = True
+
+    def construir_despues(self, productos):
+        """Deja anotado el catálogo nuevo; se aplica (solo las diferencias) en la próxima búsqueda"""
+        self._productos = productos
+        self._pendiente = True
+
+    def sincronizar(self, productos):
+        """Aplica al índice solo los productos nuevos, borrados o con otro nombre"""
+        for codigo in [c for c in self._nombre_por_codigo if c not in productos]:
+            self.quitar(codigo)
+        for codigo, producto in productos.items():
+            self.actualizar(codigo, producto)
+        self._productos = productos
+        self._pendiente = False
+
+    def actualizar(self, codigo, producto):
+        """Agrega o actualiza un producto (no hace nada si el nombre no cambió)"""
+        if not self.valido:
+            return
+        nombre = nombre_de(producto)
+        if self._nombre_por_codigo.get(codigo) == nombre:
+            return
+        self.quitar(codigo)
+        self._agregar(codigo, nombre)
+
+    def quitar(self, codigo):
+        """Quita un producto del índice"""
+        if not self.valido:
+            return
+        self._nombre_por_codigo.pop(codigo, None)
+        for trigrama in self._trigramas_por_codigo.pop(codigo, ()):
+            codigos = self._codigos_por_trigrama[trigrama]
+            codigos.discard(codigo)
+            if not codigos:
+                del self._codigos_por_trigrama[trigrama]
+
+    def _agregar(self, codigo, nombre):
+        propios = trigramas(nombre)
+        self._nombre_por_codigo[codigo] = nombre
+        self._trigramas_por_codigo[codigo] = propios
+        for trigrama in propios:
+            self._codigos_por_trigrama.setdefault(trigrama, set()).add(codigo)
+
+    def buscar(self, texto, limite=LIMITE_RESULTADOS, similitud_minima=SIMILITUD_MINIMA):
+        """Códigos ordenados de más a menos parecido al texto"""
+        if not self.valido:
+            if self._productos is None:
+                return []
+            self.construir(self._productos)
+        elif self._pendiente:
+            self.sincronizar(self._productos)
+
+        buscados = trigramas(texto)
+        if not buscados:
+            return []
+        necesarios = max(1, math.ceil(len(buscados) * similitud_minima))
+
+        # Trigramas en común por producto (Counter cuenta cada lista de códigos en C)
+        comunes = Counter()
+        for trigrama in buscados:
+            comunes.update(self._codigos_por_trigrama.get(trigrama, ()))
+
+        # Primero la parte de la búsqueda que coincide; a igualdad, los nombres más cortos
+        mejores = heapq.nlargest(
+            limite,
+            ((cantidad, -len(self._trigramas_por_codigo[codigo]), codigo)
+             for codigo, cantidad in comunes.items() if cantidad >= necesarios))
+        return [codigo for _, _, codigo in mejores]
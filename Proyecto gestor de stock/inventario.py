@@ -0,0 +1,288 @@
+"""
+Motor de inventario sin interfaz
+
+Inventario tiene el catálogo, los movimientos de stock, los cambios
+pendientes de guardar y los datos derivados (índices de búsqueda, totales y
+alertas). No usa Tk: las interfaces V1 y V2 lo manejan, y también se puede
+usar desde scripts, servicios o pruebas de rendimiento sin pantalla.
+
+    inventario = Inventario(crear_almacen('sqlite'))
+    inventario.cargar_local()
+    inventario.mover('7791234567890', +12)
+    inventario.guardar_local()
+"""
+
+import threading
+from datetime import datetime
+
+from almacenamiento import crear_almacen
+from indice_busqueda import IndicePrefijos, IndiceTrigramas, LIMITE_RESULTADOS
+from indicadores import AgregadosInventario
+from alertas import MotorAlertas
+
+
+class StockInsuficiente(ValueError):
+    """El movimiento dejaría el stock del producto en negativo"""
+
+
+class ProductoModificado(ValueError):
+    """El producto cambió desde que se leyó su versión (otro movimiento, recarga o terminal)"""
+
+
+class Inventario:
+    """Catálogo de productos con movimientos de stock y cambios pendientes de guardar"""
+
+    def __init__(self, almacen=None, bandeja_salida=None, usar_bandeja=None):
+        self.almacen = almacen if almacen is not None else crear_almacen('journal')
+        # Bandeja de salida de la V2 (movimientos sin enviar a la hoja); usar_bandeja() indica
+        # si hace falta registrar los movimientos en ella (si hay o hubo una hoja conectada)
+        self.bandeja_salida = bandeja_salida
+        self.usar_bandeja = usar_bandeja or (lambda: self.bandeja_salida is not None)
+        self.productos = {}
+        # Productos cambiados desde el último guardado exitoso (código -> número de cambio)
+        self.codigos_modificados = {}
+        self.contador_modificaciones = 0
+        self.lock_modificados = threading.RLock()
+        # Protege los cambios de estructura del catálogo (recargas) frente a los guardados
+        self.lock_datos = threading.RLock()
+        # Versiones por producto: cada cambio recibe el siguiente número del contador, así un
+        # movimiento confirmado sobre un stock ya leído se rechaza solo si cambió ese producto
+        self._reloj = 0
+        self._versiones = {}  # código -> versión del último cambio
+        self._version_carga = 0  # Versión de los productos que no cambiaron desde la última carga
+
+        # Datos derivados, corregidos en cada movimiento
+        self.indice_busqueda = IndicePrefijos()
+        self.indice_trigramas = IndiceTrigramas()
+        self.agregados = AgregadosInventario()
+        self.alertas = MotorAlertas()
+
+    # --- Carga del catálogo ---
+
+    def cargar_local(self):
+        """Carga el catálogo del almacenamiento local; devuelve la cantidad de productos"""
+        with self.lock_datos:
+            self.productos = self.almacen.cargar()
+            self.recalcular()
+        return len(self.productos)
+
+    def cargar_productos(self, productos, reemplazar=False):
+        """Agrega (o reemplaza) productos leídos de afuera y reaplica la bandeja de salida
+
+        Devuelve la cantidad de productos con movimientos sin enviar reaplicados.
+        """
+        with self.lock_datos:
+            if reemplazar:
+                self.productos.clear()
+                with self.lock_modificados:
+                    self.codigos_modificados.clear()
+            self.productos.update(productos)
+            aplicados = self.aplicar_bandeja_salida()
+            self.recalcular()
+        return aplicados
+
+    def importar_productos(self, productos):
+        """Agrega o actualiza productos leídos de un archivo (iterable); devuelve la cantidad
+
+        En los productos existentes solo se reemplazan los campos que trae el archivo; los
+        nuevos empiezan con stock 0 si el archivo no tiene esa columna. Como en una recarga de
+        la hoja, los movimientos sin enviar se reaplican sobre el stock leído.
+
+        El archivo se lee y se controla entero antes de tocar el catálogo: lanza ValueError
+        (sin cambiar nada) si un producto no tiene código o su stock no es un entero.
+        """
+        leidos = []
+        for producto in productos:
+            if not producto.get('codigo'):
+                raise ValueError(f"Producto sin código: {producto}")
+            stock = producto.get('stock', 0)
+            if not isinstance(stock, int) or isinstance(stock, bool):
+                raise ValueError(f"Stock inválido para {producto['codigo']}: {stock!r}")
+            leidos.append(producto)
+
+        deltas = self.bandeja_salida.deltas_por_codigo() if self.bandeja_salida is not None else {}
+        with self.lock_datos:
+            with self.lock_modificados:
+                for producto in leidos:
+                    codigo = producto['codigo']
+                    existente = self.productos.get(codigo)
+                    if existente is None:
+                        existente = self.productos[codigo] = {'stock': 0, **producto}
+                    else:
+                        existente.update(producto)
+                    if deltas.get(codigo) and 'stock' in producto:
+                        existente['stock'] += deltas[codigo]
+                    # Cada producto importado cambió (datos o stock): queda pendiente de guardar
+                    self.marcar_modificado(codigo)
+                    self._nueva_version(codigo)
+            self.recalcular()
+        return len(leidos)
+
+    def recalcular(self):
+        """Rehace totales y alertas y deja los índices para la próxima búsqueda (cargas completas)"""
+        # Todo el catálogo pudo cambiar: las versiones leídas antes de la carga quedan viejas
+        with self.lock_modificados:
+            self._reloj += 1
+            self._version_carga = self._reloj
+            self._versiones.clear()
+        self.indice_busqueda.construir_despues(self.productos)
+        self.indice_trigramas.construir_despues(self.productos)
+        self.agregados.construir(self.productos)
+        self.alertas.construir(self.productos)
+
+    # --- Movimientos ---
+
+    def producto(self, codigo):
+        """Devuelve el producto del código (None si no existe)"""
+        return self.productos.get(codigo)
+
+    def version(self, codigo):
+        """Versión actual del producto (cambia con cada movimiento o recarga)"""
+        return self._versiones.get(codigo, self._version_carga)
+
+    def version_actual(self):
+        """Versión del último cambio de cualquier producto"""
+        return self._reloj
+
+    def _nueva_version(self, codigo):
+        self._reloj += 1
+        self._versiones[codigo] = self._reloj
+
+    def mover(self, codigo, delta, version=None):
+        """Suma delta al stock del producto y lo deja pendiente de guardar; devuelve el stock nuevo
+
+        Lanza KeyError si el código no existe y StockInsuficiente si el stock quedaría negativo.
+        Con version (leída con self.version antes de confirmar), lanza ProductoModificado si el
+        producto cambió después de esa versión; los demás productos se pueden mover libremente.
+        """
+        with self.lock_modificados:
+            producto = self.productos[codigo]
+            if version is not None and self.version(codigo) > version:
+                raise ProductoModificado(f"El producto {codigo} cambió (stock actual: {producto['stock']})")
+            if producto['stock'] + delta < 0:
+                raise StockInsuficiente(f"Stock insuficiente de {codigo}: {producto['stock']} (movimiento {delta:+d})")
+            producto['stock'] += delta
+            producto['ultima_actualizacion'] = datetime.now().strftime("%Y-%m-%d %H:%M")
+            if delta and self.bandeja_salida is not None and self.usar_bandeja():
+                self.bandeja_salida.agregar(codigo, delta)
+            self.marcar_modificado(codigo)
+            self._nueva_version(codigo)
+            stock = producto['stock']
+        self.producto_cambiado(codigo)
+        return stock
+
+    def aplicar_lote(self, movimientos):
+        """Aplica una lista de (código, delta) entera o nada; devuelve la cantidad de productos movidos
+
+        Los movimientos del mismo código se suman antes de controlar el stock. Lanza KeyError si
+        algún código no existe y StockInsuficiente si algún stock quedaría negativo.
+        """
+        totales = {}
+        for codigo, delta in movimientos:
+            totales[codigo] = totales.get(codigo, 0) + delta
+        with self.lock_modificados:
+            for codigo, delta in totales.items():
+                stock = self.productos[codigo]['stock']
+                if stock + delta < 0:
+                    raise StockInsuficiente(f"Stock insuficiente de {codigo}: {stock} (movimiento {delta:+d})")
+            for codigo, delta in totales.items():
+                self.mover(codigo, delta)
+        return len(totales)
+
+    def agregar_producto(self, producto):
+        """Agrega un producto nuevo (o reemplaza uno existente) al catálogo"""
+        codigo = producto['codigo']
+        with self.lock_modificados:
+            # La tabla de SQLite escribe la fila al asignarla: el aporte anterior se descuenta antes
+            self.agregados.quitar(codigo)
+            self.productos[codigo] = producto
+            self.marcar_modificado(codigo)
+            self._nueva_version(codigo)
+        self.producto_cambiado(codigo)
+
+    def marcar_modificado(self, codigo):
+        """Registra que un producto cambió y debe guardarse en el próximo guardado"""
+        with self.lock_modificados:
+            self.contador_modificaciones += 1
+            self.codigos_modificados[codigo] = self.contador_modificaciones
+
+    def producto_cambiado(self, codigo):
+        """Corrige índices, totales y alertas de un producto que cambió (o se quitó)"""
+        producto = self.productos.get(codigo)
+        if producto is not None:
+            self.indice_busqueda.actualizar(codigo, producto)
+            self.indice_trigramas.actualizar(codigo, producto)
+            self.agregados.actualizar(codigo, producto)
+            self.alertas.actualizar(codigo, producto)
+        else:
+            self.indice_busqueda.quitar(codigo)
+            self.indice_trigramas.quitar(codigo)
+            self.agregados.quitar(codigo)
+            self.alertas.quitar(codigo)
+
+    def aplicar_bandeja_salida(self):
+        """Reaplica sobre el stock recién leído los movimientos que no llegaron a enviarse
+
+        Devuelve cuántos productos se modificaron (0 si no hay bandeja o está vacía).
+        """
+        if self.bandeja_salida is None:
+            return 0
+        secuencia = self.bandeja_salida.ultima_secuencia()
+        aplicados = 0
+        for codigo, delta in self.bandeja_salida.deltas_por_codigo().items():
+            if codigo in self.productos and delta:
+                self.productos[codigo]['stock'] += delta
+                self.marcar_modificado(codigo)
+                aplicados += 1
+        if not aplicados:
+            # Movimientos de productos que ya no están en la hoja (o que se anulan entre sí)
+            self.bandeja_salida.confirmar(secuencia)
+        return aplicados
+
+    # --- Guardado ---
+
+    def tomar_pendientes(self):
+        """Devuelve (pendientes, secuencia, stocks) para guardar
+
+        El stock y el último movimiento de la bandeja se toman juntos: lo que se escriba
+        incluye exactamente los movimientos hasta esa secuencia.
+        """
+        with self.lock_modificados:
+            pendientes = dict(self.codigos_modificados)
+            secuencia = self.bandeja_salida.ultima_secuencia() if self.bandeja_salida is not None else None
+            stocks = {codigo: self.productos[codigo]['stock'] for codigo in pendientes if codigo in self.productos}
+        return pendientes, secuencia, stocks
+
+    def confirmar_pendientes(self, pendientes, secuencia=None):
+        """Quita lo que se guardó: si un producto volvió a cambiar mientras tanto, sigue pendiente"""
+        if secuencia is not None and self.bandeja_salida is not None:
+            self.bandeja_salida.confirmar(secuencia)
+        with self.lock_modificados:
+            for codigo, numero in pendientes.items():
+                if self.codigos_modificados.get(codigo) == numero:
+                    del self.codigos_modificados[codigo]
+
+    def guardar_local(self, completo=False):
+        """Guarda en el almacenamiento local los productos pendientes (o todos)"""
+        with self.lock_datos:
+            pendientes, _, _ = self.tomar_pendientes()
+            if not pendientes and not completo:
+                return
+            self.almacen.guardar(self.productos, None if completo else list(pendientes))
+            self.confirmar_pendientes(pendientes)
+
+    def cerrar(self):
+        """Cierra el almacenamiento local (compacta el diario o cierra la base)"""
+        self.almacen.cerrar(self.productos)
+
+    # --- Consultas ---
+
+    def buscar(self, texto, aproximada=False, limite=LIMITE_RESULTADOS):
+        """Códigos que coinciden con el texto (por prefijo o aproximados, ordenados por parecido)"""
+        if aproximada:
+            return self.indice_trigramas.buscar(texto, limite)
+        return self.indice_busqueda.buscar(texto, limite)
+
+    def resumen(self):
+        """Total de productos, stock bajo y valor del inventario (sin recorrer el catálogo)"""
+        return self.agregados.resumen(self.productos)
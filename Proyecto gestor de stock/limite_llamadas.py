@@ -0,0 +1,147 @@
+"""
+Límite de llamadas a la API de Google Sheets
+
+Google Sheets limita la cantidad de pedidos por minuto y responde 429 (cuota
+excedida) o 5xx (error temporal) cuando se supera o el servicio está cargado.
+Todas las operaciones sobre la hoja pasan por HojaLimitada, que:
+- espera un turno en un cubo de fichas compartido (ritmo configurable)
+- reintenta los 429/5xx con espera exponencial y variación aleatoria
+- cuenta las llamadas, las esperas y los reintentos
+Los reintentos no se imprimen: el último aviso queda en el limitador y la
+interfaz lo muestra en la barra de estado (tomar_aviso, desde el hilo de Tk).
+"""
+
+import random
+import threading
+import time
+
+# Ritmo por defecto: ráfagas de hasta 10 pedidos y 1 pedido por segundo sostenido
+# (por debajo del límite de 60 pedidos por minuto por usuario de Google Sheets)
+CAPACIDAD_CUBO = 10
+FICHAS_POR_SEGUNDO = 1.0
+REINTENTOS = 5
+ESPERA_BASE = 1.0
+ESPERA_MAXIMA = 32.0
+
+
+def codigo_estado(error):
+    """Devuelve el código HTTP de un error de gspread/requests (None si no tiene)"""
+    codigo = getattr(error, 'code', None)
+    if isinstance(codigo, int):
+        return codigo
+    respuesta = getattr(error, 'response', None)
+    return getattr(respuesta, 'status_code', None)
+
+
+def es_error_temporal(error):
+    """Indica si conviene reintentar el pedido (cuota excedida o error del servidor)"""
+    codigo = codigo_estado(error)
+    return codigo is not None and (codigo == 429 or 500 <= codigo < 600)
+
+
+class CuboFichas:
+    """Cubo de fichas: cada llamada toma una ficha y las fichas se reponen a ritmo fijo"""
+
+    def __init__(self, capacidad=CAPACIDAD_CUBO, fichas_por_segundo=FICHAS_POR_SEGUNDO):
+        self.capacidad = capacidad
+        self.fichas_por_segundo = fichas_por_segundo
+        self._fichas = float(capacidad)
+        self._ultima_reposicion = time.monotonic()
+        self._lock = threading.Lock()
+
+    def tomar(self):
+        """Espera hasta que haya una ficha disponible; devuelve los segundos esperados"""
+        esperado = 0.0
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._fichas = min(self.capacidad,
+                                   self._fichas + (ahora - self._ultima_reposicion) * self.fichas_por_segundo)
+                self._ultima_reposicion = ahora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return esperado
+                espera = (1 - self._fichas) / self.fichas_por_segundo
+            time.sleep(espera)
+            esperado += espera
+
+
+class LimitadorLlamadas:
+    """Cubo de fichas compartido, política de reintentos y contadores de todas las hojas"""
+
+    def __init__(self, capacidad=CAPACIDAD_CUBO, fichas_por_segundo=FICHAS_POR_SEGUNDO,
+                 reintentos=REINTENTOS, espera_base=ESPERA_BASE, espera_maxima=ESPERA_MAXIMA):
+        self.cubo = CuboFichas(capacidad, fichas_por_segundo)
+        self.reintentos = reintentos
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self._lock = threading.Lock()
+        self.contadores = {
+            'llamadas': 0,      # Pedidos enviados a la API (incluye reintentos)
+            'demoradas': 0,     # Llamadas que esperaron turno en el cubo
+            'limitadas': 0,     # Respuestas 429 (cuota excedida)
+            'errores_servidor': 0,  # Respuestas 5xx
+            'reintentos': 0,
+            'fallidas': 0       # Llamadas que agotaron los reintentos
+        }
+        self._aviso = None  # Último reintento sin mostrar en la interfaz
+
+    def _contar(self, nombre):
+        with self._lock:
+            self.contadores[nombre] += 1
+
+    def llamar(self, funcion, *args, **kwargs):
+        """Ejecuta funcion respetando el cubo y reintenta los errores temporales"""
+        intento = 0
+        while True:
+            if self.cubo.tomar() > 0:
+                self._contar('demoradas')
+            self._contar('llamadas')
+            try:
+                return funcion(*args, **kwargs)
+            except Exception as e:
+                if not es_error_temporal(e):
+                    raise
+                self._contar('limitadas' if codigo_estado(e) == 429 else 'errores_servidor')
+                if intento >= self.reintentos:
+                    self._contar('fallidas')
+                    raise
+                # Espera exponencial con variación aleatoria completa (evita reintentos sincronizados)
+                espera = random.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** intento))
+                intento += 1
+                self._contar('reintentos')
+                with self._lock:
+                    self._aviso = f"Google Sheets respondió {codigo_estado(e)}: reintento {intento} en {espera:.1f} s"
+                time.sleep(espera)
+
+    def tomar_aviso(self):
+        """Devuelve el último aviso de reintento sin mostrar (None si no hay) y lo borra"""
+        with self._lock:
+            aviso, self._aviso = self._aviso, None
+        return aviso
+
+    def resumen(self):
+        """Texto corto con los contadores para reportes y diagnósticos"""
+        with self._lock:
+            c = dict(self.contadores)
+        return (f"{c['llamadas']} llamadas, {c['demoradas']} demoradas por el límite, "
+                f"{c['limitadas']} respuestas 429, {c['errores_servidor']} errores 5xx, "
+                f"{c['reintentos']} reintentos, {c['fallidas']} fallidas")
+
+
+class HojaLimitada:
+    """Envuelve un worksheet de gspread: cada método pasa por el limitador de llamadas"""
+
+    def __init__(self, worksheet, limitador):
+        self._worksheet = worksheet
+        self._limitador = limitador
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._worksheet, nombre)
+        if not callable(atributo):
+            # Propiedades como id, title o row_count no hacen pedidos a la API
+            return atributo
+
+        def llamada_limitada(*args, **kwargs):
+            return self._limitador.llamar(atributo, *args, **kwargs)
+        return llamada_limitada
@@ -0,0 +1,28 @@
+"""
+Funciones auxiliares sobre el diccionario de producto
+
+La V1 guarda 'stock_minimo' y 'precio' (número); los productos que la V2
+lee de la hoja de publicaciones usan 'stock_min' y 'precio_costo' (texto
+como '$1,234.50'). Estas funciones leen ambos formatos.
+"""
+
+
+def stock_minimo_de(producto):
+    """Devuelve el stock mínimo del producto"""
+    return producto.get('stock_min', producto.get('stock_minimo', 0))
+
+
+def precio_de(producto):
+    """Devuelve el precio de costo del producto como número"""
+    precio = producto.get('precio_costo', producto.get('precio', 0))
+    if isinstance(precio, str):
+        try:
+            return float(precio.replace('$', '').replace(',', '').strip() or 0)
+        except ValueError:
+            return 0.0
+    return float(precio or 0)
+
+
+def nombre_de(producto):
+    """Devuelve el nombre a mostrar del producto (título de la publicación si existe)"""
+    return producto.get('titulo') or producto.get('producto', '')
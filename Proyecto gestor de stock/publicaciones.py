@@ -0,0 +1,87 @@
+"""
+Importación de la exportación de publicaciones del marketplace
+
+Lee el archivo exportado (CSV, o el XLSX guardado como CSV desde Excel) con
+las mismas columnas que la V2 lee de la hoja de Google: 'Codigo de producto
+(seller custom field)', 'TÍTULO', 'Stock', 'Stock min' y 'Precio costo'.
+Los encabezados se ubican igual que en la hoja (detectar_columnas en las
+primeras FILAS_ENCABEZADO filas) y el resto se procesa de a una fila, sin
+cargar el archivo entero.
+"""
+
+import csv
+from datetime import datetime
+from itertools import chain, islice
+
+from hojas_google import FILAS_ENCABEZADO, buscar_fila_encabezados, detectar_columnas
+
+# Bytes del principio del archivo que se miran para elegir codificación y separador
+MUESTRA_BYTES = 65536
+
+
+def abrir_csv(ruta):
+    """Abre el CSV con la codificación y el separador detectados; devuelve (archivo, separador)
+
+    Excel guarda los CSV en UTF-8 (con marca BOM) o en Windows-1252 según la versión.
+    """
+    with open(ruta, 'rb') as f:
+        muestra = f.read(MUESTRA_BYTES)
+    try:
+        muestra.decode('utf-8')
+        codificacion = 'utf-8-sig'
+    except UnicodeDecodeError as e:
+        # Un carácter cortado al final de la muestra no indica otra codificación
+        codificacion = 'utf-8-sig' if e.start >= len(muestra) - 3 else 'cp1252'
+
+    texto = muestra.decode(codificacion, errors='ignore')
+    separador = max((';', ',', '\t'), key=texto.count)
+    return open(ruta, 'r', encoding=codificacion, newline=''), separador
+
+
+def _entero(valor):
+    valor = valor.strip()
+    return int(valor) if valor.isdigit() else 0
+
+
+def producto_de_publicacion(fila, columnas, fecha):
+    """Arma el producto de una fila (solo con las columnas encontradas); None si no tiene código"""
+    valor = lambda nombre: fila[columnas[nombre]].strip() if columnas[nombre] < len(fila) else ''
+    codigo = valor('codigo')
+    if not codigo:
+        return None
+
+    producto = {'codigo': codigo, 'ultima_actualizacion': fecha}
+    if 'titulo' in columnas:
+        producto['titulo'] = producto['producto'] = valor('titulo')
+    if 'stock' in columnas:
+        producto['stock'] = _entero(valor('stock'))
+    if 'stock_min' in columnas:
+        producto['stock_min'] = _entero(valor('stock_min'))
+    if 'precio_costo' in columnas:
+        producto['precio_costo'] = valor('precio_costo')
+    return producto
+
+
+def leer_publicaciones(ruta, filas_encabezado=FILAS_ENCABEZADO):
+    """Recorre la exportación de a una fila: (número de fila, producto) con los campos de la V2
+
+    Lanza ValueError si no encuentra los encabezados o la columna de código.
+    """
+    archivo, separador = abrir_csv(ruta)
+    with archivo:
+        lector = csv.reader(archivo, delimiter=separador)
+        primeras = list(islice(lector, filas_encabezado))
+        fila_encabezados = buscar_fila_encabezados(primeras)
+        if fila_encabezados is None:
+            raise ValueError("No se encontraron encabezados válidos en el archivo")
+        columnas = detectar_columnas(primeras[fila_encabezados])
+        if 'codigo' not in columnas:
+            raise ValueError("No se encontró la columna de código en el archivo")
+
+        fecha = datetime.now().strftime("%Y-%m-%d %H:%M")
+        filas = chain(enumerate(primeras[fila_encabezados + 1:], fila_encabezados + 2),
+                      enumerate(lector, len(primeras) + 1))
+        for numero, fila in filas:
+            producto = producto_de_publicacion(fila, columnas, fecha)
+            if producto is not None:
+                yield numero, producto
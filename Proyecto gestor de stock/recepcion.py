@@ -0,0 +1,59 @@
+"""
+Recepción y preparación rápida de mercadería
+
+En modo recepción cada escaneo suma 1 unidad y en modo preparación resta 1,
+pero solo en un conteo en memoria: no se abren ventanas ni se toca el stock
+por cada unidad. Al terminar se revisa el conteo en una sola pantalla y se
+confirma todo junto (un guardado y una sincronización para el lote entero).
+"""
+
+MODO_NORMAL = 'normal'
+MODO_RECEPCION = 'recepcion'      # Cada escaneo suma 1
+MODO_PREPARACION = 'preparacion'  # Cada escaneo resta 1
+
+DELTA_POR_MODO = {MODO_RECEPCION: 1, MODO_PREPARACION: -1}
+
+
+class LoteMovimientos:
+    """Conteo en memoria de los escaneos de un lote (código -> unidades netas)"""
+
+    def __init__(self):
+        self.cantidades = {}  # En orden del primer escaneo de cada código
+        self._escaneos = []   # (código, delta) para poder deshacer el último
+
+    def agregar(self, codigo, delta):
+        """Suma delta al conteo del código; devuelve el conteo acumulado"""
+        self.cantidades[codigo] = self.cantidades.get(codigo, 0) + delta
+        self._escaneos.append((codigo, delta))
+        return self.cantidades[codigo]
+
+    def deshacer(self):
+        """Anula el último escaneo; devuelve su código (None si el lote está vacío)"""
+        if not self._escaneos:
+            return None
+        codigo, delta = self._escaneos.pop()
+        self.cantidades[codigo] -= delta
+        if not any(c == codigo for c, _ in self._escaneos):
+            del self.cantidades[codigo]
+        return codigo
+
+    def movimientos(self):
+        """Pares (código, delta) a aplicar, sin los que se anularon entre sí"""
+        return [(codigo, delta) for codigo, delta in self.cantidades.items() if delta]
+
+    def faltantes(self, productos):
+        """Códigos cuyo stock quedaría negativo al aplicar el lote"""
+        return [codigo for codigo, delta in self.movimientos()
+                if codigo in productos and productos[codigo]['stock'] + delta < 0]
+
+    def vaciar(self):
+        """Descarta el conteo (después de confirmarlo o al cancelar el lote)"""
+        self.cantidades = {}
+        self._escaneos = []
+
+    def total_unidades(self):
+        """Unidades escaneadas en el lote (sin signo)"""
+        return sum(abs(delta) for delta in self.cantidades.values())
+
+    def __len__(self):
+        return len(self._escaneos)
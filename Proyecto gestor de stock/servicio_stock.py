@@ -0,0 +1,289 @@
+"""
+Servicio de stock compartido para varias terminales
+
+Un solo proceso es dueño del inventario (un Inventario con su almacenamiento
+local) y las terminales (ventanas de Control_stock.py o scripts) se conectan
+por la red local. Todos los movimientos pasan por el bucle de asyncio del
+servicio, así que se aplican de a uno y en orden: dos terminales que
+descuentan el mismo producto nunca se pisan. Cada cambio se avisa a las
+demás terminales conectadas y se guarda en el almacenamiento local en
+segundo plano (cada SEGUNDOS_GUARDADO, todos los cambios juntos).
+
+    python servicio_stock.py --puerto 8765 --modo journal
+
+Protocolo: una línea JSON por mensaje.
+- Pedido:    {"id": 1, "op": "mover", "codigo": "779...", "delta": -1, "version": 41}
+- Respuesta: {"id": 1, "ok": true, "producto": {...}, "version": 42}
+- Error:     {"id": 1, "ok": false, "error": "stock_insuficiente", "mensaje": "..."}
+- Aviso:     {"evento": "productos", "cambios": [[{...producto...}, 43], ...]}
+Operaciones: catalogo, producto, buscar, resumen, mover, lote, agregar.
+'version' es la versión del producto en el inventario (Inventario.version) y
+crece con cada cambio: la terminal descarta los avisos más viejos que lo que
+ya tiene. Un "mover" con "version" se rechaza (error producto_modificado) si
+ese producto cambió después de esa versión; los cambios de otros productos no
+lo afectan.
+"""
+
+import argparse
+import asyncio
+import json
+
+from almacenamiento import crear_almacen
+from inventario import Inventario, ProductoModificado, StockInsuficiente
+
+HOST = '0.0.0.0'
+PUERTO = 8765
+
+# Intervalo (segundos) entre guardados de los cambios acumulados
+SEGUNDOS_GUARDADO = 1.0
+
+# Largo máximo de una línea de pedido (los lotes grandes entran en una línea)
+LARGO_MAXIMO_PEDIDO = 16 * 1024 * 1024
+
+
+class PedidoInvalido(ValueError):
+    """El pedido no tiene la forma esperada"""
+
+
+class CodigoDesconocido(KeyError):
+    """El pedido nombra un producto que no está en el catálogo"""
+
+
+def _campo(pedido, nombre):
+    """Valor de un campo obligatorio del pedido"""
+    if nombre not in pedido:
+        raise PedidoInvalido(f"Falta '{nombre}' en el pedido")
+    return pedido[nombre]
+
+
+def _es_numero(valor):
+    return isinstance(valor, (int, float)) and not isinstance(valor, bool)
+
+
+def producto_valido(datos):
+    """Copia del producto de un pedido 'agregar', con código y stock controlados
+
+    Lanza PedidoInvalido si falta el código o si el stock, el mínimo o el precio no son números.
+    """
+    if not isinstance(datos, dict):
+        raise PedidoInvalido("'producto' debe ser un objeto")
+    producto = dict(datos)
+    codigo = str(producto.get('codigo') or '').strip()
+    if not codigo:
+        raise PedidoInvalido("Falta el código del producto")
+    producto['codigo'] = codigo
+    stock = producto.setdefault('stock', 0)
+    if not isinstance(stock, int) or isinstance(stock, bool) or stock < 0:
+        raise PedidoInvalido(f"Stock inválido para {codigo}: {stock!r}")
+    for campo in ('stock_minimo', 'stock_min', 'precio'):
+        if campo in producto and not _es_numero(producto[campo]):
+            raise PedidoInvalido(f"'{campo}' inválido para {codigo}: {producto[campo]!r}")
+    # La V2 guarda el precio de costo como texto ('$1,234.50')
+    if 'precio_costo' in producto and not isinstance(producto['precio_costo'], str) \
+            and not _es_numero(producto['precio_costo']):
+        raise PedidoInvalido(f"'precio_costo' inválido para {codigo}: {producto['precio_costo']!r}")
+    return producto
+
+
+def codificar(mensaje):
+    """Convierte un mensaje en una línea del protocolo"""
+    return json.dumps(mensaje, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+class ServicioStock:
+    """Servidor asyncio que atiende a las terminales sobre un único Inventario"""
+
+    def __init__(self, inventario, host=HOST, puerto=PUERTO, segundos_guardado=SEGUNDOS_GUARDADO):
+        self.inventario = inventario
+        self.host = host
+        self.puerto = puerto
+        self.segundos_guardado = segundos_guardado
+        self._conexiones = set()  # StreamWriter de cada terminal conectada
+        self._servidor = None
+        self._tarea_guardado = None
+        self._guardado = None  # Guardado en curso en otro hilo
+        self._operaciones = {
+            'catalogo': self._catalogo,
+            'producto': self._producto,
+            'buscar': self._buscar,
+            'resumen': self._resumen,
+            'mover': self._mover,
+            'lote': self._lote,
+            'agregar': self._agregar,
+        }
+
+    async def iniciar(self):
+        """Empieza a escuchar (con puerto 0 se elige uno libre y queda en self.puerto)"""
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.puerto,
+                                                    limit=LARGO_MAXIMO_PEDIDO)
+        self.puerto = self._servidor.sockets[0].getsockname()[1]
+        self._tarea_guardado = asyncio.create_task(self._guardar_periodicamente())
+
+    async def servir(self):
+        """Inicia el servicio y atiende hasta que se cancele"""
+        await self.iniciar()
+        async with self._servidor:
+            await self._servidor.serve_forever()
+
+    async def detener(self):
+        """Deja de aceptar terminales, cierra las conexiones y guarda lo pendiente"""
+        if self._tarea_guardado is not None:
+            self._tarea_guardado.cancel()
+        if self._servidor is not None:
+            self._servidor.close()
+        for writer in list(self._conexiones):
+            writer.close()
+        if self._guardado is not None:
+            # Que el hilo termine de escribir antes del último guardado (un solo escritor por archivo)
+            await asyncio.wait([self._guardado])
+        self.inventario.guardar_local()
+
+    # --- Conexiones ---
+
+    async def _atender(self, reader, writer):
+        """Atiende una terminal: procesa sus pedidos en orden hasta que se desconecte"""
+        self._conexiones.add(writer)
+        try:
+            while True:
+                linea = await reader.readline()
+                if not linea:
+                    break
+                writer.write(codificar(self._responder(linea, writer)))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            self._conexiones.discard(writer)
+            writer.close()
+
+    def _responder(self, linea, writer):
+        """Ejecuta un pedido y arma la respuesta (los errores vuelven a la terminal)"""
+        pedido = {}
+        try:
+            pedido = json.loads(linea)
+            operacion = self._operaciones.get(pedido.get('op'))
+            if operacion is None:
+                raise PedidoInvalido(f"Operación desconocida: {pedido.get('op')}")
+            respuesta = operacion(pedido, writer)
+            respuesta['ok'] = True
+        except StockInsuficiente as e:
+            respuesta = {'ok': False, 'error': 'stock_insuficiente', 'mensaje': str(e)}
+        except ProductoModificado as e:
+            respuesta = {'ok': False, 'error': 'producto_modificado', 'mensaje': str(e)}
+        except CodigoDesconocido as e:
+            respuesta = {'ok': False, 'error': 'codigo_desconocido', 'mensaje': f"Código desconocido: {e.args[0]}"}
+        except (ValueError, TypeError, AttributeError, KeyError) as e:
+            respuesta = {'ok': False, 'error': 'pedido_invalido', 'mensaje': str(e)}
+        respuesta['id'] = pedido.get('id') if isinstance(pedido, dict) else None
+        return respuesta
+
+    def _avisar_cambios(self, codigos, origen):
+        """Avisa a las demás terminales los productos cambiados, con su versión"""
+        cambios = [[self.inventario.producto(codigo), self.inventario.version(codigo)] for codigo in codigos]
+        linea = codificar({'evento': 'productos', 'cambios': cambios})
+        for writer in self._conexiones:
+            if writer is not origen and not writer.is_closing():
+                writer.write(linea)
+        return cambios
+
+    # --- Operaciones ---
+
+    def _codigo_existente(self, codigo):
+        if self.inventario.producto(codigo) is None:
+            raise CodigoDesconocido(codigo)
+        return codigo
+
+    def _catalogo(self, pedido, writer):
+        return {'productos': dict(self.inventario.productos.items()), 'version': self.inventario.version_actual()}
+
+    def _producto(self, pedido, writer):
+        return {'producto': self.inventario.producto(str(_campo(pedido, 'codigo')))}
+
+    def _buscar(self, pedido, writer):
+        codigos = self.inventario.buscar(str(pedido.get('texto', '')), aproximada=bool(pedido.get('aproximada')),
+                                         limite=int(pedido.get('limite', 50)))
+        return {'productos': [self.inventario.producto(codigo) for codigo in codigos]}
+
+    def _resumen(self, pedido, writer):
+        return {'resumen': self.inventario.resumen()}
+
+    def _mover(self, pedido, writer):
+        codigo = self._codigo_existente(str(_campo(pedido, 'codigo')))
+        version = pedido.get('version')
+        self.inventario.mover(codigo, int(_campo(pedido, 'delta')), None if version is None else int(version))
+        producto, version = self._avisar_cambios([codigo], writer)[0]
+        return {'producto': producto, 'version': version}
+
+    def _lote(self, pedido, writer):
+        movimientos = [(self._codigo_existente(str(codigo)), int(delta))
+                       for codigo, delta in _campo(pedido, 'movimientos')]
+        # Entero o nada: si algún stock quedaría negativo no se mueve ninguno
+        self.inventario.aplicar_lote(movimientos)
+        codigos = list(dict.fromkeys(codigo for codigo, _ in movimientos))
+        return {'cambios': self._avisar_cambios(codigos, writer)}
+
+    def _agregar(self, pedido, writer):
+        producto = producto_valido(_campo(pedido, 'producto'))
+        self.inventario.agregar_producto(producto)
+        producto, version = self._avisar_cambios([producto['codigo']], writer)[0]
+        return {'producto': producto, 'version': version}
+
+    # --- Guardado ---
+
+    async def _guardar_periodicamente(self):
+        """Guarda los cambios acumulados cada segundos_guardado (un guardado para muchos movimientos)"""
+        while True:
+            await asyncio.sleep(self.segundos_guardado)
+            if not self.inventario.codigos_modificados:
+                continue
+            try:
+                await self._guardar_en_otro_hilo()
+            except Exception as e:
+                print(f"Error al guardar el inventario: {e}")
+
+    async def _guardar_en_otro_hilo(self):
+        """Escribe los cambios pendientes desde un hilo, sobre una copia de esos productos
+
+        El bucle sigue moviendo y agregando productos mientras el hilo escribe: el archivo
+        recibe los productos tal como estaban al empezar el guardado. Solo se copia el catálogo
+        entero cuando el almacenamiento lo va a escribir completo (JSON o instantánea del diario).
+        """
+        pendientes, _, _ = self.inventario.tomar_pendientes()
+        productos = self.inventario.productos
+        if self.inventario.almacen.reescribe_todo(len(pendientes)):
+            copia = {codigo: dict(producto) for codigo, producto in productos.items()}
+        else:
+            # Los productos quitados no van en la copia: el almacenamiento registra la baja
+            copia = {codigo: dict(productos[codigo]) for codigo in pendientes if codigo in productos}
+        self._guardado = asyncio.get_running_loop().run_in_executor(
+            None, self.inventario.almacen.guardar, copia, list(pendientes))
+        # Si se detiene el servicio mientras tanto, detener() espera a que el hilo termine
+        await asyncio.shield(self._guardado)
+        self.inventario.confirmar_pendientes(pendientes)
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Servicio de stock compartido para varias terminales")
+    parser.add_argument('--host', default=HOST, help=f"Dirección donde escuchar (por defecto {HOST})")
+    parser.add_argument('--puerto', type=int, default=PUERTO, help=f"Puerto (por defecto {PUERTO})")
+    parser.add_argument('--modo', default='journal', choices=('journal', 'sqlite', 'json'),
+                        help="Almacenamiento local, como en la interfaz")
+    parser.add_argument('--archivo', default='stock_local.json', help="Archivo del almacenamiento local")
+    opciones = parser.parse_args(argumentos)
+
+    inventario = Inventario(crear_almacen(opciones.modo, opciones.archivo))
+    cantidad = inventario.cargar_local()
+    servicio = ServicioStock(inventario, opciones.host, opciones.puerto)
+    print(f"🖧 Servicio de stock en {opciones.host}:{opciones.puerto} ({cantidad} productos)")
+    try:
+        asyncio.run(servicio.servir())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        inventario.guardar_local()
+        inventario.cerrar()
+        print("Servicio detenido")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Hilo de sincronización en segundo plano
+
+La interfaz de Tk no debe esperar a Google Sheets: cada cambio de stock se
+aplica en memoria y se pide un guardado a este hilo, que agrupa los pedidos
+acumulados y ejecuta una sola vez la función de guardado. Los resultados
+vuelven por una cola que la interfaz revisa con root.after (Tk no es seguro
+entre hilos, así que el hilo nunca toca widgets).
+"""
+
+import queue
+import threading
+
+# Marca de fin de la cola de pedidos
+_FIN = object()
+
+
+class SincronizadorFondo:
+    """Hilo dedicado que ejecuta la función de guardado fuera del hilo de la interfaz"""
+
+    def __init__(self, funcion_guardar, segundos_reintento=10):
+        # funcion_guardar(completo) -> (exito, mensaje); no debe usar widgets de Tk
+        self.funcion_guardar = funcion_guardar
+        self.segundos_reintento = segundos_reintento
+        self.pedidos = queue.Queue()
+        self.resultados = queue.Queue()
+        self._hilo = None
+        self._fallo_anterior = False
+        # Guardados completos pedidos y hechos (hay uno pendiente mientras no coincidan)
+        self._completos_pedidos = 0
+        self._completos_hechos = 0
+
+    def iniciar(self):
+        """Arranca el hilo (si no está corriendo)"""
+        if self._hilo is None or not self._hilo.is_alive():
+            self._hilo = threading.Thread(target=self._trabajar, name="SincronizadorFondo", daemon=True)
+            self._hilo.start()
+
+    def solicitar(self, completo=False):
+        """Pide un guardado de los cambios pendientes, o de todo el catálogo con completo=True (no bloquea)"""
+        if completo:
+            self._completos_pedidos += 1
+        self.pedidos.put(completo)
+
+    def completo_pendiente(self):
+        """Indica si hay un guardado completo pedido que todavía no salió bien"""
+        return self._completos_hechos < self._completos_pedidos
+
+    def detener(self, segundos_espera=30):
+        """Termina el hilo después de procesar lo que ya estaba en la cola"""
+        if self._hilo is not None and self._hilo.is_alive():
+            self.pedidos.put(_FIN)
+            self._hilo.join(segundos_espera)
+
+    def resultados_pendientes(self):
+        """Devuelve los resultados (exito, mensaje) disponibles sin esperar"""
+        resultados = []
+        while True:
+            try:
+                resultados.append(self.resultados.get_nowait())
+            except queue.Empty:
+                return resultados
+
+    def _trabajar(self):
+        """Bucle del hilo: espera pedidos, los agrupa y guarda una vez por grupo"""
+        while True:
+            try:
+                # Si el último guardado falló, se reintenta solo pasado un tiempo
+                pedido = self.pedidos.get(timeout=self.segundos_reintento if self._fallo_anterior else None)
+            except queue.Empty:
+                pedido = None
+
+            terminar = pedido is _FIN
+            # Agrupar todos los pedidos acumulados en un único guardado
+            while True:
+                try:
+                    if self.pedidos.get_nowait() is _FIN:
+                        terminar = True
+                except queue.Empty:
+                    break
+
+            # Un guardado completo pedido se repite (completo) hasta que sale bien
+            completos = self._completos_pedidos
+            try:
+                exito, mensaje = self.funcion_guardar(self._completos_hechos < completos)
+            except Exception as e:
+                exito, mensaje = False, f"Error al guardar: {e}"
+            self._fallo_anterior = not exito
+            if exito:
+                self._completos_hechos = completos
+            self.resultados.put((exito, mensaje))
+
+            if terminar:
+                return
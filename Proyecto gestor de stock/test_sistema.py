@@ -90,6 +90,1218 @@ def test_datos_ejemplo():
         print(f"❌ Error inesperado: {e}")
         return False
 
+def test_almacenamiento_journal():
+    """Prueba que el diario de movimientos se reaplique al cargar"""
+    print("\n🗒️  Probando diario de movimientos...")
+    
+    import tempfile
+    from almacenamiento import AlmacenJournal
+    
+    try:
+        with tempfile.TemporaryDirectory() as carpeta:
+            ruta = os.path.join(carpeta, "stock_local.json")
+            almacen = AlmacenJournal(ruta, registros_por_instantanea=3)
+            productos = almacen.cargar()
+            productos["111"] = {"codigo": "111", "producto": "Prueba", "stock": 1,
+                                "stock_minimo": 0, "precio": 1.0, "ultima_actualizacion": ""}
+            almacen.guardar(productos, ["111"])
+            productos["111"]["stock"] = 5
+            almacen.guardar(productos, ["111"])
+            almacen.cerrar()
+            
+            # Sin instantánea todavía: el stock sale del diario
+            recargados = AlmacenJournal(ruta, registros_por_instantanea=3).cargar()
+            if recargados.get("111", {}).get("stock") != 5:
+                print("❌ El diario no se reaplicó correctamente")
+                return False
+            
+            # Al llegar al límite se escribe la instantánea y se vacía el diario
+            productos["111"]["stock"] = 7
+            almacen.guardar(productos, ["111"])
+            almacen.cerrar()
+            with open(ruta, "r", encoding="utf-8") as f:
+                instantanea = json.load(f)
+            if instantanea["111"]["stock"] != 7 or os.path.getsize(almacen.ruta_journal) != 0:
+                print("❌ La instantánea no se escribió correctamente")
+                return False
+        
+        print("✅ Diario de movimientos - OK")
+        return True
+    except Exception as e:
+        print(f"❌ Error en el diario de movimientos: {e}")
+        return False
+
+def test_journal_datos_producto():
+    """Prueba que el diario conserve los cambios de nombre y precio sin esperar a la instantánea"""
+    print("\n🗒️  Probando datos de productos en el diario...")
+
+    import tempfile
+    from almacenamiento import AlmacenJournal
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "stock_local.json")
+        almacen = AlmacenJournal(ruta, registros_por_instantanea=100)
+        productos = almacen.cargar()
+        productos["111"] = {"codigo": "111", "producto": "Prueba", "stock": 1, "precio": 1.0,
+                            "ultima_actualizacion": ""}
+        almacen.guardar(productos, ["111"])
+        productos["111"]["stock"] = 4
+        almacen.guardar(productos, ["111"])
+        productos["111"].update(producto="Remera", precio=2.5)
+        almacen.guardar(productos, ["111"])
+        productos["111"]["stock"] = 3
+        almacen.guardar(productos, ["111"])
+
+        # Se reabre sin compactar (como después de un corte): todo sale del diario
+        recargados = AlmacenJournal(ruta, registros_por_instantanea=100).cargar()
+        assert recargados["111"] == productos["111"], f"❌ El diario perdió datos del producto: {recargados}"
+        with open(almacen.ruta_journal, encoding="utf-8") as f:
+            operaciones = [json.loads(linea)["op"] for linea in f]
+        assert operaciones == ["producto", "mov", "producto", "mov"], \
+            f"❌ Registros inesperados en el diario: {operaciones}"
+        almacen.cerrar()
+
+    print("✅ Datos de productos en el diario - OK")
+    return True
+
+def test_almacenamiento_sqlite():
+    """Prueba la tabla de productos en SQLite y sus agregados"""
+    print("\n🗄️  Probando almacenamiento SQLite...")
+    
+    import tempfile
+    from almacenamiento import AlmacenSQLite
+    
+    try:
+        with tempfile.TemporaryDirectory() as carpeta:
+            almacen = AlmacenSQLite(os.path.join(carpeta, "stock_local.db"), ruta_json=None)
+            productos = almacen.cargar()
+            productos["111"] = {"codigo": "111", "producto": "Prueba", "stock": 10,
+                                "stock_minimo": 2, "precio": 1.5, "ultima_actualizacion": ""}
+            productos["222"] = {"codigo": "222", "titulo": "Publicación", "producto": "Publicación",
+                                "stock": 1, "stock_min": 3, "precio_costo": "$1,000"}
+            productos["111"]["stock"] -= 4
+            almacen.guardar(productos, ["111"])
+            almacen.cerrar()
+            
+            productos = almacen.cargar()
+            resumen = productos.resumen()
+            if productos["111"]["stock"] != 6 or len(productos) != 2:
+                print("❌ Los productos no se guardaron correctamente")
+                return False
+            if resumen["stock_bajo"] != 1 or abs(resumen["valor_total"] - 1009.0) > 0.001:
+                print(f"❌ Agregados incorrectos: {resumen}")
+                return False
+            almacen.cerrar()
+        
+        print("✅ Almacenamiento SQLite - OK")
+        return True
+    except Exception as e:
+        print(f"❌ Error en almacenamiento SQLite: {e}")
+        return False
+
+def test_sqlite_otro_hilo():
+    """Prueba que el hilo de guardado pueda escribir en la base abierta por la interfaz"""
+    print("\n🧵 Probando guardado de SQLite desde otro hilo...")
+
+    import tempfile
+    import threading
+    from almacenamiento import AlmacenSQLite
+    from inventario import Inventario
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "stock.db")
+        inventario = Inventario(AlmacenSQLite(ruta, ruta_json=None))
+        inventario.cargar_local()
+        for i in range(50):
+            inventario.agregar_producto({"codigo": str(i), "producto": f"P{i}", "stock": 10, "precio": 1.0})
+
+        # El hilo guarda mientras la interfaz sigue moviendo y leyendo productos
+        errores = []
+        def guardar():
+            try:
+                for _ in range(20):
+                    inventario.guardar_local()
+            except Exception as e:
+                errores.append(e)
+        hilo = threading.Thread(target=guardar)
+        hilo.start()
+        for i in range(50):
+            inventario.mover(str(i), -1)
+            len(inventario.productos)
+        hilo.join()
+        assert not errores, f"❌ Error al guardar desde otro hilo: {errores}"
+
+        inventario.guardar_local()
+        inventario.cerrar()
+        copia = Inventario(AlmacenSQLite(ruta, ruta_json=None))
+        copia.cargar_local()
+        assert all(copia.productos[str(i)]["stock"] == 9 for i in range(50)), "❌ No se guardaron todos los movimientos"
+        copia.cerrar()
+
+    print("✅ Guardado de SQLite desde otro hilo - OK")
+    return True
+
+def test_sincronizador_fondo():
+    """Prueba que el hilo agrupe los pedidos y repita el guardado completo hasta lograrlo"""
+    print("\n🔄 Probando hilo de sincronización...")
+
+    import threading
+    import time
+    from sincronizador import SincronizadorFondo
+
+    llamadas = []
+    empezo, seguir = threading.Event(), threading.Event()
+    def guardar(completo):
+        empezo.set()
+        seguir.wait(5)
+        llamadas.append(completo)
+        # El primer guardado completo falla (por ejemplo, sin conexión)
+        return llamadas.count(True) > 1 or not completo, None
+
+    sincronizador = SincronizadorFondo(guardar, segundos_reintento=0.01)
+    sincronizador.iniciar()
+    sincronizador.solicitar()
+    empezo.wait(5)
+    # Mientras se guarda llegan tres pedidos más: se agrupan en un solo guardado completo,
+    # que se repite (completo) hasta que sale bien
+    for completo in (False, True, False):
+        sincronizador.solicitar(completo)
+    seguir.set()
+    limite = time.monotonic() + 5
+    while len(llamadas) < 3 and time.monotonic() < limite:
+        time.sleep(0.01)
+    sincronizador.detener(5)
+    resultados = [exito for exito, _ in sincronizador.resultados_pendientes()]
+    assert llamadas[:3] == [False, True, True] and resultados[:3] == [True, False, True], \
+        f"❌ Guardados inesperados: {llamadas}, resultados {resultados}"
+
+    print("✅ Hilo de sincronización - OK")
+    return True
+
+def test_escritura_por_bloques():
+    """Prueba que la tabla se escriba en Google Sheets con pocas llamadas"""
+    print("\n📤 Probando escritura por bloques...")
+    
+    from hojas_google import escribir_tabla, letra_columna
+    
+    class HojaFalsa:
+        row_count = 1000
+        
+        def __init__(self):
+            self.llamadas = []
+        
+        def add_rows(self, cantidad):
+            self.llamadas.append(("add_rows", cantidad))
+            self.row_count += cantidad
+        
+        def batch_update(self, datos):
+            self.llamadas.append(("batch_update", [d["range"] for d in datos]))
+        
+        def batch_clear(self, rangos):
+            self.llamadas.append(("batch_clear", rangos))
+    
+    hoja = HojaFalsa()
+    filas = [["Código", "Producto"]] + [[str(i), f"Producto {i}"] for i in range(2500)]
+    escribir_tabla(hoja, filas, filas_anteriores=3000)
+    
+    esperado = [
+        ("add_rows", 1501),
+        ("batch_update", ["A1:B1000", "A1001:B2000", "A2001:B2501"]),
+        ("batch_clear", ["A2502:B3000"])
+    ]
+    if hoja.llamadas != esperado or letra_columna(26) != "AA":
+        print(f"❌ Llamadas inesperadas: {hoja.llamadas}")
+        return False
+    
+    print("✅ Escritura por bloques - OK")
+    return True
+
+def test_indice_hoja():
+    """Prueba la lectura por columnas y que el índice de filas detecte filas movidas"""
+    print("\n🗂️  Probando lectura por columnas e índice de filas...")
+    
+    from hojas_google import leer_columnas, IndiceHoja
+    
+    class HojaFalsa:
+        id = 0
+        
+        def __init__(self, filas):
+            self.filas = filas
+            self.rangos_leidos = []
+        
+        def get(self, rango):
+            desde, hasta = (int(n) for n in rango.split(":"))
+            return self.filas[desde - 1:hasta]
+        
+        def batch_get(self, rangos, major_dimension=None):
+            self.rangos_leidos.extend(rangos)
+            respuesta = []
+            for rango in rangos:
+                columna = ord(rango[0]) - ord("A")
+                desde = int(rango.split(":")[0][1:])
+                valores = [fila[columna] if columna < len(fila) else "" for fila in self.filas[desde - 1:]]
+                # Celdas sueltas (verificación) o columnas completas (lectura por columnas)
+                respuesta.append([valores] if major_dimension == "COLUMNS" else [[valores[0]]])
+            return respuesta
+    
+    filas = [["Listado de publicaciones"],
+             ["Descripción", "Codigo de producto", "TÍTULO", "Stock"],
+             ["texto largo", "A1", "Remera", "4"], ["texto largo", "B2", "Pantalón", "0"]]
+    hoja = HojaFalsa(filas)
+    columnas, leidas = leer_columnas(hoja, ("codigo", "stock"))
+    if hoja.rangos_leidos != ["B3:B", "D3:D"] or leidas[1] != (4, {"codigo": "B2", "stock": "0"}):
+        print(f"❌ Lectura por columnas incorrecta: {hoja.rangos_leidos} {leidas}")
+        return False
+    
+    indice = IndiceHoja()
+    if not indice.construir(hoja, columnas, leidas) or indice.celda("B2") != "D4" or indice.valores["A1"] != "4":
+        print(f"❌ Índice incorrecto: {indice.fila_por_codigo} {indice.columnas}")
+        return False
+    
+    if not indice.verificar(hoja, ["A1", "B2"]):
+        print("❌ La verificación falló con la hoja sin cambios")
+        return False
+    
+    # Una fila insertada arriba corre los códigos: el índice ya no sirve
+    filas.insert(2, ["texto largo", "C3", "Gorra", "1"])
+    if indice.verificar(hoja, ["B2"]):
+        print("❌ No se detectó el cambio de estructura")
+        return False
+    
+    print("✅ Lectura por columnas e índice de filas - OK")
+    return True
+
+def test_limite_llamadas():
+    """Prueba que los 429 se reintenten y que el cubo de fichas limite el ritmo"""
+    print("\n🚦 Probando límite de llamadas...")
+    
+    import time
+    from limite_llamadas import LimitadorLlamadas, HojaLimitada
+    
+    class ErrorCuota(Exception):
+        code = 429
+    
+    class HojaFalsa:
+        id = 7
+        
+        def __init__(self):
+            self.intentos = 0
+        
+        def batch_update(self, datos):
+            self.intentos += 1
+            if self.intentos < 3:
+                raise ErrorCuota("Quota exceeded")
+            return {"responses": []}
+    
+    limitador = LimitadorLlamadas(capacidad=2, fichas_por_segundo=50, espera_base=0.001)
+    hoja = HojaLimitada(HojaFalsa(), limitador)
+    inicio = time.monotonic()
+    if hoja.batch_update([]) != {"responses": []} or hoja.id != 7:
+        print("❌ La llamada no se completó después de los reintentos")
+        return False
+    
+    contadores = limitador.contadores
+    # 3 llamadas con un cubo de 2 fichas: la tercera espera su turno (~20 ms)
+    if (contadores["limitadas"] != 2 or contadores["reintentos"] != 2 or contadores["demoradas"] != 1
+            or time.monotonic() - inicio < 0.015):
+        print(f"❌ Contadores inesperados: {contadores}")
+        return False
+    
+    # El reintento queda como aviso para la barra de estado (se toma una sola vez)
+    aviso = limitador.tomar_aviso()
+    if not aviso or "429" not in aviso or limitador.tomar_aviso() is not None:
+        print(f"❌ Aviso de reintento inesperado: {aviso}")
+        return False
+    
+    print("✅ Límite de llamadas - OK")
+    return True
+
+def test_vista_tabla():
+    """Prueba que la tabla se actualice fila por fila usando el índice por código"""
+    print("\n📋 Probando tabla indexada por código...")
+    
+    from vista_tabla import VistaTabla
+    
+    class TreeviewFalso:
+        def __init__(self):
+            self.filas = {}
+            self.inserciones = 0
+        
+        def get_children(self):
+            return tuple(self.filas)
+        
+        def insert(self, padre, posicion, values):
+            self.inserciones += 1
+            item = f"I{self.inserciones}"
+            self.filas[item] = values
+            return item
+        
+        def item(self, item, values):
+            self.filas[item] = values
+        
+        def delete(self, *items):
+            for item in items:
+                del self.filas[item]
+    
+    tabla = TreeviewFalso()
+    vista = VistaTabla(tabla, lambda p: (p["codigo"], p["stock"]))
+    productos = {"111": {"codigo": "111", "stock": 1}, "222": {"codigo": "222", "stock": 2}}
+    vista.reconstruir(productos)
+    
+    # Un cambio de stock solo toca la fila del producto, sin volver a insertar
+    productos["222"]["stock"] = 3
+    vista.actualizar("222", productos["222"])
+    vista.quitar("111")
+    if tabla.inserciones != 2 or list(tabla.filas.values()) != [("222", 3)] or vista.codigo(vista.item("222")) != "222":
+        print(f"❌ Tabla inesperada: {tabla.filas}")
+        return False
+    
+    print("✅ Tabla indexada por código - OK")
+    return True
+
+def test_tabla_virtual():
+    """Prueba que la tabla virtual cree solo las filas visibles y siga al producto seleccionado"""
+    print("\n📜 Probando tabla virtual...")
+    
+    from vista_tabla import TablaVirtual
+    
+    class TreeviewFalso:
+        def __init__(self):
+            self.filas = {}
+            self.seleccion = ()
+            self.inserciones = 0
+        
+        def cget(self, opcion):
+            return 8
+        
+        def configure(self, **opciones):
+            pass
+        
+        def bind(self, evento, funcion, add=None):
+            pass
+        
+        def insert(self, padre, posicion, values):
+            self.inserciones += 1
+            item = f"I{self.inserciones}"
+            self.filas[item] = values
+            return item
+        
+        def item(self, item, values):
+            self.filas[item] = values
+        
+        def delete(self, *items):
+            for item in items:
+                del self.filas[item]
+        
+        def selection(self):
+            return self.seleccion
+        
+        def selection_set(self, item):
+            self.seleccion = (item,)
+        
+        def selection_remove(self, items):
+            self.seleccion = ()
+    
+    class BarraFalsa:
+        def configure(self, command):
+            pass
+        
+        def set(self, primero, ultimo):
+            self.posicion = (primero, ultimo)
+    
+    tabla = TreeviewFalso()
+    barra = BarraFalsa()
+    vista = TablaVirtual(tabla, barra, lambda p: (p["codigo"], p["stock"]))
+    productos = {str(i): {"codigo": str(i), "stock": i} for i in range(100000)}
+    vista.reconstruir(productos)
+    
+    # Solo existen las 8 filas visibles; desplazarse cambia sus valores sin crear items
+    vista.desplazar("moveto", 0.5)
+    if len(tabla.filas) != 8 or tabla.inserciones != 8 or list(tabla.filas.values())[0] != ("50000", 50000):
+        print(f"❌ Ventana inesperada: {len(tabla.filas)} filas, {tabla.inserciones} inserciones")
+        return False
+    
+    # Seleccionar un producto lejano mueve la ventana y la selección sigue al producto
+    vista.seleccionar("90000")
+    item = vista.item("90000")
+    if item is None or tabla.seleccion != (item,) or vista.codigo(item) != "90000":
+        print("❌ El producto seleccionado no quedó visible")
+        return False
+    vista.desplazar("scroll", 1, "pages")
+    if tabla.seleccion != () or barra.posicion[0] != 90004 / 100000:
+        print(f"❌ Selección o barra inesperadas: {tabla.seleccion} {barra.posicion}")
+        return False
+    
+    print("✅ Tabla virtual - OK")
+    return True
+
+def test_busqueda_prefijos():
+    """Prueba la búsqueda por prefijo de código y palabras del nombre (sin tildes)"""
+    print("\n🔍 Probando búsqueda por prefijo...")
+    
+    from indice_busqueda import IndicePrefijos
+    
+    productos = {
+        "7791234": {"producto": "Pantalón Cargo Azul"},
+        "7795678": {"producto": "Remera Azul"},
+        "1000": {"titulo": "Gorra", "producto": "Gorra"}
+    }
+    indice = IndicePrefijos()
+    indice.construir_despues(productos)
+    
+    if (sorted(indice.buscar("azu")) != ["7791234", "7795678"] or indice.buscar("PANTALON az") != ["7791234"]
+            or indice.buscar("77956") != ["7795678"] or indice.buscar("zapatilla") != []):
+        print("❌ Resultados de búsqueda incorrectos")
+        return False
+    
+    # Altas y bajas se aplican sobre el índice ya armado
+    productos["2000"] = {"producto": "Buzo azul"}
+    indice.actualizar("2000", productos["2000"])
+    indice.quitar("7795678")
+    if sorted(indice.buscar("azul")) != ["2000", "7791234"]:
+        print("❌ El índice no se actualizó")
+        return False
+    
+    print("✅ Búsqueda por prefijo - OK")
+    return True
+
+def test_busqueda_aproximada():
+    """Prueba la búsqueda con errores de escritura y la actualización por diferencias del índice"""
+    print("\n🔤 Probando búsqueda aproximada...")
+    
+    from indice_busqueda import IndiceTrigramas
+    
+    productos = {
+        "7791234": {"producto": "Pantalón Cargo Azul"},
+        "7795678": {"producto": "Remera Azul"},
+        "1000": {"titulo": "Gorra", "producto": "Gorra"}
+    }
+    indice = IndiceTrigramas()
+    indice.construir_despues(productos)
+    
+    if indice.buscar("remra azl")[:1] != ["7795678"] or indice.buscar("gora") != ["1000"]:
+        print("❌ Resultados de búsqueda aproximada incorrectos")
+        return False
+    
+    # Recarga del catálogo: se aplican solo las altas, bajas y cambios de nombre
+    productos = {
+        "7791234": {"producto": "Pantalón Cargo Azul"},
+        "2000": {"producto": "Buzo Azul"}
+    }
+    indice.construir_despues(productos)
+    if indice.buscar("buzo azl")[:1] != ["2000"] or indice.buscar("remera") != []:
+        print("❌ El índice aproximado no se actualizó")
+        return False
+    
+    print("✅ Búsqueda aproximada - OK")
+    return True
+
+def test_motor_escaner():
+    """Prueba que escaneos seguidos (con y sin Enter) se procesen una sola vez cada uno"""
+    print("\n📷 Probando motor del lector de códigos...")
+    
+    from escaner import MotorEscaner
+    
+    # Reloj y temporizadores simulados (reemplazan a time.monotonic y root.after)
+    ahora = [0.0]
+    programados = {}
+    campo = [""]
+    procesados = []
+    
+    def programar(ms, funcion):
+        identificador = len(programados) + 1
+        while identificador in programados:
+            identificador += 1
+        programados[identificador] = (ahora[0] + ms / 1000, funcion)
+        return identificador
+    
+    def avanzar(segundos):
+        ahora[0] += segundos
+        vencidos = [i for i, (vence, _) in programados.items() if vence <= ahora[0]]
+        while vencidos:
+            # Lo que programa un callback (after(0)) también corre en esta vuelta
+            _, funcion = programados.pop(min(vencidos, key=lambda i: programados[i][0]))
+            funcion()
+            vencidos = [i for i, (vence, _) in programados.items() if vence <= ahora[0]]
+    
+    def escribir(texto, entre_teclas):
+        for caracter in texto:
+            motor.tecla(caracter)
+            campo[0] += caracter  # El Entry agrega el carácter después del binding
+            avanzar(entre_teclas)
+    
+    motor = MotorEscaner(lambda: campo[0], lambda: campo.__setitem__(0, ""), procesados.append,
+                         programar, lambda identificador: programados.pop(identificador, None),
+                         reloj=lambda: ahora[0])
+    
+    # 20 escaneos por segundo con Enter y otros 20 sin Enter
+    for i in range(20):
+        escribir(f"77900000{i:05d}", 0.002)
+        motor.enter()
+        avanzar(0.02)
+    for i in range(20):
+        escribir(f"77911111{i:05d}", 0.002)
+        if len(programados) > 2:
+            print("❌ Se acumularon temporizadores")
+            return False
+        avanzar(0.04)
+    avanzar(0.2)
+    
+    esperados = [f"77900000{i:05d}" for i in range(20)] + [f"77911111{i:05d}" for i in range(20)]
+    if procesados != esperados:
+        print(f"❌ Códigos procesados incorrectos: {len(procesados)} de {len(esperados)}")
+        return False
+    
+    # Cantidad escrita a mano y después el escaneo sin Enter: un solo código con la cantidad
+    escribir("12*", 0.3)
+    escribir("7791234567890", 0.002)
+    avanzar(0.2)
+    if procesados[-1] != "12*7791234567890":
+        print("❌ El escaneo después de la cantidad no se cerró")
+        return False
+    procesados.pop()
+    
+    # Una persona escribiendo despacio: no se procesa hasta el Enter
+    escribir("12345678", 0.3)
+    avanzar(0.5)
+    if len(procesados) != 40 or campo[0] != "12345678":
+        print("❌ Se procesó una escritura manual sin Enter")
+        return False
+    motor.enter()
+    avanzar(0)
+    if procesados[-1] != "12345678" or campo[0] != "":
+        print("❌ El Enter no cerró el código manual")
+        return False
+    
+    print("✅ Motor del lector - OK")
+    return True
+
+def test_lote_recepcion():
+    """Prueba el conteo en memoria de la recepción rápida (deshacer y control de stock)"""
+    print("\n📦 Probando lote de recepción...")
+    
+    from recepcion import LoteMovimientos
+    
+    productos = {"A1": {"stock": 2}, "B2": {"stock": 0}}
+    lote = LoteMovimientos()
+    for _ in range(300):
+        lote.agregar("A1", 1)
+    lote.agregar("B2", 1)
+    lote.deshacer()
+    
+    if lote.movimientos() != [("A1", 300)] or lote.total_unidades() != 300 or len(lote) != 300:
+        print("❌ Conteo del lote incorrecto")
+        return False
+    
+    # Preparación: no se puede sacar más de lo que hay
+    lote.vaciar()
+    lote.agregar("A1", -1)
+    lote.agregar("B2", -1)
+    if lote.faltantes(productos) != ["B2"]:
+        print("❌ No se detectó el stock insuficiente")
+        return False
+    
+    print("✅ Lote de recepción - OK")
+    return True
+
+def test_ventana_lote():
+    """Prueba el lote compartido por las dos ventanas (un solo guardado por lote, vía guardar_lote)"""
+    print("\n🪟 Probando lote en la ventana...")
+
+    import ventana_comun
+    from inventario import StockInsuficiente
+    from recepcion import LoteMovimientos
+    from ventana_comun import VentanaLote
+
+    class Etiqueta:
+        def config(self, **opciones):
+            self.texto = opciones.get('text')
+
+    class Variable:
+        def set(self, valor):
+            self.valor = valor
+
+    class Campo:
+        def focus(self):
+            pass
+
+    class Inventario:
+        def __init__(self):
+            self.lotes = []
+            self.error = None
+
+        def aplicar_lote(self, movimientos):
+            if self.error is not None:
+                raise self.error
+            self.lotes.append(movimientos)
+
+    class Ventana(VentanaLote):
+        def __init__(self):
+            self.productos = {"A1": {"stock": 5}}
+            self.lote = LoteMovimientos()
+            self.inventario = Inventario()
+            self.label_lote, self.status_var, self.entry_codigo = Etiqueta(), Variable(), Campo()
+            self.actualizados, self.guardados = [], 0
+
+        def actualizar_tabla(self, codigo=None):
+            self.actualizados.append(codigo)
+
+        def guardar_datos(self):
+            self.guardados += 1
+
+    ventana = Ventana()
+    for _ in range(3):
+        ventana.lote.agregar("A1", 1)
+    ventana.actualizar_label_lote()
+    assert ventana.label_lote.texto == "Lote: 1 productos, 3 unidades", "❌ El resumen del lote es incorrecto"
+
+    ventana.aplicar_lote()
+    assert ventana.inventario.lotes == [[("A1", 3)]] and ventana.guardados == 1 and ventana.actualizados == ["A1"], \
+        "❌ El lote no se aplicó con un solo guardado"
+    assert not len(ventana.lote) and ventana.label_lote.texto == "", "❌ El lote no quedó vacío después de aplicarlo"
+
+    # El inventario rechaza el lote (otra terminal movió el stock): se avisa y el lote queda igual
+    avisos = []
+    messagebox_original = ventana_comun.messagebox
+    ventana_comun.messagebox = type("Avisos", (), {"showwarning": staticmethod(lambda *a: avisos.append(a))})
+    try:
+        for error in (StockInsuficiente("Stock insuficiente de A1"), KeyError("A1")):
+            ventana.lote.agregar("A1", -2)
+            ventana.inventario.error = error
+            ventana.aplicar_lote()
+            assert ventana.lote.movimientos() == [("A1", -2)] and ventana.guardados == 1, \
+                f"❌ El lote rechazado no quedó intacto ({error!r})"
+            ventana.lote.vaciar()
+    finally:
+        ventana_comun.messagebox = messagebox_original
+    assert len(avisos) == 2, "❌ No se avisó el lote rechazado"
+
+    print("✅ Lote en la ventana - OK")
+    return True
+
+def test_cantidad_escaneo():
+    """Prueba la sintaxis de cantidad ('12*código', '12*', código de cantidad)"""
+    print("\n✖️ Probando cantidades en el escaneo...")
+    
+    from escaner import interpretar_escaneo
+    
+    casos = {
+        "12*7791234567890": (12, "7791234567890"),
+        " 12 * 7791234567890 ": (12, "7791234567890"),
+        "-3*7791234567890": (-3, "7791234567890"),
+        "12*": (12, None),
+        "CANT24": (24, None),
+        "7791234567890": (None, "7791234567890"),
+        "0*7791234567890": (None, "0*7791234567890"),
+        "CANTIDAD": (None, "CANTIDAD")
+    }
+    for texto, esperado in casos.items():
+        if interpretar_escaneo(texto) != esperado:
+            print(f"❌ '{texto}' se interpretó como {interpretar_escaneo(texto)}")
+            return False
+    
+    print("✅ Cantidades en el escaneo - OK")
+    return True
+
+def test_agregados_inventario():
+    """Prueba que los totales del inventario se corrijan movimiento a movimiento"""
+    print("\n📊 Probando indicadores del inventario...")
+    
+    from indicadores import AgregadosInventario
+    
+    productos = {
+        "A1": {"stock": 10, "stock_minimo": 2, "precio": 5.0},
+        "B2": {"stock": 1, "stock_min": 3, "precio_costo": "$1,000.50"}
+    }
+    agregados = AgregadosInventario()
+    agregados.construir(productos)
+    
+    # Movimientos y bajas, como los aplica la interfaz
+    productos["A1"]["stock"] = 1
+    agregados.actualizar("A1", productos["A1"])
+    productos["B2"]["stock"] = 5
+    agregados.actualizar("B2", productos["B2"])
+    productos["C3"] = {"stock": 0, "stock_minimo": 1, "precio": 2.0}
+    agregados.actualizar("C3", productos["C3"])
+    del productos["C3"]
+    agregados.quitar("C3")
+    
+    resumen = agregados.resumen(productos)
+    esperado = AgregadosInventario()
+    esperado.construir(productos)
+    assert (resumen['total_productos'] == 2 and resumen['stock_bajo'] == 1
+            and abs(resumen['valor_total'] - 5007.5) <= 1e-6
+            and abs(esperado.valor_total - resumen['valor_total']) <= 1e-6
+            and resumen['productos_stock_bajo'] == [productos["A1"]]), f"❌ Totales incorrectos: {resumen}"
+    
+    # Con SQLite los totales salen de la base al cargar, sin leer cada producto
+    import tempfile
+    from almacenamiento import AlmacenSQLite
+    from inventario import Inventario
+    with tempfile.TemporaryDirectory() as carpeta:
+        almacen = AlmacenSQLite(os.path.join(carpeta, "stock.db"), ruta_json=None)
+        almacen.cargar()
+        almacen.escribir_filas([{"codigo": str(i), "producto": f"P{i}", "stock": i, "stock_minimo": 3, "precio": 2.0}
+                                for i in range(10)])
+        inventario = Inventario(almacen)
+        inventario.cargar_local()
+        assert not inventario.productos.productos_en_memoria() and inventario.alertas.cantidad_bajo == 4, \
+            "❌ La carga en SQLite leyó los productos uno por uno"
+        inventario.mover("2", +5)
+        inventario.mover("8", -8)
+        inventario.agregar_producto({"codigo": "5", "producto": "Nuevo", "stock": 1, "stock_minimo": 0, "precio": 10.0})
+        inventario.agregar_producto({"codigo": "X", "producto": "Otro", "stock": 2, "stock_minimo": 4, "precio": 1.0})
+        resumen = inventario.resumen()
+        esperado = AgregadosInventario()
+        esperado.construir(dict(inventario.productos.items()))
+        assert (resumen['total_productos'] == 11 and resumen['stock_bajo'] == len(esperado.stock_bajo)
+                and abs(resumen['valor_total'] - esperado.valor_total) <= 1e-6), \
+            f"❌ Totales incorrectos en SQLite: {resumen} (esperado {esperado.valor_total})"
+        almacen.cerrar()
+    
+    print("✅ Indicadores del inventario - OK")
+    return True
+
+def test_alertas_reposicion():
+    """Prueba que las alertas se disparen solo al cruzar el mínimo y el orden por urgencia"""
+    print("\n🔔 Probando alertas de reposición...")
+    
+    from alertas import MotorAlertas
+    
+    avisos = []
+    productos = {
+        "A1": {"stock": 5, "stock_minimo": 2},
+        "B2": {"stock": 1, "stock_min": 3},
+        "C3": {"stock": 9, "stock_minimo": 3}
+    }
+    alertas = MotorAlertas(al_cruzar=lambda codigo, bajo: avisos.append((codigo, bajo)))
+    alertas.construir(productos)
+    
+    # A1 baja de 5 a 1: un solo aviso al cruzar el mínimo, no en cada unidad
+    for stock in (4, 3, 2, 1):
+        productos["A1"]["stock"] = stock
+        alertas.actualizar("A1", productos["A1"])
+    # B2 se repone y vuelve a superar el mínimo
+    productos["B2"]["stock"] = 10
+    alertas.actualizar("B2", productos["B2"])
+    
+    assert avisos == [("A1", True), ("B2", False)] and alertas.mas_urgentes() == ["A1"], \
+        f"❌ Avisos incorrectos: {avisos}, urgentes: {alertas.mas_urgentes()}"
+    
+    # Recarga completa con un cambio hecho afuera (en la hoja)
+    productos["C3"]["stock"] = 0
+    alertas.construir(productos)
+    assert avisos[-1] == ("C3", True) and alertas.mas_urgentes() == ["C3", "A1"] and alertas.cantidad_bajo == 2, \
+        "❌ La recarga no avisó el cruce"
+    
+    print("✅ Alertas de reposición - OK")
+    return True
+
+def test_inventario_sin_interfaz():
+    """Prueba el motor de inventario sin Tk: movimientos, pendientes, guardado y búsqueda"""
+    print("\n🧩 Probando motor de inventario sin interfaz...")
+    
+    import subprocess
+    import tempfile
+    from almacenamiento import AlmacenJSON
+    from inventario import Inventario, StockInsuficiente
+    
+    # El módulo no debe cargar Tk (se usa en servidores y procesos por lotes)
+    comando = [sys.executable, "-c", "import sys, inventario; sys.exit('tkinter' in sys.modules)"]
+    assert subprocess.run(comando, cwd=os.path.dirname(os.path.abspath(__file__))).returncode == 0, \
+        "❌ inventario.py importa tkinter"
+    
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "stock.json")
+        inventario = Inventario(AlmacenJSON(ruta))
+        inventario.cargar_productos({
+            "7791234": {"codigo": "7791234", "producto": "Remera Azul", "stock": 3, "stock_minimo": 2, "precio": 10.0}
+        })
+        inventario.agregar_producto({"codigo": "1000", "producto": "Gorra", "stock": 0, "stock_minimo": 1, "precio": 5.0})
+        
+        avisos = []
+        inventario.alertas.al_cruzar = lambda codigo, bajo: avisos.append((codigo, bajo))
+        inventario.mover("7791234", -1)
+        inventario.aplicar_lote([("1000", 4), ("7791234", 5)])
+        try:
+            inventario.mover("1000", -10)
+            raise AssertionError("❌ Se permitió dejar stock negativo")
+        except StockInsuficiente:
+            pass
+        
+        # El lote se aplica entero o nada: códigos repetidos se suman y los desconocidos se rechazan
+        for lote in ([("1000", -3), ("1000", -3)], [("1000", -1), ("9999", 1)]):
+            try:
+                inventario.aplicar_lote(lote)
+                raise AssertionError(f"❌ Se aceptó el lote {lote}")
+            except (StockInsuficiente, KeyError):
+                pass
+        assert inventario.productos["1000"]["stock"] == 4, "❌ Un lote rechazado movió stock"
+        
+        inventario.guardar_local()
+        copia = Inventario(AlmacenJSON(ruta))
+        copia.cargar_local()
+        assert (copia.productos["7791234"]["stock"] == 7 and copia.productos["1000"]["stock"] == 4
+                and not inventario.tomar_pendientes()[0]
+                and avisos == [("7791234", True), ("1000", False), ("7791234", False)]
+                and copia.buscar("rem") == ["7791234"] and copia.resumen()['valor_total'] == 90.0), \
+            "❌ Estado del inventario incorrecto"
+    
+    print("✅ Motor de inventario sin interfaz - OK")
+    return True
+
+def test_stock_cli():
+    """Prueba importación, ajustes y exportación por línea de comandos sobre SQLite"""
+    print("\n⌨️  Probando operaciones por línea de comandos...")
+    
+    import tempfile
+    import stock_cli
+    from almacenamiento import AlmacenSQLite
+    
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = lambda nombre: os.path.join(carpeta, nombre)
+        with open(ruta("productos.csv"), "w", encoding="utf-8-sig") as f:
+            f.write("Código;Producto;Stock;Stock mínimo;Precio;Color\n"
+                    "111;Remera;10;2;$1,500.50;Rojo\n"
+                    "222;Buzo;1;3;2000;\n"
+                    ";Sin código;1;1;1;\n")
+        with open(ruta("ajustes.csv"), "w", encoding="utf-8") as f:
+            f.write("codigo,delta,stock\n111,-4,\n222,,7\n222,-9,\n999,1,\n111,x,\n")
+        with open(ruta("precios.jsonl"), "w", encoding="utf-8") as f:
+            f.write('{"codigo": "111", "precio": 99}\n')
+        with open(ruta("lista.jsonl"), "w", encoding="utf-8") as f:
+            f.write('[1, 2]\n5\n')
+        
+        base = ["--base", ruta("stock.db")]
+        errores = []
+        assert stock_cli.main(base + ["importar", ruta("productos.csv")]) == 1, "❌ La fila sin código no se informó"
+        assert stock_cli.main(base + ["importar", ruta("precios.jsonl")]) == 0, "❌ Falló la importación parcial"
+        almacen = AlmacenSQLite(ruta("stock.db"), ruta_json=None)
+        resultado = stock_cli.importar(almacen, stock_cli.leer_filas(ruta("lista.jsonl")),
+                                       lambda numero, mensaje: errores.append(numero))
+        almacen.cerrar()
+        assert resultado == (0, 2) and errores == [1, 2], f"❌ Las líneas JSON que no son objetos no se informaron: {errores}"
+        errores.clear()
+        almacen = AlmacenSQLite(ruta("stock.db"), ruta_json=None)
+        aplicados, _ = stock_cli.ajustar(almacen, stock_cli.leer_filas(ruta("ajustes.csv")),
+                                         lambda numero, mensaje: errores.append(numero))
+        stock_cli.exportar(almacen, ruta("salida.jsonl"))
+        almacen.cerrar()
+        
+        with open(ruta("salida.jsonl"), encoding="utf-8") as f:
+            productos = {p["codigo"]: p for p in map(json.loads, f)}
+        remera, buzo = productos["111"], productos["222"]
+        assert aplicados == 2 and errores == [4, 5, 6], \
+            f"❌ Ajustes incorrectos: {aplicados} aplicados, líneas rechazadas {errores}"
+        assert (remera["stock"] == 6 and remera["precio"] == 99 and remera["Color"] == "Rojo"
+                and remera["producto"] == "Remera" and buzo["stock"] == 7 and len(productos) == 2), \
+            f"❌ Productos exportados incorrectos: {productos}"
+    
+    print("✅ Operaciones por línea de comandos - OK")
+    return True
+
+def test_importar_publicaciones():
+    """Prueba la lectura de la exportación del marketplace y su importación por lotes"""
+    print("\n📥 Probando importación de publicaciones...")
+    
+    import tempfile
+    import stock_cli
+    from almacenamiento import AlmacenJournal, AlmacenSQLite
+    from bandeja_salida import BandejaSalida
+    from inventario import Inventario
+    from publicaciones import leer_publicaciones
+    
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "publicaciones.csv")
+        # Excel en español: separador ';' y codificación Windows-1252
+        with open(ruta, "w", encoding="cp1252", newline="") as f:
+            f.write("Publicaciones;;;\r\n"
+                    "ID;TÍTULO;Codigo de producto (seller custom field);Stock;Precio costo\r\n"
+                    "MLA1;Remera, algodón;111;5;$1,000\r\n"
+                    "MLA2;Sin código;;3;\r\n"
+                    "MLA3;Buzo;222;sin dato;$500\r\n")
+        
+        filas = list(leer_publicaciones(ruta))
+        assert ([numero for numero, _ in filas] == [3, 5] and filas[0][1]["titulo"] == "Remera, algodón"
+                and filas[1][1]["stock"] == 0), f"❌ Filas leídas incorrectas: {filas}"
+        
+        almacen = AlmacenSQLite(os.path.join(carpeta, "stock.db"), ruta_json=None)
+        stock_cli.importar(almacen, leer_publicaciones(ruta))
+        resumen = almacen.resumen()
+        almacen.cerrar()
+        assert resumen["total_productos"] == 2 and abs(resumen["valor_total"] - 5000.0) <= 0.001, \
+            f"❌ Importación en SQLite incorrecta: {resumen}"
+        
+        # En memoria: se conservan los campos que el archivo no trae y se reaplica la bandeja
+        bandeja = BandejaSalida(os.path.join(carpeta, "bandeja.jsonl"))
+        bandeja.agregar("111", -2)
+        inventario = Inventario(AlmacenSQLite(os.path.join(carpeta, "otra.db"), ruta_json=None), bandeja_salida=bandeja)
+        inventario.cargar_productos({"111": {"codigo": "111", "producto": "Vieja", "stock": 9, "stock_min": 4}})
+        inventario.importar_productos(producto for _, producto in leer_publicaciones(ruta))
+        remera = inventario.productos["111"]
+        assert (remera["stock"] == 3 and remera["stock_min"] == 4 and remera["producto"] == "Remera, algodón"
+                and len(inventario.productos) == 2), f"❌ Importación en memoria incorrecta: {remera}"
+        
+        # Exportación sin columna de stock: los productos nuevos empiezan en 0
+        with open(ruta, "w", encoding="utf-8", newline="") as f:
+            f.write("TÍTULO,Codigo de producto (seller custom field),Precio costo\n"
+                    "Gorra,333,$200\n")
+        inventario.importar_productos(producto for _, producto in leer_publicaciones(ruta))
+        assert inventario.productos["333"]["stock"] == 0 and inventario.productos["111"]["stock"] == 3, \
+            f"❌ Importación sin columna de stock incorrecta: {inventario.productos}"
+        
+        # Lo importado queda pendiente: un guardado incremental lo escribe (SQLite y diario)
+        inventario.guardar_local()
+        guardado = Inventario(AlmacenSQLite(os.path.join(carpeta, "otra.db"), ruta_json=None))
+        guardado.cargar_local()
+        assert (guardado.productos["111"]["producto"] == "Remera, algodón" and guardado.productos["111"]["stock"] == 3
+                and guardado.productos["333"]["producto"] == "Gorra"), "❌ El guardado no incluyó lo importado"
+        guardado.cerrar()
+        diario = Inventario(AlmacenJournal(os.path.join(carpeta, "stock.json"), registros_por_instantanea=100))
+        diario.cargar_local()
+        diario.agregar_producto({"codigo": "333", "producto": "Vieja", "stock": 4, "precio_costo": "$1"})
+        diario.guardar_local()
+        diario.importar_productos(producto for _, producto in leer_publicaciones(ruta))
+        diario.guardar_local()
+        gorra = AlmacenJournal(os.path.join(carpeta, "stock.json")).cargar()["333"]
+        assert gorra["producto"] == "Gorra" and gorra["precio_costo"] == "$200" and gorra["stock"] == 4, \
+            f"❌ El diario no guardó lo importado: {gorra}"
+        try:
+            inventario.importar_productos([{"codigo": "444", "stock": 1}, {"codigo": "555", "stock": "x"}])
+            raise AssertionError("❌ Se importó un producto con stock inválido")
+        except ValueError:
+            pass
+        assert "444" not in inventario.productos, "❌ Una importación rechazada cambió el catálogo"
+    
+    print("✅ Importación de publicaciones - OK")
+    return True
+
+def test_servicio_stock():
+    """Prueba el servicio de stock compartido con dos terminales escaneando a la vez"""
+    print("\n🖧 Probando servicio de stock compartido...")
+    
+    import asyncio
+    import queue
+    import tempfile
+    import threading
+    import time
+    from almacenamiento import AlmacenJSON
+    from cliente_stock import InventarioRemoto
+    from inventario import Inventario, ProductoModificado, StockInsuficiente
+    from servicio_stock import ServicioStock
+    
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "stock.json")
+        inventario = Inventario(AlmacenJSON(ruta))
+        inventario.cargar_productos({
+            "111": {"codigo": "111", "producto": "Remera", "stock": 500, "stock_minimo": 2, "precio": 1.0},
+            "222": {"codigo": "222", "producto": "Buzo", "stock": 1, "stock_minimo": 0, "precio": 1.0}
+        })
+        servicio = ServicioStock(inventario, host="127.0.0.1", puerto=0, segundos_guardado=0.05)
+        bucle = asyncio.new_event_loop()
+        threading.Thread(target=bucle.run_forever, daemon=True).start()
+        asyncio.run_coroutine_threadsafe(servicio.iniciar(), bucle).result(5)
+        
+        terminales = [InventarioRemoto(f"127.0.0.1:{servicio.puerto}") for _ in range(2)]
+        try:
+            for terminal in terminales:
+                terminal.cargar_local()
+            
+            # Dos terminales descuentan el mismo producto a la vez: no se pierde ningún movimiento
+            hilos = [threading.Thread(target=lambda t=t: [t.mover("111", -1) for _ in range(200)]) for t in terminales]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            
+            terminales[0].mover("222", -1)
+            try:
+                terminales[1].mover("222", -1)
+                raise AssertionError("❌ El servicio permitió stock negativo")
+            except StockInsuficiente:
+                pass
+            
+            # Los avisos del servicio llegan a la copia de la otra terminal
+            limite = time.monotonic() + 5
+            while terminales[1].productos["222"]["stock"] != 0 and time.monotonic() < limite:
+                terminales[1].procesar_eventos()
+                time.sleep(0.01)
+            copias = [t.productos["111"]["stock"] for t in terminales]
+            terminales[0].procesar_eventos()
+            assert inventario.productos["111"]["stock"] == 100 and terminales[0].productos["111"]["stock"] == 100, \
+                f"❌ Stock incorrecto: servicio {inventario.productos['111']['stock']}, terminales {copias}"
+            assert terminales[1].productos["222"]["stock"] == 0, "❌ La otra terminal no recibió el aviso del cambio"
+            
+            # Lote con un código repetido que no alcanza: el servicio no mueve nada
+            try:
+                terminales[0].aplicar_lote([("111", -60), ("111", -60)])
+                raise AssertionError("❌ El servicio aplicó un lote sin stock suficiente")
+            except StockInsuficiente:
+                pass
+            # Producto con datos inválidos: se rechaza sin tocar el catálogo
+            try:
+                terminales[0].agregar_producto({"codigo": "333", "stock": "muchos"})
+                raise AssertionError("❌ El servicio aceptó un producto inválido")
+            except ValueError:
+                pass
+            assert inventario.productos["111"]["stock"] == 100 and "333" not in inventario.productos, \
+                "❌ Un pedido rechazado cambió el catálogo del servicio"
+            
+            # Versión leída antes de que otra terminal mueva el producto: el servicio rechaza el cambio
+            version = terminales[0].version("111")
+            terminales[1].mover("111", +1)
+            try:
+                terminales[0].mover("111", -1, version=version)
+                raise AssertionError("❌ El servicio aceptó un cambio sobre una versión vieja")
+            except ProductoModificado:
+                pass
+            terminales[0].mover("222", +1, version=terminales[0].version("222"))
+        finally:
+            for terminal in terminales:
+                terminal.cerrar()
+            asyncio.run_coroutine_threadsafe(servicio.detener(), bucle).result(5)
+            bucle.call_soon_threadsafe(bucle.stop)
+        
+        with open(ruta, encoding="utf-8") as f:
+            assert json.load(f)["111"]["stock"] == 101, "❌ El servicio no guardó los movimientos"
+    
+    # Respuesta que llega después del tiempo de espera: no se pierde, pasa a la cola de avisos
+    import socket
+    from cliente_stock import ClienteStock, SinRespuesta
+    servidor = socket.create_server(("127.0.0.1", 0))
+    def responder_tarde():
+        conexion, _ = servidor.accept()
+        with conexion, conexion.makefile("rb") as entrada:
+            pedido = json.loads(entrada.readline())
+            time.sleep(0.3)
+            conexion.sendall(json.dumps({"id": pedido["id"], "ok": True, "version": 7,
+                                         "producto": {"codigo": "111", "stock": 9}}).encode() + b"\n")
+            entrada.readline()
+    threading.Thread(target=responder_tarde, daemon=True).start()
+    cliente = ClienteStock("127.0.0.1", servidor.getsockname()[1], segundos_espera=0.05)
+    try:
+        cliente.pedir("mover", codigo="111", delta=1)
+        raise AssertionError("❌ No se avisó la falta de respuesta")
+    except SinRespuesta:
+        pass
+    try:
+        aviso = cliente.eventos.get(timeout=5)
+    except queue.Empty:
+        aviso = None
+    finally:
+        cliente.cerrar()
+        servidor.close()
+    assert aviso == {"evento": "productos", "cambios": [[{"codigo": "111", "stock": 9}, 7]]}, \
+        f"❌ Se perdió la respuesta tardía del servicio: {aviso}"
+    
+    # Cada guardado copia solo los productos pendientes, salvo cuando el diario toca instantánea
+    from almacenamiento import AlmacenJournal, AlmacenSQLite
+    class DiarioEspia(AlmacenJournal):
+        def guardar(self, productos, codigos=None):
+            copias.append(len(productos))
+            super().guardar(productos, codigos)
+    with tempfile.TemporaryDirectory() as carpeta:
+        copias = []
+        inventario = Inventario(DiarioEspia(os.path.join(carpeta, "stock.json"), registros_por_instantanea=3))
+        inventario.cargar_productos({str(i): {"codigo": str(i), "producto": "P", "stock": 5} for i in range(100)})
+        servicio = ServicioStock(inventario)
+        for _ in range(3):
+            inventario.mover("7", -1)
+            asyncio.run(servicio._guardar_en_otro_hilo())
+        assert copias == [1, 1, 100], f"❌ Copias del catálogo por guardado: {copias}"
+        assert not inventario.codigos_modificados, "❌ Quedaron cambios sin confirmar"
+        inventario.cerrar()
+        
+        # En SQLite el guardado también va en otro hilo
+        inventario = Inventario(AlmacenSQLite(os.path.join(carpeta, "stock.db"), os.path.join(carpeta, "no.json")))
+        inventario.cargar_local()
+        inventario.agregar_producto({"codigo": "1", "producto": "P", "stock": 4})
+        asyncio.run(ServicioStock(inventario)._guardar_en_otro_hilo())
+        inventario.cerrar()
+        releido = Inventario(AlmacenSQLite(os.path.join(carpeta, "stock.db"), os.path.join(carpeta, "no.json")))
+        releido.cargar_local()
+        assert releido.producto("1")["stock"] == 4, "❌ El servicio no guardó en SQLite"
+        releido.cerrar()
+    
+    print("✅ Servicio de stock compartido - OK")
+    return True
+
+def test_edicion_por_producto():
+    """Prueba que una edición solo se rechaza si cambió el mismo producto"""
+    print("\n🛡️ Probando edición por producto...")
+    
+    import tempfile
+    from almacenamiento import AlmacenJSON
+    from inventario import Inventario, ProductoModificado
+    
+    with tempfile.TemporaryDirectory() as carpeta:
+        inventario = Inventario(AlmacenJSON(os.path.join(carpeta, "stock.json")))
+        inventario.cargar_productos({
+            "111": {"codigo": "111", "producto": "Remera", "stock": 10, "stock_minimo": 2, "precio": 1.0},
+            "222": {"codigo": "222", "producto": "Buzo", "stock": 10, "stock_minimo": 2, "precio": 1.0}
+        })
+        
+        # Dos confirmaciones abiertas a la vez; mientras tanto se escanea el primer producto
+        version_111 = inventario.version("111")
+        version_222 = inventario.version("222")
+        inventario.mover("111", -1)
+        
+        # El otro producto no se ve afectado
+        inventario.mover("222", +1, version=version_222)
+        try:
+            inventario.mover("111", +1, version=version_111)
+            raise AssertionError("❌ Se aplicó un cambio sobre un stock que ya había cambiado")
+        except ProductoModificado:
+            pass
+        assert inventario.productos["111"]["stock"] == 9 and inventario.productos["222"]["stock"] == 11, \
+            "❌ Stock incorrecto después de las ediciones"
+        
+        # Una recarga del catálogo deja viejas todas las versiones leídas antes
+        version_222 = inventario.version("222")
+        inventario.recalcular()
+        try:
+            inventario.mover("222", -1, version=version_222)
+            raise AssertionError("❌ Se aplicó un cambio sobre una versión anterior a la recarga")
+        except ProductoModificado:
+            pass
+        inventario.mover("222", -1, version=inventario.version("222"))
+    
+    print("✅ Edición por producto - OK")
+    return True
+
+def test_bandeja_salida():
+    """Prueba que los movimientos sin enviar sobrevivan a un reinicio y se confirmen por secuencia"""
+    print("\n📤 Probando bandeja de salida...")
+    
+    import tempfile
+    from bandeja_salida import BandejaSalida
+    
+    try:
+        with tempfile.TemporaryDirectory() as carpeta:
+            ruta = os.path.join(carpeta, "bandeja_salida.jsonl")
+            bandeja = BandejaSalida(ruta)
+            bandeja.agregar("111", 1)
+            secuencia = bandeja.agregar("111", 2)
+            bandeja.agregar("222", -1)
+            
+            # Al reabrir (nueva sesión) los movimientos siguen ahí
+            reabierta = BandejaSalida(ruta)
+            if reabierta.deltas_por_codigo() != {"111": 3, "222": -1}:
+                print("❌ La bandeja no conservó los movimientos")
+                return False
+            
+            # Confirmar hasta una secuencia deja solo los posteriores
+            reabierta.confirmar(secuencia)
+            if len(BandejaSalida(ruta)) != 1 or reabierta.deltas_por_codigo() != {"222": -1}:
+                print("❌ La confirmación no quitó los movimientos enviados")
+                return False
+        
+        print("✅ Bandeja de salida - OK")
+        return True
+    except Exception as e:
+        print(f"❌ Error en la bandeja de salida: {e}")
+        return False
+
 def test_sistema_basico():
     """Prueba funcionalidades básicas del sistema"""
     print("\n⚙️  Probando sistema básico...")
@@ -169,6 +1381,30 @@ def main():
         ("Importaciones", test_imports),
         ("Archivos", test_archivos),
         ("Datos de ejemplo", test_datos_ejemplo),
+        ("Diario de movimientos", test_almacenamiento_journal),
+        ("Datos de productos en el diario", test_journal_datos_producto),
+        ("Almacenamiento SQLite", test_almacenamiento_sqlite),
+        ("SQLite desde otro hilo", test_sqlite_otro_hilo),
+        ("Hilo de sincronización", test_sincronizador_fondo),
+        ("Escritura por bloques", test_escritura_por_bloques),
+        ("Lectura por columnas e índice de filas", test_indice_hoja),
+        ("Límite de llamadas", test_limite_llamadas),
+        ("Bandeja de salida", test_bandeja_salida),
+        ("Tabla indexada por código", test_vista_tabla),
+        ("Tabla virtual", test_tabla_virtual),
+        ("Búsqueda por prefijo", test_busqueda_prefijos),
+        ("Búsqueda aproximada", test_busqueda_aproximada),
+        ("Motor del lector de códigos", test_motor_escaner),
+        ("Lote de recepción", test_lote_recepcion),
+        ("Lote en la ventana", test_ventana_lote),
+        ("Cantidades en el escaneo", test_cantidad_escaneo),
+        ("Indicadores del inventario", test_agregados_inventario),
+        ("Alertas de reposición", test_alertas_reposicion),
+        ("Motor de inventario sin interfaz", test_inventario_sin_interfaz),
+        ("Línea de comandos", test_stock_cli),
+        ("Importación de publicaciones", test_importar_publicaciones),
+        ("Servicio de stock compartido", test_servicio_stock),
+        ("Edición por producto", test_edicion_por_producto),
         ("Sistema básico", test_sistema_basico)
     ]
     
@@ -0,0 +1,271 @@
+"""
+Partes de la ventana compartidas por las dos versiones del sistema
+
+Conexión con el servicio de stock, lote de recepción/preparación, avisos
+de reposición y confirmación de cambios de stock: la ventana principal de cada versión hereda estas clases en
+vez de tener su propia copia de cada método.
+"""
+
+import tkinter as tk
+from tkinter import ttk, messagebox
+from cliente_stock import InventarioRemoto, SinRespuesta
+from inventario import StockInsuficiente
+from modelo import nombre_de, stock_minimo_de
+from recepcion import MODO_RECEPCION, MODO_PREPARACION, DELTA_POR_MODO
+
+
+class VentanaServicioStock:
+    """Conexión de la ventana con el servicio de stock compartido"""
+
+    def conectar_servicio_stock(self):
+        """Conecta con el servicio de stock compartido (sin él no hay inventario con qué trabajar)"""
+        try:
+            return InventarioRemoto(self.servidor_stock)
+        except OSError as e:
+            messagebox.showerror("Error", f"No se pudo conectar con el servicio de stock {self.servidor_stock}:\n{e}")
+            raise SystemExit(1)
+
+    def revisar_eventos_servicio(self):
+        """Aplica los cambios hechos por otras terminales (se repite con root.after)"""
+        cambiados = self.inventario.procesar_eventos()
+        if len(cambiados) > 20:
+            self.actualizar_tabla()
+        else:
+            for codigo in cambiados:
+                self.actualizar_tabla(codigo)
+        if not self.inventario.cliente.conectado:
+            self.status_google_sheets = f"❌ Sin conexión con el servicio de stock {self.servidor_stock}"
+            self.status_var.set(self.status_google_sheets)
+            return
+        self.root.after(200, self.revisar_eventos_servicio)
+
+    def reportar_error_interfaz(self, tipo, valor, traza):
+        """Los cortes con el servicio de stock se avisan en pantalla en vez de solo en la consola"""
+        if isinstance(valor, SinRespuesta):
+            # El pedido salió: la copia se corrige con la respuesta cuando llegue (como un aviso)
+            messagebox.showwarning("Servicio de stock", f"{valor}\n\nEl movimiento puede haberse aplicado: "
+                                                        "el stock en pantalla se corrige cuando responda el servicio.")
+            return
+        if isinstance(valor, ConnectionError):
+            messagebox.showerror("Servicio de stock", f"{valor}\n\nEl movimiento no se aplicó.")
+            return
+        tk.Tk.report_callback_exception(self.root, tipo, valor, traza)
+
+
+class VentanaLote:
+    """Escaneo en modo recepción/preparación y confirmación del lote"""
+
+    def cambiar_modo_escaneo(self):
+        """Cambia entre escaneo normal, recepción y preparación"""
+        modo = self.modo_escaneo.get()
+        if modo == MODO_RECEPCION:
+            self.status_var.set("📦 Recepción: cada escaneo suma 1 unidad al lote")
+        elif modo == MODO_PREPARACION:
+            self.status_var.set("🚚 Preparación: cada escaneo resta 1 unidad al lote")
+        else:
+            self.status_var.set(f"{self.status_google_sheets} | Listo para escanear")
+        self.actualizar_label_lote()
+        self.entry_codigo.focus()
+
+    def contar_escaneo(self, codigo, unidades=1):
+        """Suma (o resta) unidades al conteo del lote, sin ventanas ni guardado"""
+        if codigo not in self.productos:
+            self.root.bell()
+            self.status_var.set(f"❌ Producto no encontrado: {codigo} (no se contó)")
+            return
+        
+        cantidad = self.lote.agregar(codigo, unidades * DELTA_POR_MODO[self.modo_escaneo.get()])
+        producto = self.productos[codigo]
+        self.mostrar_producto(producto)
+        self.resaltar_producto_en_tabla(codigo)
+        self.status_var.set(f"{nombre_de(producto)}: {cantidad:+d} en el lote")
+        self.actualizar_label_lote()
+
+    def deshacer_escaneo(self):
+        """Quita del lote el último escaneo"""
+        codigo = self.lote.deshacer()
+        if codigo is not None:
+            self.status_var.set(f"↩️ Se quitó un escaneo de {codigo}")
+        self.actualizar_label_lote()
+        self.entry_codigo.focus()
+
+    def actualizar_label_lote(self):
+        """Muestra cuántos productos y unidades tiene el lote sin confirmar"""
+        if len(self.lote):
+            self.label_lote.config(text=f"Lote: {len(self.lote.cantidades)} productos, "
+                                        f"{self.lote.total_unidades()} unidades")
+        else:
+            self.label_lote.config(text="")
+
+    def confirmar_lote(self):
+        """Muestra el lote completo en una sola pantalla y lo aplica al confirmar"""
+        movimientos = [(codigo, delta) for codigo, delta in self.lote.movimientos() if codigo in self.productos]
+        if not movimientos:
+            messagebox.showinfo("Lote", "No hay escaneos para confirmar")
+            return
+        
+        ventana = tk.Toplevel(self.root)
+        ventana.title("Confirmar Lote")
+        ventana.geometry("600x400")
+        ventana.transient(self.root)
+        ventana.grab_set()
+        
+        ttk.Label(ventana, text=f"{len(movimientos)} productos, {self.lote.total_unidades()} unidades", 
+                 font=('Arial', 12, 'bold')).pack(pady=(15, 10))
+        
+        columnas = ('Código', 'Producto', 'Stock anterior', 'Cantidad', 'Stock nuevo')
+        tabla = ttk.Treeview(ventana, columns=columnas, show='headings', height=12)
+        for columna in columnas:
+            tabla.heading(columna, text=columna)
+            tabla.column(columna, width=220 if columna == 'Producto' else 90)
+        tabla.tag_configure('faltante', foreground='red')
+        faltantes = set(self.lote.faltantes(self.productos))
+        for codigo, delta in movimientos:
+            stock = self.productos[codigo]['stock']
+            tabla.insert('', 'end', values=(codigo, nombre_de(self.productos[codigo]), stock, f"{delta:+d}", stock + delta),
+                         tags=('faltante',) if codigo in faltantes else ())
+        tabla.pack(fill=tk.BOTH, expand=True, padx=10)
+        
+        btn_frame = ttk.Frame(ventana)
+        btn_frame.pack(pady=15)
+        ttk.Button(btn_frame, text="✅ Confirmar", 
+                  command=lambda: [ventana.destroy(), self.aplicar_lote()]).pack(side=tk.LEFT, padx=10)
+        ttk.Button(btn_frame, text="🗑️ Descartar Lote", 
+                  command=lambda: [ventana.destroy(), self.descartar_lote()]).pack(side=tk.LEFT, padx=10)
+        ttk.Button(btn_frame, text="❌ Seguir Escaneando", 
+                  command=ventana.destroy).pack(side=tk.LEFT, padx=10)
+
+    def aplicar_lote(self):
+        """Aplica todos los movimientos del lote y los guarda juntos"""
+        faltantes = self.lote.faltantes(self.productos)
+        if faltantes:
+            messagebox.showwarning("Stock insuficiente", 
+                                 f"No hay stock suficiente para: {', '.join(str(c) for c in faltantes[:10])}\n"
+                                 "Corrija el lote (Deshacer Último) antes de confirmar.")
+            return
+        
+        movimientos = [(codigo, delta) for codigo, delta in self.lote.movimientos() if codigo in self.productos]
+        unidades = self.lote.total_unidades()
+        try:
+            self.inventario.aplicar_lote(movimientos)
+        except (StockInsuficiente, KeyError) as e:
+            # Otro movimiento (u otra terminal) cambió el stock o quitó un producto después del
+            # control: no se movió nada y el lote queda como estaba para corregirlo
+            messagebox.showwarning("Lote sin aplicar", f"No se pudo aplicar el lote:\n{e}\n"
+                                   "Corrija el lote (Deshacer Último) antes de confirmar.")
+            return
+        for codigo, _ in movimientos:
+            self.actualizar_tabla(codigo)
+        
+        # Un solo guardado para todo el lote
+        self.guardar_lote()
+        
+        self.lote.vaciar()
+        self.actualizar_label_lote()
+        self.status_var.set(f"✅ Lote confirmado: {len(movimientos)} productos, {unidades} unidades")
+        self.entry_codigo.focus()
+
+    def descartar_lote(self):
+        """Descarta el conteo del lote sin tocar el stock"""
+        if messagebox.askyesno("Descartar Lote", "¿Descartar todos los escaneos del lote?"):
+            self.lote.vaciar()
+            self.actualizar_label_lote()
+            self.status_var.set("🗑️ Lote descartado")
+
+    def guardar_lote(self):
+        """Guarda el lote recién aplicado (cada ventana puede guardarlo a su manera)"""
+        self.guardar_datos()
+
+
+class VentanaAlertas:
+    """Avisos de reposición del motor de alertas"""
+
+    def al_cruzar_minimo(self, codigo, bajo):
+        """Aviso de reposición: un producto bajó al mínimo (o volvió a superarlo)"""
+        producto = self.productos.get(codigo)
+        if producto is None:
+            return
+        if bajo:
+            self.root.bell()
+            self.label_alerta.config(text=f"🔔 Reponer: {nombre_de(producto)} (stock {producto['stock']}, "
+                                          f"mínimo {stock_minimo_de(producto)})", foreground='red')
+        else:
+            self.label_alerta.config(text=f"✅ {nombre_de(producto)} volvió a superar el mínimo", foreground='green')
+
+    def mostrar_alertas(self):
+        """Muestra los productos a reponer (del más urgente al menos urgente) y los últimos avisos"""
+        alertas = self.inventario.alertas
+        texto = f"PRODUCTOS A REPONER ({alertas.cantidad_bajo})\n========================\n"
+        for codigo in alertas.mas_urgentes(50):
+            producto = self.productos.get(codigo)
+            if producto is not None:
+                texto += f"\n• {nombre_de(producto)} (Stock: {producto['stock']}, Mínimo: {stock_minimo_de(producto)})"
+        
+        texto += "\n\nÚLTIMOS AVISOS\n========================\n"
+        for codigo, bajo in reversed(alertas.historial):
+            texto += f"\n{'🔔 Bajó al mínimo' if bajo else '✅ Superó el mínimo'}: {codigo}"
+        
+        ventana_alertas = tk.Toplevel(self.root)
+        ventana_alertas.title("Alertas de Reposición")
+        ventana_alertas.geometry("500x400")
+        
+        text_widget = tk.Text(ventana_alertas, wrap=tk.WORD, padx=10, pady=10)
+        text_widget.pack(fill=tk.BOTH, expand=True)
+        text_widget.insert(tk.END, texto)
+        text_widget.config(state=tk.DISABLED)
+
+
+class VentanaConfirmacion:
+    """Confirmación de cambios de stock sin bloquear la ventana principal"""
+
+    def mostrar_confirmacion_stock(self, codigo, stock_anterior, stock_nuevo, operacion, al_responder):
+        """Muestra una ventana de confirmación para cambios de stock; al_responder(True/False) recibe la respuesta
+
+        La ventana no toma el control del teclado: el lector de códigos sigue escribiendo en
+        el campo de código y los demás productos se pueden mover mientras tanto.
+        """
+        producto = nombre_de(self.productos[codigo])
+
+        # Crear ventana de confirmación
+        ventana_confirmacion = tk.Toplevel(self.root)
+        ventana_confirmacion.title("Confirmar Cambio de Stock")
+        ventana_confirmacion.geometry("400x250")
+        ventana_confirmacion.resizable(False, False)
+
+        # Centrar la ventana
+        ventana_confirmacion.transient(self.root)
+
+        # Contenido
+        ttk.Label(ventana_confirmacion, text="¿Deseas confirmar esta acción?", 
+                 font=('Arial', 12, 'bold')).pack(pady=(20, 10))
+
+        ttk.Label(ventana_confirmacion, text=f"Producto: {producto}", 
+                 font=('Arial', 10, 'bold')).pack(pady=5)
+
+        ttk.Label(ventana_confirmacion, text=f"Operación: {operacion}", 
+                 font=('Arial', 10)).pack(pady=5)
+
+        ttk.Label(ventana_confirmacion, text=f"Stock anterior: {stock_anterior}", 
+                 font=('Arial', 10)).pack(pady=5)
+
+        ttk.Label(ventana_confirmacion, text=f"Stock actualizado: {stock_nuevo}", 
+                 font=('Arial', 10, 'bold'), foreground='green').pack(pady=5)
+
+        def responder(confirmado):
+            ventana_confirmacion.destroy()
+            al_responder(confirmado)
+
+        # Botones
+        btn_frame = ttk.Frame(ventana_confirmacion)
+        btn_frame.pack(pady=20)
+
+        ttk.Button(btn_frame, text="✅ Confirmar", 
+                  command=lambda: responder(True)).pack(side=tk.LEFT, padx=10)
+        ttk.Button(btn_frame, text="❌ Cancelar", 
+                  command=lambda: responder(False)).pack(side=tk.LEFT, padx=10)
+        # Cerrar la ventana equivale a cancelar
+        ventana_confirmacion.protocol("WM_DELETE_WINDOW", lambda: responder(False))
+
+        # El foco vuelve al campo de código para seguir escaneando (el gestor de ventanas se lo
+        # da a la ventana nueva al mostrarla)
+        self.root.after_idle(self.entry_codigo.focus_force)
@@ -0,0 +1,216 @@
+"""
+Tabla de productos (ttk.Treeview) actualizada por código
+
+Guarda qué fila del Treeview corresponde a cada código, así un cambio de
+stock actualiza solo esa fila en vez de borrar y volver a insertar todo el
+catálogo. La reconstrucción completa queda para las cargas masivas.
+
+TablaVirtual es la variante para catálogos grandes: el Treeview tiene solo
+las filas que entran en pantalla y al desplazarse se cambian sus valores.
+"""
+
+from tkinter import ttk
+
+# Alto aproximado de una fila y del encabezado del Treeview (en píxeles)
+ALTO_FILA = 20
+ALTO_ENCABEZADO = 25
+
+
+class VistaTabla:
+    """Mantiene las filas de un Treeview indexadas por código de producto"""
+
+    def __init__(self, tabla, valores_fila):
+        self.tabla = tabla
+        self.valores_fila = valores_fila  # producto -> tupla de valores de las columnas
+        self.item_por_codigo = {}
+        self.codigo_por_item = {}
+
+    def reconstruir(self, productos):
+        """Vuelve a cargar todas las filas (solo para cargas y recargas completas)"""
+        items = self.tabla.get_children()
+        if items:
+            self.tabla.delete(*items)
+        self.item_por_codigo = {}
+        self.codigo_por_item = {}
+        for codigo, producto in productos.items():
+            self._insertar(codigo, producto)
+
+    def actualizar(self, codigo, producto):
+        """Actualiza en su lugar la fila del producto (la agrega al final si es nuevo)"""
+        item = self.item_por_codigo.get(codigo)
+        if item is None:
+            self._insertar(codigo, producto)
+        else:
+            self.tabla.item(item, values=self.valores_fila(producto))
+
+    def quitar(self, codigo):
+        """Quita la fila del producto, si está en la tabla"""
+        item = self.item_por_codigo.pop(codigo, None)
+        if item is not None:
+            del self.codigo_por_item[item]
+            self.tabla.delete(item)
+
+    def seleccionar(self, codigo):
+        """Selecciona la fila del producto y la hace visible"""
+        self.tabla.selection_remove(self.tabla.selection())
+        item = self.item_por_codigo.get(codigo)
+        if item is not None:
+            self.tabla.selection_add(item)
+            self.tabla.see(item)
+
+    def item(self, codigo):
+        """Devuelve el item del Treeview que muestra el código (None si no está)"""
+        return self.item_por_codigo.get(codigo)
+
+    def codigo(self, item):
+        """Devuelve el código del producto que muestra un item del Treeview"""
+        return self.codigo_por_item.get(item)
+
+    def _insertar(self, codigo, producto):
+        item = self.tabla.insert('', 'end', values=self.valores_fila(producto))
+        self.item_por_codigo[codigo] = item
+        self.codigo_por_item[item] = codigo
+
+
+class TablaVirtual:
+    """Treeview con filas fijas que muestran solo la parte visible del catálogo
+
+    Los productos quedan en el almacenamiento (diccionario o tabla SQLite) y
+    solo se leen los de la ventana visible. La barra de desplazamiento mueve
+    la ventana; los items del Treeview se reutilizan cambiando sus valores.
+    Tiene la misma interfaz que VistaTabla.
+    """
+
+    def __init__(self, tabla, scrollbar, valores_fila):
+        self.tabla = tabla
+        self.scrollbar = scrollbar
+        self.valores_fila = valores_fila
+        self.productos = {}
+        self.codigos = []  # Orden de las filas del catálogo
+        self.posicion_por_codigo = {}
+        self.inicio = 0  # Posición en el catálogo de la primera fila visible
+        self.items = []  # Items del Treeview, uno por fila visible
+        self.codigo_seleccionado = None
+        self.filas_visibles = int(tabla.cget('height'))
+
+        # El desplazamiento lo maneja la tabla virtual, no el Treeview
+        scrollbar.configure(command=self.desplazar)
+        tabla.configure(yscrollcommand='')
+        tabla.bind('<MouseWheel>', self._rueda)
+        tabla.bind('<Button-4>', self._rueda)
+        tabla.bind('<Button-5>', self._rueda)
+        tabla.bind('<Configure>', self._ajustar_alto)
+        tabla.bind('<<TreeviewSelect>>', self._al_seleccionar, add='+')
+
+    def reconstruir(self, productos):
+        """Toma el catálogo completo (solo sus códigos) y muestra la ventana actual"""
+        self.productos = productos
+        self.codigos = list(productos.keys())
+        self.posicion_por_codigo = {codigo: i for i, codigo in enumerate(self.codigos)}
+        self._mostrar_ventana()
+
+    def actualizar(self, codigo, producto):
+        """Actualiza la fila del producto si está visible (lo agrega al final si es nuevo)"""
+        if codigo not in self.posicion_por_codigo:
+            self.posicion_por_codigo[codigo] = len(self.codigos)
+            self.codigos.append(codigo)
+            self._mostrar_ventana()
+            return
+        item = self.item(codigo)
+        if item is not None:
+            self.tabla.item(item, values=self.valores_fila(producto))
+
+    def quitar(self, codigo):
+        """Quita el producto del catálogo mostrado"""
+        posicion = self.posicion_por_codigo.pop(codigo, None)
+        if posicion is None:
+            return
+        del self.codigos[posicion]
+        for i in range(posicion, len(self.codigos)):
+            self.posicion_por_codigo[self.codigos[i]] = i
+        self._mostrar_ventana()
+
+    def seleccionar(self, codigo):
+        """Selecciona el producto, desplazando la ventana para que quede visible"""
+        self.codigo_seleccionado = codigo
+        posicion = self.posicion_por_codigo.get(codigo)
+        if posicion is not None and not self.inicio <= posicion < self.inicio + self.filas_visibles:
+            # Dejar el producto en el medio de la ventana
+            self.inicio = posicion - self.filas_visibles // 2
+        self._mostrar_ventana()
+
+    def item(self, codigo):
+        """Devuelve el item del Treeview que muestra el código (None si no está visible)"""
+        posicion = self.posicion_por_codigo.get(codigo)
+        if posicion is None or not self.inicio <= posicion < self.inicio + len(self.items):
+            return None
+        return self.items[posicion - self.inicio]
+
+    def codigo(self, item):
+        """Devuelve el código del producto que muestra un item del Treeview"""
+        if item not in self.items:
+            return None
+        return self.codigos[self.inicio + self.items.index(item)]
+
+    def desplazar(self, accion, cantidad, unidad=None):
+        """Comando de la barra de desplazamiento ('moveto' o 'scroll')"""
+        if accion == 'moveto':
+            self.inicio = int(float(cantidad) * len(self.codigos))
+        elif accion == 'scroll':
+            paso = self.filas_visibles if unidad == 'pages' else 1
+            self.inicio += int(cantidad) * paso
+        self._mostrar_ventana()
+
+    def _rueda(self, event):
+        """Rueda del mouse: 3 filas por paso (delta en Windows/macOS, botones 4 y 5 en Linux)"""
+        arriba = event.num == 4 or getattr(event, 'delta', 0) > 0
+        self.desplazar('scroll', -3 if arriba else 3, 'units')
+        return 'break'
+
+    def _ajustar_alto(self, event):
+        """Recalcula cuántas filas entran cuando cambia el tamaño de la tabla"""
+        try:
+            alto_fila = int(ttk.Style(self.tabla).lookup('Treeview', 'rowheight') or ALTO_FILA)
+        except (ValueError, TypeError):
+            alto_fila = ALTO_FILA
+        filas = max(1, (event.height - ALTO_ENCABEZADO) // alto_fila)
+        if filas != self.filas_visibles:
+            self.filas_visibles = filas
+            self._mostrar_ventana()
+
+    def _al_seleccionar(self, event):
+        """Recuerda el producto elegido para mantenerlo seleccionado al desplazarse"""
+        seleccion = self.tabla.selection()
+        if seleccion:
+            self.codigo_seleccionado = self.codigo(seleccion[0])
+        elif self.item(self.codigo_seleccionado) is not None:
+            # Se quitó la selección de una fila visible (no es por desplazarse)
+            self.codigo_seleccionado = None
+
+    def _mostrar_ventana(self):
+        """Carga en los items del Treeview los productos de la ventana visible"""
+        total = len(self.codigos)
+        self.inicio = max(0, min(self.inicio, total - self.filas_visibles))
+        fin = min(total, self.inicio + self.filas_visibles)
+
+        # Solo se crean o borran items si cambió la cantidad de filas visibles
+        while len(self.items) < fin - self.inicio:
+            self.items.append(self.tabla.insert('', 'end', values=()))
+        while len(self.items) > fin - self.inicio:
+            self.tabla.delete(self.items.pop())
+
+        for item, codigo in zip(self.items, self.codigos[self.inicio:fin]):
+            self.tabla.item(item, values=self.valores_fila(self.productos[codigo]))
+
+        # La selección sigue al producto, no al item
+        item = self.item(self.codigo_seleccionado)
+        if item is not None:
+            if self.tabla.selection() != (item,):
+                self.tabla.selection_set(item)
+        elif self.tabla.selection():
+            self.tabla.selection_remove(self.tabla.selection())
+
+        if total:
+            self.scrollbar.set(self.inicio / total, fin / total)
+        else:
+            self.scrollbar.set(0, 1)